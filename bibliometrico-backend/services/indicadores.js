@@ -0,0 +1,187 @@
+// services/indicadores.js
+// Cálculo de los 21 indicadores a partir del texto de la tesis.
+// Lo usa thesisController.analyzeThesis; el ml-service tiene un port en Python
+// (ml-service/extractor.py) que se compara contra este archivo:
+//   node services/indicadores.js uploads/*.pdf   -> una línea JSON por PDF
+const pdf = require('pdf-parse');
+
+const { MODEL_COLUMNS } = require('./mlService');
+
+/**
+ * Año de la tesis cuando no viene en el body: primer año del texto o el actual
+ */
+function inferirAnio(texto = '') {
+  const yearMatch = texto.match(/(20\d{2}|19\d{2})/);
+  return yearMatch ? Number(yearMatch[1]) : new Date().getFullYear();
+}
+
+/**
+ * texto: texto del PDF ya recortado (trim); anio: año de la tesis
+ */
+function calcularIndicadores(texto, anio, columnas = MODEL_COLUMNS) {
+  const textoMinusculas = texto.toLowerCase();
+  const indicadores = {};
+
+  columnas.forEach(col => {
+    const lc = col.toLowerCase();
+    let valor = 0;
+
+    // ========== CITACIÓN ==========
+    if (lc.includes('antigüedad')) {
+      const anioActual = new Date().getFullYear();
+      const edad = anioActual - anio;
+      const maxEdad = 10;
+      const score = Math.max(0, 1 - Math.min(edad, maxEdad) / maxEdad);
+      valor = score * 5;
+    } else if (lc.includes('impacto de revistas')) {
+      valor = 3.0;
+    } else if (lc.includes('citas textuales')) {
+      const citasTextuales = (texto.match(/"[^"]{20,}"/g) || []).length;
+      const totalCitas =
+        (texto.match(/\([\w\s.,&]+\d{4}\)|\[\d+\]/g) || []).length +
+        citasTextuales;
+      const pct = totalCitas > 0 ? citasTextuales / totalCitas : 0;
+      valor = pct > 0.1 ? 2 : Math.round(pct * 10) / 2;
+    } else if (lc.includes('conectores')) {
+      const conectores = [
+        'además',
+        'por lo tanto',
+        'sin embargo',
+        'por consiguiente',
+        'en conclusión',
+      ];
+      const totalPalabras = texto.split(/\s+/).length;
+      const numConectores = conectores.reduce(
+        (acc, c) => acc + (textoMinusculas.split(c).length - 1),
+        0,
+      );
+      const ratio = totalPalabras > 0 ? numConectores / totalPalabras : 0;
+      valor = Math.min(5, ratio * 500);
+    } else if (lc.includes('parafraseo')) {
+      const citasTextuales = (texto.match(/"[^"]{20,}"/g) || []).length;
+      const totalCitas =
+        (texto.match(/\([\w\s.,&]+\d{4}\)|\[\d+\]/g) || []).length +
+        citasTextuales;
+      const pct = totalCitas > 0 ? citasTextuales / totalCitas : 0;
+      valor = (1 - pct) * 5;
+    } else if (lc.includes('fuentes utilizadas')) {
+      const seccionReferencias = textoMinusculas.split(
+        /referencias|bibliograf.a|fuentes consultadas|references/,
+      )[1];
+      const numFuentes =
+        (seccionReferencias?.match(/\[\d+\]|\d+\./g) || []).length;
+      valor = Math.min(5, (numFuentes / 100) * 5);
+    }
+
+    // ========== METODOLÓGICOS ==========
+    else if (lc.includes('tipo de investigación')) {
+      if (
+        textoMinusculas.includes('aplicada') ||
+        textoMinusculas.includes('tecnológica')
+      )
+        valor = 5;
+      else valor = 3;
+    } else if (lc.includes('enfoque')) {
+      if (textoMinusculas.includes('mixto')) valor = 5;
+      else if (textoMinusculas.includes('cualitativo')) valor = 4;
+      else valor = 3;
+    } else if (lc.includes('nivel (alcance)')) {
+      if (textoMinusculas.includes('aplicativo')) valor = 5;
+      else if (textoMinusculas.includes('explicativo')) valor = 4;
+      else if (textoMinusculas.includes('correlacional')) valor = 3;
+      else if (textoMinusculas.includes('descriptivo')) valor = 2;
+      else valor = 1;
+    } else if (lc.includes('diseño de investigación')) {
+      if (textoMinusculas.includes('experimental')) valor = 5;
+      else if (textoMinusculas.includes('cuasi experimental')) valor = 4;
+      else valor = 3;
+    }
+
+    // ========== INNOVACIÓN / DESARROLLO ==========
+    else if (lc.includes('desarrollo de software')) {
+      valor = textoMinusculas.includes('software') ? 5 : 0;
+    } else if (lc.includes('tecnologías emergentes')) {
+      valor =
+        textoMinusculas.includes('iot') ||
+        textoMinusculas.includes('blockchain') ||
+        textoMinusculas.includes('inteligencia artificial')
+          ? 5
+          : 0;
+    } else if (lc.includes('validación de modelos')) {
+      valor = textoMinusculas.includes('validación') ? 5 : 0;
+    } else if (lc.includes('marcos de referencias')) {
+      valor = textoMinusculas.includes('marco teórico') ? 4 : 2;
+    } else if (lc.includes('validación del producto')) {
+      valor = textoMinusculas.includes('prueba piloto') ? 5 : 2;
+    }
+
+    // ========== TÉCNICAS / INSTRUMENTOS ==========
+    else if (lc.includes('encuestas')) {
+      valor = textoMinusculas.includes('encuesta') ? 5 : 0;
+    } else if (lc.includes('observación / registro de datos')) {
+      valor =
+        textoMinusculas.includes('observación') ||
+        textoMinusculas.includes('registro de datos')
+          ? 5
+          : 0;
+    } else if (lc.includes('entrevistas')) {
+      valor = textoMinusculas.includes('entrevista') ? 5 : 0;
+    }
+
+    // ========== RESULTADOS / DISCUSIÓN ==========
+    else if (lc.includes('aplicación de pruebas estadísticas')) {
+      valor =
+        (textoMinusculas.match(
+          /t-student|chi-cuadrado|anova|regresión lineal|prueba estadística/g,
+        ) || []).length > 0
+          ? 5
+          : 0;
+    } else if (lc.includes('métricas de rendimiento')) {
+      valor =
+        (textoMinusculas.match(/performance|rendimiento|eficiencia/g) || [])
+          .length > 0
+          ? 5
+          : 0;
+    } else if (lc.includes('relevantes y aportan')) {
+      valor =
+        textoMinusculas.includes('conclusiones') &&
+        textoMinusculas.includes('discusión')
+          ? 5
+          : 3;
+    }
+
+    indicadores[col] = valor;
+  });
+
+  return indicadores;
+}
+
+// CLI para la comparación de paridad con ml-service/extractor.py
+async function main(files) {
+  const fs = require('fs');
+  for (const file of files) {
+    const data = await pdf(fs.readFileSync(file)).catch(() => ({ text: '' }));
+    const texto = data.text?.trim() || '';
+    const anio = inferirAnio(texto);
+    process.stdout.write(
+      JSON.stringify({
+        file,
+        texto,
+        anio,
+        indicadores: calcularIndicadores(texto, anio),
+      }) + '\n',
+    );
+  }
+}
+
+if (require.main === module) {
+  main(process.argv.slice(2)).catch(err => {
+    console.error(err);
+    process.exit(1);
+  });
+}
+
+module.exports = {
+  calcularIndicadores,
+  inferirAnio,
+};
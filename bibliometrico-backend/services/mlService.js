@@ -3,6 +3,8 @@ const fs = require('fs');
 const path = require('path');
 
 const ML_URL = process.env.ML_URL || 'http://localhost:5000/predict';
+// raíz del servicio ML (para /jobs), derivada de ML_URL
+const ML_BASE_URL = process.env.ML_BASE_URL || ML_URL.replace(/\/predict\/?$/, '');
 
 // subo 2 niveles: services -> backend -> raíz del proyecto
 const modelColsPath = path.join(
@@ -38,7 +40,56 @@ async function getPrediction(indicadores = {}) {
   return data.calificacion_predicha ?? null;
 }
 
+// predicción + contribución de cada indicador (modo explain de /predict), de mayor a menor peso
+async function getExplanation(indicadores = {}, top = 0) {
+  const payload = { explain: top || true };
+  MODEL_COLUMNS.forEach((col) => {
+    payload[col] = indicadores[col] ?? 0;
+  });
+
+  const { data } = await axios.post(ML_URL, payload, {
+    headers: { 'Content-Type': 'application/json' },
+    timeout: 10000,
+  });
+
+  return { prediction: data.prediction ?? null, explanation: data.explanation ?? null };
+}
+
+// predicción de varios modelos en una sola petición (un solo preprocesamiento) + consenso entre ellos
+async function getMultiPrediction(indicadores = {}, models = null) {
+  const payload = {};
+  if (models) payload.models = models;
+  MODEL_COLUMNS.forEach((col) => {
+    payload[col] = indicadores[col] ?? 0;
+  });
+
+  const { data } = await axios.post(`${ML_BASE_URL}/predict/multi`, payload, {
+    headers: { 'Content-Type': 'application/json' },
+    timeout: 10000,
+  });
+
+  return { predictions: data.predictions ?? {}, consensus: data.consensus ?? null, modelErrors: data.model_errors ?? {} };
+}
+
+// trabajos asíncronos: para lotes grandes o modelos lentos que no caben en el timeout de /predict
+async function submitJob(type, params = {}) {
+  const { data } = await axios.post(`${ML_BASE_URL}/jobs`, { type, params }, {
+    headers: { 'Content-Type': 'application/json' },
+    timeout: 10000,
+  });
+  return data.id;
+}
+
+async function getJob(id) {
+  const { data } = await axios.get(`${ML_BASE_URL}/jobs/${id}`, { timeout: 10000 });
+  return data;
+}
+
 module.exports = {
   getPrediction,
+  getExplanation,
+  getMultiPrediction,
+  submitJob,
+  getJob,
   MODEL_COLUMNS,
 };
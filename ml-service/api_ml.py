@@ -1,81 +1,747 @@
 # api_ml.py
 import os
-from flask import Flask, request, jsonify, send_from_directory
-import joblib
-import pandas as pd
-import glob
+import json
+import time
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from flask import Flask, g, request, jsonify, send_from_directory
+
+from model_registry import ModelLoadError
+from prediction_cache import PredictionCache
+from artifact_manager import ArtifactManager
+from metrics_index import TABLES as METRICS_TABLES
+from extractor import (ANALYSIS_VERSION, ExtractionError, analizar, indicadores_desde_analisis, inferir_anio,
+                       js_trim, pdf_text, pdf_text_backend)
+from explain import explain_row
+from jobs import JobQueue, JobStore, QueueFull, UnknownJobType
+from pdf_store import PdfStore, digest as pdf_digest
+from plots import render as render_plot
+from profiling import peak_rss_mb
+from telemetry import CONTENT_TYPE as METRICS_CONTENT_TYPE, NULL_TRACE, Registry, Trace
 
 BASE_DIR = os.path.dirname(__file__)
 STATIC_DIR = os.path.join(BASE_DIR, "Static")
 
 app = Flask(__name__, static_folder=STATIC_DIR)
 
+# límites del registro de modelos (0 = sin límite)
+MAX_MODELS = int(os.environ.get("ML_MAX_MODELS", "3"))
+MAX_MODEL_MB = float(os.environ.get("ML_MAX_MODEL_MB", "0"))
+# usar los artefactos mmap de Static/shared (python shared_artifacts.py) cuando existan
+SHARED_ARTIFACTS = os.environ.get("ML_SHARED_ARTIFACTS", "1") == "1"
+# motor de inferencia: "compiled" (tree_engine) o "sklearn"; por modelo con
+# ML_ENGINE_OVERRIDES="tesis=sklearn,RandomForest=compiled"
+ENGINE = os.environ.get("ML_ENGINE", "compiled")
+ENGINE_OVERRIDES = dict(
+    kv.split("=", 1) for kv in os.environ.get("ML_ENGINE_OVERRIDES", "").split(",") if "=" in kv
+)
+# hilos para evaluar varios modelos a la vez en /predict/multi (los crea el primer uso, tras el fork)
+MULTI_WORKERS = int(os.environ.get("ML_MULTI_WORKERS", "4"))
+multi_pool = ThreadPoolExecutor(max_workers=max(1, MULTI_WORKERS), thread_name_prefix="multi")
+# segundos entre comprobaciones de artefactos nuevos en Static/ (0 = sin recarga en caliente)
+RELOAD_INTERVAL = float(os.environ.get("ML_RELOAD_INTERVAL", "10"))
+
+# caché de predicciones (ML_CACHE_SIZE=0 la desactiva)
+prediction_cache = PredictionCache(
+    maxsize=int(os.environ.get("ML_CACHE_SIZE", "4096")),
+    ttl=float(os.environ.get("ML_CACHE_TTL", "3600")),
+    decimals=int(os.environ.get("ML_CACHE_DECIMALS", "9")),
+)
+
+# cola de trabajos para operaciones lentas (POST /jobs); resultados en SQLite bajo Static/
+job_queue = JobQueue(
+    JobStore(os.environ.get("ML_JOB_DB", os.path.join(STATIC_DIR, "jobs.sqlite3")),
+             timeout=float(os.environ.get("ML_JOB_TIMEOUT", "3600"))),
+    workers=int(os.environ.get("ML_JOB_WORKERS", "2")),
+    max_pending=int(os.environ.get("ML_JOB_MAX_PENDING", "32")),
+    ttl=float(os.environ.get("ML_JOB_TTL", "86400")),
+)
+
+# PDFs ya vistos por /extract, por SHA-256 de sus bytes (ML_PDF_STORE=0 lo desactiva)
+pdf_store = PdfStore(os.environ.get("ML_PDF_DB", os.path.join(STATIC_DIR, "pdf_store.sqlite3")),
+                     pdf_text_backend(), ANALYSIS_VERSION) \
+    if os.environ.get("ML_PDF_STORE", "1") == "1" else None
+
 # cargar artefactos desde Static
-models = {}
-model_metrics = pd.DataFrame()
-try:
-    # cargar scaler y columnas como ya tenías
-    scaler = joblib.load(os.path.join(STATIC_DIR, "scaler_tesis.pkl"))
-    model_columns = joblib.load(os.path.join(STATIC_DIR, "model_columns.pkl"))
-    # cargar todos los modelos guardados modelo_*.pkl
-    for p in glob.glob(os.path.join(STATIC_DIR, "modelo_*.pkl")):
-        name = os.path.basename(p).replace("modelo_","").replace(".pkl","")
-        try:
-            models[name] = joblib.load(p)
-        except Exception:
-            pass
-    # cargar CSV de métricas si existe
-    mc_path = os.path.join(STATIC_DIR, "model_comparison.csv")
-    if os.path.exists(mc_path):
-        model_metrics = pd.read_csv(mc_path)
-    print("Artefactos cargados desde Static. Modelos:", list(models.keys()))
-except Exception as e:
-    print("ERROR cargando artefactos:", e)
-
-def clean_value(col_name, value):
-    if value is None:
+# los modelo_*.pkl se indexan sin cargarlos: cada modelo se carga en su primer uso
+artifacts = ArtifactManager(
+    STATIC_DIR,
+    registry_kwargs={
+        "max_models": MAX_MODELS,
+        "max_bytes": int(MAX_MODEL_MB * 1024 * 1024),
+        "shared": SHARED_ARTIFACTS,
+        "engine": ENGINE,
+        "engines": ENGINE_OVERRIDES,
+    },
+    interval=RELOAD_INTERVAL,
+    on_swap=lambda arts: prediction_cache.check_version(arts.version),
+)
+artifacts.load()
+
+# =========================
+# MÉTRICAS (GET /metrics)
+# =========================
+# ML_METRICS=0 desactiva los tiempos por etapa; contadores y gauges siguen activos
+STAGE_METRICS = os.environ.get("ML_METRICS", "1") == "1"
+
+def resident_model_bytes():
+    arts = artifacts.current
+    if arts is None:
+        return {}
+    return {(e["name"],): e["bytes"] for e in arts.models.info()["resident"]}
+
+def process_peak_rss():
+    rss = peak_rss_mb()
+    return {(): int(rss * 1024 * 1024)} if rss is not None else {}
+
+telemetry = Registry()
+REQUESTS = telemetry.counter("ml_requests_total", "Peticiones atendidas por endpoint y código HTTP", ("endpoint", "status"))
+REQUEST_SECONDS = telemetry.histogram("ml_request_seconds", "Latencia total de cada petición", ("endpoint",))
+IN_FLIGHT = telemetry.gauge("ml_requests_in_flight", "Peticiones en curso en este proceso")
+STAGE_SECONDS = telemetry.histogram(
+    "ml_stage_seconds",
+    "Tiempo por etapa de la inferencia (json, validate, clean, cache, load, scale, predict, explain, metrics, serialize)",
+    ("model", "stage"))
+ERRORS = telemetry.counter("ml_errors_total", "Peticiones rechazadas por motivo", ("endpoint", "reason"))
+ROW_ERRORS = telemetry.counter("ml_batch_row_errors_total", "Filas de lote rechazadas por motivo", ("model", "reason"))
+ROWS = telemetry.counter("ml_predicted_rows_total", "Tesis calificadas (incluye aciertos de caché)", ("model",))
+PLOT_ERRORS = telemetry.counter("ml_plot_render_errors_total", "Figuras de /plots que no se pudieron dibujar (se sirve el PNG anterior)")
+PDF_LOOKUPS = telemetry.counter("ml_pdf_store_lookups_total", "PDFs de /extract ya vistos (hit) o nuevos (miss)", ("result",))
+telemetry.gauge("ml_model_resident_bytes", "Memoria aproximada de cada modelo residente", ("model",),
+                collect=resident_model_bytes)
+telemetry.gauge("ml_process_peak_rss_bytes", "Pico de memoria residente del proceso", collect=process_peak_rss)
+
+def new_trace():
+    return Trace() if STAGE_METRICS else NULL_TRACE
+
+def error_response(reason, body, status):
+    ERRORS.inc(request.endpoint or "unknown", reason)
+    return jsonify(body), status
+
+@app.before_request
+def start_artifact_watcher():
+    # arrancar el vigilante en el proceso que atiende (también tras el fork de gunicorn)
+    artifacts.start()
+
+@app.before_request
+def start_request_metrics():
+    g.request_t0 = time.perf_counter()
+    IN_FLIGHT.inc()
+
+@app.after_request
+def record_request_metrics(response):
+    endpoint = request.endpoint or "unknown"
+    REQUESTS.inc(endpoint, str(response.status_code))
+    t0 = g.get("request_t0")
+    if t0 is not None:
+        REQUEST_SECONDS.observe(time.perf_counter() - t0, endpoint)
+    return response
+
+@app.teardown_request
+def end_request_metrics(exc):
+    if g.pop("request_t0", None) is not None:
+        IN_FLIGHT.dec()
+
+@app.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    return app.response_class(telemetry.render(), mimetype=None, content_type=METRICS_CONTENT_TYPE)
+
+def json_response(fields, raw):
+    # respuesta JSON que incrusta fragmentos ya serializados (raw) sin volver a codificarlos
+    parts = {k: json.dumps(v, ensure_ascii=False) for k, v in fields.items()}
+    parts.update(raw)
+    body = "{" + ",".join(json.dumps(k) + ":" + parts[k] for k in sorted(parts)) + "}"
+    return app.response_class(body + "\n", mimetype="application/json")
+
+def metrics_table(value):
+    # "base" | "tuned" | None (por defecto según el modelo: tuned_* -> tuned); una lista u
+    # objeto JSON no es una tabla (y no se puede buscar en METRICS_TABLES)
+    if value is None or (isinstance(value, str) and value in METRICS_TABLES):
+        return value, None
+    return None, error_response("invalid_metrics_table", {"error": f"Tabla de métricas '{value}' no válida", "available": list(METRICS_TABLES)}, 400)
+
+def explain_option(value):
+    # "explain": true / 1 / "true" -> todas las features; un entero N > 1 -> las N de mayor peso
+    if value is None or value is False or str(value).lower() in ("", "0", "false", "no"):
+        return None
+    if value is True or str(value).lower() in ("1", "true", "yes", "si", "sí"):
+        return 0
+    try:
+        return max(0, int(value))
+    except (TypeError, ValueError):
         return 0
-    v = str(value).replace(",", ".")
-    if "%" in col_name:
-        v = v.replace("%", "")
-        return pd.to_numeric(v, errors="coerce") / 100.0
-    return pd.to_numeric(v, errors="coerce")
+
+def explain_vector(arts, model_name, raw, top):
+    # contribuciones por feature de un vector limpio sin escalar (1, f); no toca `raw`
+    Xs = arts.preprocessor.scale_inplace(raw.copy())
+    return explain_row(arts.models.get(model_name), arts.preprocessor.columns, Xs, raw[0], top or None)
+
+def predict_vector(arts, model_name, X, trace=NULL_TRACE):
+    # predicción de un vector limpio (1, f), pasando por la caché; X se escala en sitio
+    ROWS.inc(model_name)
+    cache_key = None
+    if prediction_cache.enabled:
+        cache_key = prediction_cache.key(model_name, arts.version, X)
+        pred = prediction_cache.get(cache_key)
+        trace.mark("cache")
+        if pred is not None:
+            return pred
+    model = arts.models.get(model_name)
+    trace.mark("load")
+    Xs = arts.preprocessor.scale_inplace(X)
+    trace.mark("scale")
+    pred = model.predict(Xs).tolist()
+    trace.mark("predict")
+    if cache_key is not None:
+        prediction_cache.put(cache_key, pred)
+    return pred
 
 @app.route("/predict", methods=["POST"])
 def predict():
-    if not models or scaler is None:
-        return jsonify({"error":"Modelos no disponibles. Ejecutar train_model primero."}), 500
+    # un solo conjunto de artefactos durante toda la petición
+    arts = artifacts.current
+    if arts is None or not arts.models:
+        return error_response("unavailable", {"error":"Modelos no disponibles. Ejecutar train_model primero."}, 500)
+    models, preprocessor = arts.models, arts.preprocessor
 
+    trace = new_trace()
     data = request.get_json()
+    trace.mark("json")
     if not data:
-        return jsonify({"error":"JSON vacío"}), 400
+        return error_response("empty_json", {"error":"JSON vacío"}, 400)
 
     # permitir seleccionar modelo con "model" en el payload (ej: {"model":"RandomForest", ...features...})
-    model_name = data.pop("model", None) or (next(iter(models.keys())) if models else None)
+    model_name = data.pop("model", None) or models.default_name()
     if model_name not in models:
-        return jsonify({"error":f"Modelo '{model_name}' no disponible", "available": list(models.keys())}), 400
+        return error_response("unknown_model", {"error":f"Modelo '{model_name}' no disponible", "available": models.names()}, 400)
+    # métricas "base" o "tuned" con "metrics" en el payload o ?metrics=
+    table, err = metrics_table(data.pop("metrics", None) or request.args.get("metrics"))
+    if err:
+        return err
+    # contribución de cada feature con "explain": true (o N) en el payload o ?explain=
+    explain = explain_option(data.pop("explain", None) or request.args.get("explain"))
 
     # validar columnas extra
-    extra = set(data.keys()) - set(model_columns)
+    extra = preprocessor.unknown_columns(data)
     if extra:
-        return jsonify({"error":"Columnas desconocidas", "extra": list(extra)}), 400
+        return error_response("unknown_columns", {"error":"Columnas desconocidas", "extra": extra}, 400)
+    trace.mark("validate")
+
+    X = preprocessor.clean_one(data)
+    # ±inf ("inf", "1e400"): entrada inválida del cliente, como las demás (400)
+    bad = preprocessor.non_finite_columns(X[0])
+    if bad:
+        return error_response("non_finite", {"error": "Valores no finitos", "columns": bad}, 400)
+    # copia sin escalar: predict_vector escala X en sitio
+    raw = X.copy() if explain is not None else None
+    trace.mark("clean")
+    try:
+        pred = predict_vector(arts, model_name, X, trace)
+    except ModelLoadError as e:
+        return error_response("model_load", {"error": str(e)}, 500)
+    out = {"model": model_name, "prediction": pred[0]}
+    if explain is not None:
+        out["explanation"] = explain_vector(arts, model_name, raw, explain)
+        trace.mark("explain")
+    # métricas precomputadas para ese modelo (fragmento JSON, "{}" si no existen)
+    metrics = arts.metrics.fragment(model_name, table)
+    trace.mark("metrics")
+
+    resp = json_response(out, {"metrics": metrics})
+    trace.mark("serialize")
+    trace.flush(STAGE_SECONDS, model_name)
+    return resp
+
+def parse_batch_payload():
+    # acepta un arreglo JSON, un objeto {"model": ..., "items": [...]} o NDJSON (una tesis por línea)
+    model_name = request.args.get("model")
+    table = request.args.get("metrics")
+    if request.mimetype in ("application/x-ndjson", "application/jsonl"):
+        items = []
+        for line in request.get_data(as_text=True).splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                items.append(json.loads(line))
+            except ValueError:
+                items.append(None)
+        return model_name, table, items
+
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        model_name = data.get("model") or model_name
+        table = data.get("metrics") or table
+        data = data.get("items")
+    return model_name, table, data
+
+def validate_batch_row(preprocessor, item):
+    if not isinstance(item, dict):
+        return {"error": "Fila inválida: se esperaba un objeto JSON"}
+    extra = preprocessor.unknown_columns(item)
+    if extra:
+        return {"error": "Columnas desconocidas", "extra": extra}
+    return None
+
+def drop_non_finite(preprocessor, X, valid_idx, errors, names):
+    # saca del lote las filas limpias con ±inf y las deja como error por fila
+    bad = ~np.isfinite(X).all(axis=1)
+    if not bad.any():
+        return X, valid_idx
+    for j in np.flatnonzero(bad):
+        errors.append({"index": valid_idx[j], "error": "Valores no finitos",
+                       "columns": preprocessor.non_finite_columns(X[j])})
+        for n in names:
+            ROW_ERRORS.inc(n, "non_finite")
+    errors.sort(key=lambda e: e["index"])
+    return X[~bad], [i for i, b in zip(valid_idx, bad) if not b]
+
+def score_batch(arts, model_name, items, trace=NULL_TRACE):
+    # predicciones por fila + errores de validación por fila; lo usan /predict/batch y los trabajos
+    preprocessor = arts.preprocessor
+    model = arts.models.get(model_name)
+    trace.mark("load")
+
+    # validar cada fila por separado: una fila mala no invalida el lote
+    errors = []
+    valid_idx = []
+    rows = []
+    for i, item in enumerate(items):
+        err = validate_batch_row(preprocessor, item)
+        if err:
+            errors.append({"index": i, **err})
+            ROW_ERRORS.inc(model_name, "unknown_columns" if "extra" in err else "invalid_row")
+            continue
+        valid_idx.append(i)
+        rows.append(item)
+    trace.mark("validate")
+
+    predictions = [None] * len(items)
+    if rows:
+        X, valid_idx = drop_non_finite(preprocessor, preprocessor.clean_many(rows), valid_idx, errors, [model_name])
+        trace.mark("clean")
+    if valid_idx:
+        ROWS.inc(model_name, amount=len(valid_idx))
+        keys = [None] * len(valid_idx)
+        todo = list(range(len(valid_idx)))
+        if prediction_cache.enabled:
+            todo = []
+            for j in range(len(valid_idx)):
+                keys[j] = prediction_cache.key(model_name, arts.version, X[j])
+                hit = prediction_cache.get(keys[j])
+                if hit is None:
+                    todo.append(j)
+                else:
+                    predictions[valid_idx[j]] = hit[0]
+            trace.mark("cache")
+        if todo:
+            # una sola matriz para las filas no cacheadas: un transform y un predict
+            Xt = preprocessor.scale_inplace(X[todo])
+            trace.mark("scale")
+            pred = model.predict(Xt).tolist()
+            trace.mark("predict")
+            for j, p in zip(todo, pred):
+                predictions[valid_idx[j]] = p
+                if keys[j] is not None:
+                    prediction_cache.put(keys[j], [p])
+    return predictions, errors, len(valid_idx)
+
+@app.route("/predict/batch", methods=["POST"])
+def predict_batch():
+    arts = artifacts.current
+    if arts is None or not arts.models:
+        return error_response("unavailable", {"error":"Modelos no disponibles. Ejecutar train_model primero."}, 500)
+    models = arts.models
+
+    trace = new_trace()
+    model_name, table, items = parse_batch_payload()
+    trace.mark("json")
+    if not isinstance(items, list) or not items:
+        return error_response("invalid_payload", {"error":"Se esperaba una lista no vacía de tesis"}, 400)
+    table, err = metrics_table(table)
+    if err:
+        return err
+
+    model_name = model_name or models.default_name()
+    if model_name not in models:
+        return error_response("unknown_model", {"error":f"Modelo '{model_name}' no disponible", "available": models.names()}, 400)
+    trace.skip()
+    try:
+        predictions, errors, n_ok = score_batch(arts, model_name, items, trace)
+    except ModelLoadError as e:
+        return error_response("model_load", {"error": str(e)}, 500)
+    metrics = arts.metrics.fragment(model_name, table)
+    trace.mark("metrics")
+
+    resp = json_response({
+        "model": model_name,
+        "n": len(items),
+        "n_ok": n_ok,
+        "predictions": predictions,
+        "errors": errors,
+    }, {"metrics": metrics})
+    trace.mark("serialize")
+    trace.flush(STAGE_SECONDS, model_name)
+    return resp
+
+# =========================
+# VARIOS MODELOS (POST /predict/multi)
+# =========================
+# Una tesis (como /predict) o "items", contra "models": [...] o "all". Valida, limpia
+# y escala una vez y corre los modelos en multi_pool; devuelve la predicción de cada
+# modelo, un consenso por tesis (media, mediana, desviación, mínimo, máximo y
+# spread) y los errores por modelo (uno que no carga no tumba la respuesta). El
+# backend lo usa con mlService.getMultiPrediction().
+# prefijos de variantes que no entran en la selección por defecto: mejor_X es una copia
+# de X y compact_X una aproximación de X; con "models": "all" sí se incluyen
+MULTI_SKIP_PREFIXES = ("mejor_", "compact_")
+
+def default_multi_models(models):
+    # sin "models": los modelos residentes (ninguno se expulsa, tampoco el de /predict) más
+    # las familias que quepan en ML_MAX_MODELS; pedir más modelos que ese cupo, con una
+    # lista o "all", recarga pickles en cada petición
+    names = models.resident_names()
+    if not models.max_bytes:
+        for n in models.names():
+            if models.max_models and len(names) >= models.max_models:
+                break
+            if n not in names and not n.startswith(MULTI_SKIP_PREFIXES):
+                names.append(n)
+    return names or [models.default_name()]
+
+def run_model(arts, model_name, Xs):
+    # predicción de un modelo sobre la matriz ya escalada (compartida, solo lectura)
+    t0 = time.perf_counter()
+    pred = arts.models.get(model_name).predict(Xs)
+    if STAGE_METRICS:
+        STAGE_SECONDS.observe(time.perf_counter() - t0, model_name, "predict")
+    return np.asarray(pred, dtype=np.float64).ravel()
+
+def consensus(P):
+    # P: (modelos, filas) -> estadísticos por fila entre los modelos que respondieron
+    return {
+        "mean": P.mean(axis=0).tolist(),
+        "median": np.median(P, axis=0).tolist(),
+        "std": P.std(axis=0).tolist(),
+        "min": P.min(axis=0).tolist(),
+        "max": P.max(axis=0).tolist(),
+        "spread": np.ptp(P, axis=0).tolist(),
+    }
+
+@app.route("/predict/multi", methods=["POST"])
+def predict_multi():
+    # una o varias tesis contra varios modelos: se parsea, limpia y escala una sola vez
+    # {"models": [...] | "all", "items": [...]} o una tesis suelta como en /predict
+    arts = artifacts.current
+    if arts is None or not arts.models:
+        return error_response("unavailable", {"error":"Modelos no disponibles. Ejecutar train_model primero."}, 500)
+    models, preprocessor = arts.models, arts.preprocessor
+
+    trace = new_trace()
+    data = request.get_json(silent=True)
+    trace.mark("json")
+    if not isinstance(data, dict) or not data:
+        return error_response("invalid_payload", {"error": "Se esperaba un objeto JSON"}, 400)
+    names = data.pop("models", None) or request.args.get("models")
+    table, err = metrics_table(data.pop("metrics", None) or request.args.get("metrics"))
+    if err:
+        return err
+    single = "items" not in data
+    items = [data] if single else data.get("items")
+    if not isinstance(items, list) or not items:
+        return error_response("invalid_payload", {"error":"Se esperaba una lista no vacía de tesis"}, 400)
+
+    if names == "all":
+        names = models.names()
+    elif isinstance(names, str):
+        names = [n.strip() for n in names.split(",") if n.strip()]
+    names = names or default_multi_models(models)
+    unknown = [n for n in names if n not in models]
+    if unknown:
+        return error_response("unknown_model", {"error": f"Modelos no disponibles: {unknown}", "available": models.names()}, 400)
+
+    errors, valid_idx, rows = [], [], []
+    for i, item in enumerate(items):
+        err = validate_batch_row(preprocessor, item)
+        if err:
+            errors.append({"index": i, **err})
+            for n in names:
+                ROW_ERRORS.inc(n, "unknown_columns" if "extra" in err else "invalid_row")
+            continue
+        valid_idx.append(i)
+        rows.append(item)
+    if single and errors:
+        return error_response("unknown_columns", {"error": errors[0]["error"], "extra": errors[0].get("extra", [])}, 400)
+    trace.mark("validate")
+
+    predictions, model_errors, done = {}, {}, []
+    if rows:
+        X, valid_idx = drop_non_finite(preprocessor, preprocessor.clean_many(rows), valid_idx, errors, names)
+        trace.mark("clean")
+        if single and errors:
+            return error_response("non_finite", {"error": errors[0]["error"], "columns": errors[0]["columns"]}, 400)
+    if valid_idx:
+        Xs = preprocessor.scale_inplace(X)
+        trace.mark("scale")
+        futures = {n: multi_pool.submit(run_model, arts, n, Xs) for n in names}
+        P = []
+        for n, fut in futures.items():
+            try:
+                p = fut.result()
+            except ModelLoadError as e:
+                # un modelo que no carga no tumba la respuesta: el consenso sale del resto
+                model_errors[n] = str(e)
+                ERRORS.inc("predict_multi", "model_load")
+                continue
+            ROWS.inc(n, amount=len(valid_idx))
+            done.append(n)
+            P.append(p)
+            full = [None] * len(items)
+            for i, v in zip(valid_idx, p.tolist()):
+                full[i] = v
+            predictions[n] = full[0] if single else full
+        trace.mark("models")
+        stats = {}
+        if P:
+            for k, v in consensus(np.vstack(P)).items():
+                full = [None] * len(items)
+                for i, x in zip(valid_idx, v):
+                    full[i] = x
+                stats[k] = full[0] if single else full
+
+    fields = {"models": done, "predictions": predictions, "consensus": stats if valid_idx else {},
+              "model_errors": model_errors}
+    if not single:
+        fields.update(n=len(items), n_ok=len(valid_idx), errors=errors)
+    # métricas precomputadas de cada modelo, incrustadas sin volver a serializarlas
+    metrics = "{" + ",".join(json.dumps(n) + ":" + arts.metrics.fragment(n, table) for n in done) + "}"
+    trace.mark("metrics")
+    resp = json_response(fields, {"metrics": metrics})
+    trace.mark("serialize")
+    trace.flush(STAGE_SECONDS, "multi")
+    return resp
+
+# =========================
+# TRABAJOS ASÍNCRONOS
+# =========================
+def run_predict_batch_job(params):
+    # mismo contrato que /predict/batch: {"model": ..., "metrics": ..., "items": [...]}
+    arts = artifacts.current
+    if arts is None or not arts.models:
+        raise RuntimeError("Modelos no disponibles. Ejecutar train_model primero.")
+    items = params.get("items")
+    if not isinstance(items, list) or not items:
+        raise ValueError("Se esperaba una lista no vacía de tesis en 'items'")
+    table = params.get("metrics")
+    if table is not None and not (isinstance(table, str) and table in METRICS_TABLES):
+        raise ValueError(f"Tabla de métricas '{table}' no válida")
+    model_name = params.get("model") or arts.models.default_name()
+    if model_name not in arts.models:
+        raise ValueError(f"Modelo '{model_name}' no disponible")
+    predictions, errors, n_ok = score_batch(arts, model_name, items)
+    return {
+        "model": model_name,
+        "artifact_version": arts.version,
+        "n": len(items),
+        "n_ok": n_ok,
+        "predictions": predictions,
+        "errors": errors,
+        "metrics": json.loads(arts.metrics.fragment(model_name, table)),
+    }
+
+def route_job(view, path, defaults=None):
+    # trabajo que ejecuta una ruta con `params` como cuerpo JSON: mismo contrato, validación
+    # y respuesta que la llamada síncrona; un error 4xx/5xx de la ruta deja el trabajo en failed
+    def run(params):
+        with app.test_request_context(path, method="POST", json={**(defaults or {}), **params}):
+            resp = app.make_response(view())
+        body = resp.get_json()
+        if resp.status_code >= 400:
+            raise ValueError(body.get("error", resp.status) if isinstance(body, dict) else resp.status)
+        return body
+    return run
+
+job_queue.register("predict_batch", run_predict_batch_job)
+# explicaciones (/predict con "explain", por defecto todas las features) y varios modelos
+job_queue.register("explain", route_job(predict, "/predict", {"explain": True}))
+job_queue.register("predict_multi", route_job(predict_multi, "/predict/multi"))
+
+@app.route("/jobs", methods=["POST"])
+def submit_job():
+    # {"type": "predict_batch", "params": {...}} -> 202 con el id del trabajo
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not data.get("type"):
+        return error_response("invalid_payload", {"error": "Se esperaba {\"type\": ..., \"params\": {...}}", "types": sorted(job_queue.handlers)}, 400)
+    params = data.get("params") or {}
+    if not isinstance(params, dict):
+        return error_response("invalid_payload", {"error": "'params' debe ser un objeto JSON"}, 400)
+    try:
+        job_id = job_queue.submit(data["type"], params)
+    except UnknownJobType:
+        return error_response("unknown_job_type", {"error": f"Tipo de trabajo '{data['type']}' no válido", "types": sorted(job_queue.handlers)}, 400)
+    except QueueFull:
+        # backpressure: el cliente reintenta más tarde
+        ERRORS.inc(request.endpoint, "queue_full")
+        resp = jsonify({"error": "Cola de trabajos llena, reintentar más tarde", "max_pending": job_queue.max_pending})
+        resp.headers["Retry-After"] = "5"
+        return resp, 429
+    resp = jsonify({"id": job_id, "status": "queued", "url": f"/jobs/{job_id}"})
+    resp.headers["Location"] = f"/jobs/{job_id}"
+    return resp, 202
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    job = job_queue.store.get(job_id)
+    if job is None:
+        return error_response("not_found", {"error": f"Trabajo '{job_id}' no encontrado"}, 404)
+    return jsonify(job)
+
+@app.route("/jobs", methods=["GET"])
+def jobs_info():
+    return jsonify(job_queue.info())
+
+# =========================
+# EXTRACCIÓN DE INDICADORES
+# =========================
+def read_extract_payload():
+    # PDF crudo (application/pdf), multipart con `file` (como /api/tesis/analyze) o JSON con "text"
+    if request.mimetype == "application/pdf":
+        return None, request.get_data(), dict(request.args)
+    if "file" in request.files:
+        return None, request.files["file"].read(), dict(request.args, **request.form)
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return None, None, {}
+    return data.get("text"), None, data
+
+@app.route("/extract", methods=["POST"])
+def extract():
+    # indicadores (mismos valores que services/indicadores.js) y predicción en una sola llamada
+    arts = artifacts.current
+    if arts is None:
+        return error_response("unavailable", {"error": "Artefactos no disponibles", "detail": artifacts.error}, 500)
+    trace = new_trace()
+    text, pdf_bytes, opts = read_extract_payload()
+    trace.mark("json")
+    if text is None and pdf_bytes is None:
+        return error_response("invalid_payload", {"error": "Se esperaba un PDF (application/pdf o multipart 'file') o JSON con \"text\""}, 400)
+    # PDF ya visto: sus conteos de texto están en pdf_store y no se vuelve a parsear
+    sha = doc = None
+    if pdf_bytes is not None and pdf_store is not None:
+        sha = pdf_digest(pdf_bytes)
+        doc = pdf_store.get_document(sha)
+        PDF_LOOKUPS.inc("hit" if doc else "miss")
+    if doc is None:
+        if pdf_bytes is not None:
+            try:
+                text = pdf_text(pdf_bytes)
+            except ExtractionError as e:
+                return error_response("extraction", {"error": str(e)}, 400)
+        if not isinstance(text, str):
+            return error_response("invalid_payload", {"error": "\"text\" debe ser una cadena"}, 400)
+        texto = js_trim(text)
+        if len(texto) < 10:
+            return error_response("extraction", {"error": "PDF vacío o ilegible."}, 400)
+        doc = {"n_chars": len(texto), "anio": inferir_anio(texto), "stats": analizar(texto)}
+        if sha is not None:
+            pdf_store.put_document(sha, len(pdf_bytes), doc["n_chars"], doc["anio"], doc["stats"])
+        cached = False
+    else:
+        cached = True
+
+    anio = opts.get("anio")
+    if anio in (None, ""):
+        anio = doc["anio"]
+    try:
+        anio = int(anio)
+    except (TypeError, ValueError):
+        return error_response("invalid_payload", {"error": f"Año '{anio}' no válido"}, 400)
+
+    anio_actual = datetime.date.today().year
+    scores = pdf_store.get_scores(sha, arts.version, anio, anio_actual) if cached else None
+    if scores is not None:
+        indicadores, stored = scores
+    else:
+        indicadores, stored = indicadores_desde_analisis(doc["stats"], anio, arts.model_columns, anio_actual), {}
+        if sha is not None:
+            pdf_store.put_scores(sha, arts.version, anio, anio_actual, indicadores)
+    trace.mark("extract")
+    out = {"anio": anio, "n_chars": doc["n_chars"], "source": "pdf" if pdf_bytes is not None else "text",
+           "indicadores": indicadores}
+    if sha is not None:
+        out.update(sha256=sha, cached=cached)
+
+    # "predict": false para solo extraer
+    if str(opts.get("predict", True)).lower() not in ("false", "0", "no"):
+        models = arts.models
+        model_name = opts.get("model") or models.default_name()
+        if model_name not in models:
+            return error_response("unknown_model", {"error":f"Modelo '{model_name}' no disponible", "available": models.names()}, 400)
+        table, err = metrics_table(opts.get("metrics"))
+        if err:
+            return err
+        explain = explain_option(opts.get("explain"))
+        trace.skip()
+        if model_name in stored and explain is None:
+            # mismo PDF, año y versión de artefactos: la predicción guardada
+            out.update(model=model_name, prediction=stored[model_name])
+            trace.mark("cache")
+        else:
+            X = arts.preprocessor.clean_one(indicadores)
+            raw = X.copy() if explain is not None else None
+            trace.mark("clean")
+            try:
+                pred = predict_vector(arts, model_name, X, trace)
+            except ModelLoadError as e:
+                return error_response("model_load", {"error": str(e)}, 500)
+            out.update(model=model_name, prediction=pred[0])
+            if sha is not None and model_name not in stored:
+                pdf_store.put_scores(sha, arts.version, anio, anio_actual, indicadores, model_name, pred[0])
+        if explain is not None:
+            out["explanation"] = explain_vector(arts, model_name, raw, explain)
+            trace.mark("explain")
+        metrics = arts.metrics.fragment(model_name, table)
+        trace.mark("metrics")
+        resp = json_response(out, {"metrics": metrics})
+        trace.mark("serialize")
+        trace.flush(STAGE_SECONDS, model_name)
+        return resp
+    return jsonify(out)
+
+@app.route("/models", methods=["GET"])
+def list_models():
+    # modelos disponibles, residentes en memoria y su tamaño aproximado
+    arts = artifacts.current
+    if arts is None:
+        return error_response("unavailable", {"error": "Artefactos no disponibles", "detail": artifacts.error}, 500)
+    return jsonify(dict(arts.models.info(), version=arts.version))
 
-    row = {col: clean_value(col, data.get(col, 0)) for col in model_columns}
-    df_row = pd.DataFrame([row])[model_columns].fillna(0)
-    X = scaler.transform(df_row)
+@app.route("/artifacts", methods=["GET"])
+def artifacts_info():
+    return jsonify(artifacts.info())
 
-    pred = models[model_name].predict(X).tolist()
-    # obtener métricas precomputadas para ese modelo (si existen)
-    metrics = {}
-    if not model_metrics.empty:
-        r = model_metrics[model_metrics['model']==model_name]
-        if not r.empty:
-            metrics = r.iloc[0].to_dict()
+@app.route("/artifacts/reload", methods=["POST"])
+def artifacts_reload():
+    # forzar la comprobación sin esperar al vigilante (p. ej. al final de train_model)
+    swapped = artifacts.check(force=True)
+    return jsonify(dict(artifacts.info(), swapped=bool(swapped)))
 
-    return jsonify({"model": model_name, "prediction": pred[0], "metrics": metrics})
+@app.route("/cache", methods=["GET", "DELETE"])
+def cache_stats():
+    if request.method == "DELETE":
+        prediction_cache.clear()
+    return jsonify(prediction_cache.stats())
 
-@app.route("/plots/<filename>", methods=["GET"])
+@app.route("/plots/<path:filename>", methods=["GET"])
 def get_plot(filename):
+    # dibujar bajo demanda si hay datos registrados y el PNG falta o está desactualizado
+    try:
+        render_plot(STATIC_DIR, filename)
+    except Exception:
+        PLOT_ERRORS.inc()
+        app.logger.exception("No se pudo dibujar %s", filename)
     return send_from_directory(STATIC_DIR, filename, as_attachment=False)
 
 if __name__ == "__main__":
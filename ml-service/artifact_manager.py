@@ -0,0 +1,205 @@
+# artifact_manager.py
+# Conjuntos versionados de artefactos de Static/ con recarga en caliente.
+# Un ArtifactSet agrupa scaler, columnas, preprocesador, registro de modelos y
+# índice de métricas de una misma versión. ArtifactManager detecta versiones
+# nuevas (Static/manifest.json, o mtimes si no hay manifiesto o los archivos ya
+# no son los que lista, p. ej. un modelo_*.pkl copiado a mano), construye el
+# conjunto nuevo en segundo plano, precarga sus modelos y lo intercambia de
+# forma atómica. Cada petición toma `manager.current` una sola vez, así que las
+# peticiones en curso terminan con el conjunto anterior.
+# train_model.py escribe el manifiesto al terminar. Cada worker revisa Static/ cada
+# ML_RELOAD_INTERVAL segundos (10 por defecto; 0 = sin recarga en caliente);
+# GET /artifacts muestra la versión activa y POST /artifacts/reload fuerza la comprobación.
+import glob
+import hashlib
+import json
+import os
+import threading
+import time
+
+import joblib
+
+import shared_artifacts
+from metrics_index import MetricsIndex
+from model_registry import ModelRegistry, ModelLoadError
+from preprocessing import Preprocessor
+
+MANIFEST = "manifest.json"
+# artefactos que forman parte de un conjunto
+ARTIFACT_PATTERNS = (
+    "modelo_*.pkl", "scaler_tesis.pkl", "model_columns.pkl",
+    "model_comparison.csv", "model_comparison_tuned.csv", "shared/*/meta.json",
+)
+
+
+def _artifact_files(static_dir):
+    files = []
+    for pattern in ARTIFACT_PATTERNS:
+        files.extend(sorted(glob.glob(os.path.join(static_dir, pattern))))
+    return files
+
+
+def artifact_fingerprint(static_dir):
+    # hash barato (nombre, tamaño, mtime) de los artefactos de Static/
+    h = hashlib.sha1()
+    for p in _artifact_files(static_dir):
+        try:
+            st = os.stat(p)
+        except OSError:
+            continue
+        h.update(f"{os.path.relpath(p, static_dir)}|{st.st_size}|{st.st_mtime_ns}\n".encode())
+    return h.hexdigest()[:16]
+
+
+def write_manifest(static_dir):
+    # lo escribe train_model.py al terminar: marca un conjunto completo y consistente
+    files = {}
+    for p in _artifact_files(static_dir):
+        with open(p, "rb") as f:
+            files[os.path.relpath(p, static_dir).replace(os.sep, "/")] = hashlib.sha256(f.read()).hexdigest()
+    version = hashlib.sha256(json.dumps(files, sort_keys=True).encode()).hexdigest()[:16]
+    # huella barata de los mismos archivos: detect_version la compara para notar cambios posteriores
+    manifest = {"version": version, "created_at": time.time(), "files": files,
+                "fingerprint": artifact_fingerprint(static_dir)}
+    tmp = os.path.join(static_dir, MANIFEST + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, os.path.join(static_dir, MANIFEST))
+    return version
+
+
+_stale_warned = set()
+
+
+def detect_version(static_dir):
+    # ("m-<versión del manifiesto>", True) si los artefactos siguen siendo los del manifiesto;
+    # si no, ("f-<huella de tamaños y mtimes>", False)
+    path = os.path.join(static_dir, MANIFEST)
+    fingerprint = artifact_fingerprint(static_dir)
+    if os.path.exists(path):
+        try:
+            with open(path, encoding="utf-8") as f:
+                manifest = json.load(f)
+            version = manifest["version"]
+        except (OSError, ValueError, KeyError):
+            manifest = None
+        if manifest is not None:
+            if "fingerprint" in manifest:
+                current = manifest["fingerprint"] == fingerprint
+            else:
+                # manifiesto anterior a la huella: al menos el mismo conjunto de archivos
+                listed = {os.path.join(static_dir, *p.split("/")) for p in manifest.get("files", {})}
+                current = listed == set(_artifact_files(static_dir))
+            if current:
+                return "m-" + version, True
+            if version not in _stale_warned:
+                _stale_warned.add(version)
+                print(f"AVISO: los artefactos de {static_dir} cambiaron desde {MANIFEST} (versión {version}); "
+                      "se usa la huella de archivos hasta que se vuelva a escribir el manifiesto")
+    return "f-" + fingerprint, False
+
+
+class ArtifactSet:
+    def __init__(self, static_dir, version, registry_kwargs):
+        self.static_dir = static_dir
+        self.version = version
+        self.loaded_at = time.time()
+        self.models = ModelRegistry(static_dir, **registry_kwargs)
+        self.scaler = None
+        if registry_kwargs.get("shared"):
+            self.scaler = shared_artifacts.load_scaler(static_dir)
+        if self.scaler is None:
+            self.scaler = joblib.load(os.path.join(static_dir, "scaler_tesis.pkl"))
+        self.model_columns = joblib.load(os.path.join(static_dir, "model_columns.pkl"))
+        # preprocesamiento precompilado: índice de columnas + parser por columna
+        self.preprocessor = Preprocessor(self.model_columns, self.scaler)
+        # métricas base/tuned serializadas una vez por versión
+        self.metrics = MetricsIndex(static_dir)
+
+    def warm(self, names):
+        # cargar modelos antes del intercambio para no pagar el arranque en frío en una petición
+        for name in names:
+            if name in self.models:
+                try:
+                    self.models.get(name)
+                except ModelLoadError as e:
+                    print("No se pudo precargar", name, "-", e)
+
+    def info(self):
+        return {"version": self.version, "loaded_at": self.loaded_at, "models": self.models.names()}
+
+
+class ArtifactManager:
+    def __init__(self, static_dir, registry_kwargs=None, interval=10.0, on_swap=None):
+        self.static_dir = static_dir
+        self.on_swap = on_swap  # callback(nuevo_conjunto), p. ej. invalidar cachés
+        self.registry_kwargs = dict(registry_kwargs or {})
+        self.interval = interval  # segundos entre comprobaciones; 0 = sin vigilancia
+        self.current = None
+        self.error = None
+        self.reloads = 0
+        self._lock = threading.Lock()
+        self._pending = None  # huella vista en la última comprobación (sin manifiesto)
+        self._thread_pid = None
+        self._stop = threading.Event()
+
+    def load(self):
+        version, _ = detect_version(self.static_dir)
+        return self._swap(version)
+
+    def _swap(self, version):
+        with self._lock:
+            old = self.current
+            try:
+                new = ArtifactSet(self.static_dir, version, self.registry_kwargs)
+            except Exception as e:
+                # se conserva el conjunto anterior si el nuevo está incompleto
+                self.error = f"{type(e).__name__}: {e}"
+                print("ERROR cargando artefactos:", self.error)
+                return False
+            warm = [r["name"] for r in old.models.info()["resident"]] if old else []
+            new.warm(warm or [new.models.default_name()])
+            self.current = new  # asignación atómica: las peticiones nuevas ven el conjunto nuevo
+            self.error = None
+            if self.on_swap is not None:
+                self.on_swap(new)
+            if old is not None:
+                self.reloads += 1
+            print("Artefactos cargados desde Static. Versión:", version, "Modelos:", new.models.names())
+            return True
+
+    def check(self, force=False):
+        version, from_manifest = detect_version(self.static_dir)
+        if self.current is not None and version == self.current.version:
+            self._pending = None
+            return False
+        if not force and not from_manifest and version != self._pending:
+            # sin manifiesto, esperar a que la huella se estabilice entre dos
+            # comprobaciones para no cargar un entrenamiento a medio escribir
+            self._pending = version
+            return False
+        self._pending = None
+        return self._swap(version)
+
+    def _watch(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                print("ERROR vigilando artefactos:", e)
+
+    def start(self):
+        # idempotente y seguro tras fork (gunicorn): un hilo vigilante por proceso
+        if not self.interval or self._thread_pid == os.getpid():
+            return
+        self._thread_pid = os.getpid()
+        threading.Thread(target=self._watch, name="artifact-watcher", daemon=True).start()
+
+    def info(self):
+        cur = self.current
+        return {
+            "current": cur.info() if cur else None,
+            "reloads": self.reloads,
+            "interval": self.interval,
+            "error": self.error,
+        }
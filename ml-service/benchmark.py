@@ -0,0 +1,295 @@
+# benchmark.py
+# Banco de pruebas de inferencia para api_ml.py. Mide latencia (p50/p95/p99) y
+# peticiones por segundo de cada modelo de Static/modelo_*.pkl, para varios
+# tamaños de lote y niveles de concurrencia, con tres destinos:
+#   inproc  llama directamente al camino de /predict y /predict/batch (sin HTTP)
+#   client  pasa por el test client de Flask (enrutado + JSON, sin red)
+#   http    contra un servidor levantado (flask o gunicorn): --url http://127.0.0.1:5000
+# Las cargas se generan a partir de model_columns.json y de las distribuciones del
+# CSV de entrenamiento (filas remuestreadas con un poco de ruido, para que la caché
+# de predicciones no las responda todas). El reporte JSON se puede comparar entre
+# commits o tras un reentrenamiento:
+#   python benchmark.py --target client --batch 1 10 100 --concurrency 1 4
+#   python benchmark.py --target http --url http://127.0.0.1:5000 --out after.json --compare before.json
+# El reporte por defecto va a Static/benchmark_report.json; --compare termina con
+# código 1 si alguna celda empeora más que --threshold (20% por defecto). La caché
+# de predicciones se desactiva salvo con --cache.
+import argparse
+import http.client
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(BASE_DIR, "Static")
+CSV_PATH = os.path.join(BASE_DIR, "Metricas - Hoja 1.csv")
+TARGETS = ("inproc", "client", "http")
+
+
+# =========================
+# CARGAS
+# =========================
+def payload_pool(n=2000, seed=42, noise=0.05):
+    # n tesis sintéticas: filas reales del CSV remuestreadas + ruido de noise * desviación
+    # de cada columna, recortado al rango observado
+    from ingest import read_metrics
+
+    with open(os.path.join(STATIC_DIR, "model_columns.json"), encoding="utf-8") as f:
+        columns = json.load(f)
+    df = read_metrics(CSV_PATH, STATIC_DIR)
+    # la fila de encabezado del CSV entra como ceros (ver ingest.py): no es una tesis real
+    data = df.loc[df["TOTAL"] > 0, columns].to_numpy(dtype=np.float64)
+    rng = np.random.default_rng(seed)
+    rows = data[rng.integers(0, len(data), size=n)]
+    lo, hi, std = data.min(axis=0), data.max(axis=0), data.std(axis=0)
+    rows = np.clip(rows + rng.normal(0.0, 1.0, rows.shape) * std * noise, lo, hi)
+    return [{c: round(float(v), 6) for c, v in zip(columns, row)} for row in rows]
+
+
+# =========================
+# DESTINOS
+# =========================
+class InProcess:
+    # el mismo camino que las rutas, sin Flask ni JSON
+    def __init__(self, api):
+        self.api = api
+
+    def models(self):
+        return self.api.artifacts.current.models.names()
+
+    def call(self, model, items):
+        api = self.api
+        arts = api.artifacts.current
+        if len(items) == 1:
+            X = arts.preprocessor.clean_one(dict(items[0]))
+            api.predict_vector(arts, model, X)
+        else:
+            api.score_batch(arts, model, items)
+
+
+class TestClient:
+    def __init__(self, api):
+        self.api = api
+        self.local = threading.local()
+
+    def models(self):
+        return self.api.artifacts.current.models.names()
+
+    def call(self, model, items):
+        if not hasattr(self.local, "client"):
+            self.local.client = self.api.app.test_client()
+        if len(items) == 1:
+            r = self.local.client.post("/predict", json={"model": model, **items[0]})
+        else:
+            r = self.local.client.post("/predict/batch", json={"model": model, "items": items})
+        if r.status_code != 200:
+            raise RuntimeError(f"HTTP {r.status_code}: {r.get_data(as_text=True)[:200]}")
+
+
+class HttpTarget:
+    # una conexión keep-alive por hilo, como un cliente real frente a gunicorn
+    def __init__(self, url, timeout=60):
+        u = urlparse(url)
+        self.host, self.port = u.hostname, u.port or 80
+        self.timeout = timeout
+        self.local = threading.local()
+
+    def _request(self, method, path, body=None):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = self.local.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        data = json.dumps(body).encode("utf-8") if body is not None else None
+        try:
+            conn.request(method, path, body=data, headers={"Content-Type": "application/json"})
+            r = conn.getresponse()
+            payload = r.read()
+        except (http.client.HTTPException, OSError):
+            conn.close()
+            self.local.conn = None
+            raise
+        if r.status != 200:
+            raise RuntimeError(f"HTTP {r.status}: {payload[:200]!r}")
+        return json.loads(payload)
+
+    def models(self):
+        return self._request("GET", "/models")["available"]
+
+    def call(self, model, items):
+        if len(items) == 1:
+            self._request("POST", "/predict", {"model": model, **items[0]})
+        else:
+            self._request("POST", "/predict/batch", {"model": model, "items": items})
+
+
+def make_target(name, url=None, cache=False):
+    if name == "http":
+        if not url:
+            raise SystemExit("--target http requiere --url")
+        return HttpTarget(url)
+    # sin recarga en caliente y, salvo --cache, sin caché de predicciones: se mide el modelo
+    os.environ.setdefault("ML_RELOAD_INTERVAL", "0")
+    if not cache:
+        os.environ["ML_CACHE_SIZE"] = "0"
+    sys.path.insert(0, BASE_DIR)
+    import api_ml
+    return InProcess(api_ml) if name == "inproc" else TestClient(api_ml)
+
+
+# =========================
+# MEDICIÓN
+# =========================
+def run_cell(target, model, pool, batch, concurrency, requests, warmup=5):
+    # `requests` peticiones de `batch` tesis repartidas entre `concurrency` hilos
+    n_pool = len(pool)
+    batches = [[pool[(i * batch + j) % n_pool] for j in range(batch)] for i in range(requests + warmup)]
+    cell = {"model": model, "batch": batch, "concurrency": concurrency, "requests": requests}
+    try:
+        for items in batches[:warmup]:
+            target.call(model, items)  # carga perezosa del modelo y calentamiento
+    except Exception as e:
+        return {**cell, "ok": 0, "errors": requests, "first_error": f"{type(e).__name__}: {e}"}
+
+    latencies = [None] * requests
+    errors = []
+
+    def one(i):
+        t0 = time.perf_counter()
+        try:
+            target.call(model, batches[warmup + i])
+        except Exception as e:
+            errors.append(f"{type(e).__name__}: {e}")
+            return
+        latencies[i] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    if concurrency <= 1:
+        for i in range(requests):
+            one(i)
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as ex:
+            list(ex.map(one, range(requests)))
+    wall = time.perf_counter() - t0
+
+    lat = np.array([x for x in latencies if x is not None]) * 1000.0
+    ok = len(lat)
+    cell.update({
+        "ok": ok, "errors": len(errors),
+        "rps": ok / wall if wall > 0 else None,
+        "rows_per_s": ok * batch / wall if wall > 0 else None,
+    })
+    if ok:
+        p50, p95, p99 = np.percentile(lat, [50, 95, 99])
+        cell.update({"mean_ms": float(lat.mean()), "p50_ms": float(p50), "p95_ms": float(p95), "p99_ms": float(p99),
+                     "max_ms": float(lat.max())})
+    if errors:
+        cell["first_error"] = errors[0]
+    return cell
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def _artifact_version(target):
+    api = getattr(target, "api", None)
+    if api is not None:
+        return api.artifacts.current.version
+    try:
+        return target._request("GET", "/models").get("version")
+    except Exception:
+        return None
+
+
+def cell_key(c):
+    return (c["model"], c["batch"], c["concurrency"])
+
+
+def compare(report, baseline, threshold=0.2):
+    # diferencias por celda (modelo, lote, concurrencia); regresión = p95 o rps peor que threshold
+    base = {cell_key(c): c for c in baseline["results"]}
+    rows, regressions = [], []
+    for c in report["results"]:
+        b = base.get(cell_key(c))
+        if not b or not c.get("p95_ms") or not b.get("p95_ms"):
+            continue
+        p95 = c["p95_ms"] / b["p95_ms"] - 1.0
+        rps = c["rps"] / b["rps"] - 1.0 if b.get("rps") else 0.0
+        row = {"model": c["model"], "batch": c["batch"], "concurrency": c["concurrency"],
+               "p95_change": p95, "rps_change": rps}
+        rows.append(row)
+        if p95 > threshold or rps < -threshold:
+            regressions.append(row)
+    return rows, regressions
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Latencia y throughput de la API de ML")
+    ap.add_argument("--target", choices=TARGETS, default="inproc")
+    ap.add_argument("--url", default=None, help="URL del servidor para --target http")
+    ap.add_argument("--models", nargs="*", default=None, help="por defecto, todos los modelo_*.pkl")
+    ap.add_argument("--batch", nargs="*", type=int, default=[1, 10, 100])
+    ap.add_argument("--concurrency", nargs="*", type=int, default=[1, 4])
+    ap.add_argument("--requests", type=int, default=200, help="peticiones medidas por celda")
+    ap.add_argument("--pool", type=int, default=2000, help="tesis sintéticas distintas")
+    ap.add_argument("--cache", action="store_true", help="dejar activa la caché de predicciones (inproc/client)")
+    ap.add_argument("--out", default=os.path.join(STATIC_DIR, "benchmark_report.json"))
+    ap.add_argument("--compare", default=None, help="reporte anterior para comparar")
+    ap.add_argument("--threshold", type=float, default=0.2, help="cambio relativo que cuenta como regresión")
+    args = ap.parse_args()
+
+    target = make_target(args.target, args.url, args.cache)
+    pool = payload_pool(args.pool)
+    models = args.models or target.models()
+    results = []
+    for model in models:
+        for batch in args.batch:
+            for conc in args.concurrency:
+                cell = run_cell(target, model, pool, batch, conc, args.requests)
+                results.append(cell)
+                if cell["ok"]:
+                    print(f"{model:24s} lote={batch:<4d} conc={conc:<3d} p50={cell['p50_ms']:8.2f}ms "
+                          f"p95={cell['p95_ms']:8.2f}ms p99={cell['p99_ms']:8.2f}ms {cell['rps']:9.1f} req/s "
+                          f"{cell['rows_per_s']:10.1f} tesis/s")
+                else:
+                    print(f"{model:24s} lote={batch:<4d} conc={conc:<3d} ERROR: {cell.get('first_error')}")
+                    break
+            else:
+                continue
+            break  # el modelo no carga: siguiente modelo
+
+    report = {
+        "meta": {
+            "target": args.target, "url": args.url, "commit": _git_commit(),
+            "artifact_version": _artifact_version(target), "cache": args.cache,
+            "requests": args.requests, "pool": args.pool, "time": time.time(),
+            "python": platform.python_version(), "platform": platform.platform(), "cpu_count": os.cpu_count(),
+        },
+        "results": results,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print("Reporte:", args.out)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        rows, regressions = compare(report, baseline, args.threshold)
+        for r in rows:
+            flag = "  <- regresión" if r in regressions else ""
+            print(f"{r['model']:24s} lote={r['batch']:<4d} conc={r['concurrency']:<3d} "
+                  f"p95 {r['p95_change']:+.1%}  req/s {r['rps_change']:+.1%}{flag}")
+        if regressions:
+            sys.exit(1)
@@ -0,0 +1,227 @@
+# compact.py
+# Exportación compacta de los ensambles de árboles para servir.
+# La curva por etapas (staged_curves.py) muestra que el RMSE se estabiliza mucho
+# antes del último árbol: aquí se elige el subconjunto más pequeño de árboles cuyo
+# RMSE de validación queda dentro de una tolerancia relativa del modelo completo.
+#   - "prefix": los primeros k árboles (único modo válido en GradientBoosting)
+#   - "greedy": selección hacia adelante en bosques (RandomForest, ExtraTrees): en
+#     cada paso se añade el árbol que más baja el RMSE de la media
+# El resultado se guarda como modelo_compact_<nombre>.pkl (el registro lo sirve como
+# cualquier otro modelo) y el motor compilado / Static/shared lo guardan con
+# umbrales y valores de hoja float32 (ver tree_engine.to_float32). Tamaño,
+# latencia y deltas de RMSE quedan en model_comparison.csv.
+# La selección nunca ve el split de test (su RMSE es el que se publica):
+#   - bosques con bootstrap (RandomForest): predicciones OOB sobre el train; cada
+#     árbol solo cuenta en las muestras que no vio
+#   - el resto (GradientBoosting, ExtraTrees): validación cruzada sobre el train
+#     (CV_FOLDS copias del modelo); la curva por nº de árboles se mide con las
+#     predicciones fuera de fold y se toman los primeros k del modelo completo
+#     (solo "prefix": los índices de "greedy" no se trasladan entre ajustes)
+# En train_model.py: --compact-tolerance (1% por defecto, ML_COMPACT_TOL) y
+# --compact-method greedy.
+#   python compact.py [--tolerance 0.01] [--method prefix|greedy]
+import argparse
+import copy
+import time
+
+import numpy as np
+from sklearn.base import clone
+from sklearn.model_selection import KFold
+
+from tree_engine import COMPACT_PREFIX, compile_model
+
+METHODS = ("prefix", "greedy")
+DEFAULT_TOLERANCE = 0.01  # 1% de RMSE sobre el modelo completo
+CV_FOLDS = 5  # folds del train para elegir árboles cuando no hay OOB
+
+
+def _rmse(pred, y):
+    err = pred - y
+    return float(np.sqrt(np.mean(err * err)))
+
+
+def oob_mask(model, n_samples):
+    # (T, n) True donde la muestra de train quedó fuera del bootstrap del árbol, o None
+    if not getattr(model, "bootstrap", False) or not hasattr(model, "estimators_samples_"):
+        return None
+    mask = np.ones((len(model.estimators_), n_samples), dtype=bool)
+    for t, drawn in enumerate(model.estimators_samples_):
+        mask[t, drawn] = False
+    return mask
+
+
+def _masked_rmse(sums, counts, y, fallback):
+    # RMSE de sums / counts (por fila de sums); una muestra sin ningún árbol OOB cuenta como
+    # si se predijera `fallback` (la media del train), así todos los subconjuntos se comparan
+    # sobre las mismas muestras y pocos árboles no ganan por cubrir pocas
+    pred = np.where(counts > 0, sums / np.maximum(counts, 1), fallback)
+    err = pred - y
+    return np.sqrt(np.mean(err * err, axis=-1))
+
+
+def tree_contributions(model, X):
+    # (P (T, n), agregado, base, escala) desde el motor compilado, o None si no es un ensamble de árboles
+    compiled = compile_model(model)
+    if compiled is None or compiled.kind != "forest":
+        return None
+    P = compiled.arrays["value"][compiled.leaves(X)].T
+    return P, compiled.meta["aggregate"], compiled.meta["base"], compiled.meta["scale"]
+
+
+def staged(P, aggregate, base, scale):
+    # (T, n): predicción con los primeros k árboles, k = 1..T
+    csum = np.cumsum(P, axis=0)
+    if aggregate == "mean":
+        return csum / np.arange(1, P.shape[0] + 1)[:, None]
+    return base + scale * csum
+
+
+def oob_curve(P, y, mask):
+    # RMSE por nº de árboles de un bosque de media; cada árbol cuenta solo en las muestras que no vio
+    return _masked_rmse(np.cumsum(P * mask, axis=0), np.cumsum(mask, axis=0), y[None, :], y.mean())
+
+
+def cv_curve(model, X, y, folds=CV_FOLDS, random_state=42):
+    # RMSE por nº de árboles con predicciones fuera de fold de copias del modelo
+    preds, ys = [], []
+    for fit_idx, val_idx in KFold(folds, shuffle=True, random_state=random_state).split(X):
+        P, aggregate, base, scale = tree_contributions(clone(model).fit(X[fit_idx], y[fit_idx]), X[val_idx])
+        preds.append(staged(P, aggregate, base, scale))
+        ys.append(y[val_idx])
+    T = min(p.shape[0] for p in preds)
+    err = np.hstack([p[:T] for p in preds]) - np.concatenate(ys)[None, :]
+    return np.sqrt(np.mean(err * err, axis=1))
+
+
+def select_prefix(curve, tolerance):
+    # índices de los primeros k árboles, con el menor k tal que RMSE(k) <= (1 + tolerance) * RMSE(todos)
+    target = curve[-1] * (1.0 + tolerance)
+    return np.arange(int(np.argmax(curve <= target)) + 1)
+
+
+def select_greedy(P, y, tolerance, mask=None):
+    # selección hacia adelante en bosques de media: cada árbol se elige como mucho una vez
+    T = P.shape[0]
+    M = np.ones(P.shape, dtype=bool) if mask is None else mask
+    PM = P * M
+    fallback = y.mean()
+    target = float(_masked_rmse(PM.sum(axis=0), M.sum(axis=0), y, fallback)) * (1.0 + tolerance)
+    chosen = []
+    available = np.ones(T, dtype=bool)
+    total = np.zeros(P.shape[1])
+    count = np.zeros(P.shape[1])
+    while True:
+        # RMSE de la media al añadir cada candidato, todos a la vez
+        scores = _masked_rmse(total[None, :] + PM, count[None, :] + M, y[None, :], fallback)
+        scores[~available] = np.inf
+        best = int(np.argmin(scores))
+        chosen.append(best)
+        available[best] = False
+        total += PM[best]
+        count += M[best]
+        if scores[best] <= target or not available.any():
+            return np.asarray(chosen)
+
+
+def subset_model(model, idx):
+    # copia del estimador de sklearn con solo los árboles idx (comparte los árboles, no los copia)
+    sub = copy.copy(model)
+    idx = np.asarray(idx)
+    if hasattr(model, "staged_predict"):  # GradientBoosting: prefijo
+        k = len(idx)
+        sub.estimators_ = model.estimators_[:k]
+        sub.n_estimators = k
+        if hasattr(model, "n_estimators_"):
+            sub.n_estimators_ = k
+        for attr in ("train_score_", "oob_improvement_", "oob_scores_"):
+            if hasattr(model, attr):
+                setattr(sub, attr, getattr(model, attr)[:k])
+    else:
+        sub.estimators_ = [model.estimators_[i] for i in idx]
+        sub.n_estimators = len(idx)
+    return sub
+
+
+def _latency_ms(predict, X, repeat=50):
+    predict(X)  # calentamiento
+    times = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        predict(X)
+        times.append(time.perf_counter() - t)
+    return float(np.median(times)) * 1000
+
+
+def compact_model(model, X_train, y_train, X_test, y_test, tolerance=DEFAULT_TOLERANCE, method="prefix"):
+    # (modelo podado, reporte) o (None, None) si el modelo no es un ensamble de árboles compilable.
+    # Los árboles se eligen solo con el train (OOB o validación cruzada); X_test es para el reporte
+    if method not in METHODS:
+        raise ValueError(f"Método desconocido: {method}. Opciones: {METHODS}")
+    X_train, X_test = np.asarray(X_train), np.asarray(X_test)
+    y_train = np.asarray(y_train, dtype=np.float64)
+    y_test = np.asarray(y_test, dtype=np.float64)
+    if tree_contributions(model, X_test[:1]) is None:
+        return None, None
+    mask = oob_mask(model, len(X_train))
+    if mask is not None:
+        selection = "oob"
+        P = tree_contributions(model, X_train)[0]
+        if method == "greedy":
+            idx = select_greedy(P, y_train, tolerance, mask)
+        else:
+            idx = select_prefix(oob_curve(P, y_train, mask), tolerance)
+    else:
+        selection, method = "cv", "prefix"
+        idx = select_prefix(cv_curve(model, X_train, y_train), tolerance)
+    sub = subset_model(model, idx)
+
+    full_c = compile_model(model)
+    sub_c = compile_model(sub, float32=True)
+    one = X_test[:1]
+    report = {
+        "method": method,
+        "selection": selection,
+        "trees_full": int(len(model.estimators_)),
+        "trees": int(len(idx)),
+        "rmse_test_full": _rmse(full_c.predict(X_test), y_test),
+        "rmse_test_compact": _rmse(sub_c.predict(X_test), y_test),
+        "size_bytes_full": int(full_c.nbytes),
+        "size_bytes": int(sub_c.nbytes),
+        # motor compilado (el de /predict): una fila y el lote de test
+        "latency_ms_full": _latency_ms(full_c.predict, one),
+        "latency_ms": _latency_ms(sub_c.predict, one),
+        "batch_latency_ms_full": _latency_ms(full_c.predict, X_test, repeat=10),
+        "batch_latency_ms": _latency_ms(sub_c.predict, X_test, repeat=10),
+    }
+    report["rmse_delta"] = (report["rmse_test_compact"] / report["rmse_test_full"] - 1.0
+                            if report["rmse_test_full"] else 0.0)
+    return sub, report
+
+
+def compact_name(name):
+    return COMPACT_PREFIX + name
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Poda los ensambles guardados en Static/stages y muestra tamaño, latencia y RMSE")
+    ap.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="pérdida relativa de RMSE aceptada")
+    ap.add_argument("--method", choices=METHODS, default="prefix")
+    args = ap.parse_args()
+
+    import train_model as tm
+
+    tm.pipeline.run(["split", "fit-baseline", "compare", "tune"])
+    data = tm.pipeline.output("split")
+    candidates = tm.compact_candidates(tm.pipeline.output("fit-baseline"), tm.pipeline.output("compare"),
+                                      tm.pipeline.output("tune"))
+    for name, mdl in candidates.items():
+        sub, rep = compact_model(mdl, data["X_train"], data["y_train"], data["X_test"], data["y_test"],
+                                 args.tolerance, args.method)
+        if sub is None:
+            print(f"{name:24s} sin formato plano, se omite")
+            continue
+        print(f"{name:24s} {rep['trees_full']:4d} -> {rep['trees']:4d} árboles  "
+              f"{rep['size_bytes_full'] / 1e6:7.2f} -> {rep['size_bytes'] / 1e6:6.2f} MB  "
+              f"{rep['latency_ms_full']:6.3f} -> {rep['latency_ms']:6.3f} ms/fila  "
+              f"RMSE test {rep['rmse_test_full']:.4f} -> {rep['rmse_test_compact']:.4f} ({rep['rmse_delta']:+.2%}, "
+              f"selección {rep['selection']})")
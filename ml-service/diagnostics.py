@@ -0,0 +1,251 @@
+# diagnostics.py
+# Diagnóstico de las features frente a TARGET (etapa `diagnose` de train_model.py).
+# Todo se calcula en una pasada sobre la matriz de features, sin bucles por columna:
+#   - coincidencias exactas feature == TARGET (posible data leakage)
+#   - correlación de Pearson de cada feature con TARGET
+#   - columnas constantes
+#   - medias de las top features para cada puntaje (un solo groupby)
+# Los gráficos por puntaje solo se registran (plots.py); se dibujan en un pool de
+# procesos con render_all. También corre por separado sobre el dataset limpio en
+# caché (Static/stages), sin re-entrenar:
+#   python diagnostics.py [--workers N] [--no-render]
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from plots import record_plot, render_all
+
+MAX_SCORE_PLOTS = 30
+MIN_SCORE_SAMPLES = 2
+TOP_K = 8
+
+
+def feature_stats(df, features, target):
+    # DataFrame indexado por feature: corr, matches, pct_match, constant
+    X = df[features].to_numpy()
+    y = df[target].to_numpy()
+    n = len(df)
+
+    # coincidencias exactas: mismo valor (o ambos NaN), como la comparación anterior con astype(str)
+    y_col = y[:, None]
+    eq = (X == y_col) | (pd.isna(X) & pd.isna(y_col))
+    matches = eq.sum(axis=0)
+
+    Xf = X.astype(np.float64)
+    yf = y.astype(np.float64)
+    if np.isnan(Xf).any() or np.isnan(yf).any():
+        # con huecos cada par (feature, TARGET) usa sus propias filas completas
+        corr = df[features].corrwith(df[target]).to_numpy()
+    else:
+        Xc = Xf - Xf.mean(axis=0)
+        yc = yf - yf.mean()
+        with np.errstate(invalid="ignore", divide="ignore"):
+            corr = (Xc.T @ yc) / np.sqrt((Xc * Xc).sum(axis=0) * (yc @ yc))
+        corr[~np.isfinite(corr)] = np.nan
+
+    # nunique(dropna=True) <= 1: todos los valores iguales, o todos NaN (min=inf > max=-inf)
+    valid = ~np.isnan(Xf)
+    lo = np.min(Xf, axis=0, initial=np.inf, where=valid)
+    hi = np.max(Xf, axis=0, initial=-np.inf, where=valid)
+    constant = lo >= hi
+
+    return pd.DataFrame({
+        "corr": corr,
+        "matches": matches.astype(int),
+        "pct_match": matches / n if n else np.zeros(len(features)),
+        "constant": constant,
+    }, index=features)
+
+
+def screen_features(stats, high_corr=0.95):
+    # columnas a retirar antes del split: idénticas a TARGET, correlación > high_corr o constantes
+    abs_corr = stats["corr"].abs()
+    identical = stats.index[stats["pct_match"] == 1.0].tolist()
+    return {
+        "identical": identical,
+        "partial_matches": stats.index[(stats["matches"] > 0) & (stats["pct_match"] < 1.0)].tolist(),
+        "high_corr": abs_corr[abs_corr > high_corr].sort_values(ascending=False).index.tolist(),
+        "low_var": stats.index[stats["constant"]].tolist(),
+    }
+
+
+def score_groups(df, features, target, min_count=MIN_SCORE_SAMPLES, max_scores=MAX_SCORE_PLOTS):
+    # (puntajes a graficar, muestras por puntaje, medias por puntaje x feature) con un solo groupby
+    score_counts = df[target].value_counts().sort_values(ascending=False)
+    scores = score_counts[score_counts >= min_count].index.tolist()[:max_scores]
+    means = df.groupby(target, sort=False)[features].mean()
+    return scores, score_counts, means
+
+
+def score_plot_name(score):
+    return f"diagnostics/puntaje_{str(score).replace(' ', '_')}.png"
+
+
+# -----------------------------
+# Generar resumen diagnóstico detallado + gráficos por puntaje
+# -----------------------------
+def generar_resumen_diagnostico(df, FEATURES, TARGET, STATIC_DIR, models_dict=None, df_results=None, plot=None):
+    # plot(filename, kind, **data) registra una figura; por defecto plots.record_plot
+    plot = plot or (lambda filename, kind, **data: record_plot(STATIC_DIR, filename, kind, **data))
+    os.makedirs(os.path.join(STATIC_DIR, "diagnostics"), exist_ok=True)
+    diag_dir = os.path.join(STATIC_DIR, "diagnostics")
+
+    # 1) Estadísticas generales
+    total_stats = {
+        "min": float(df[TARGET].min()),
+        "max": float(df[TARGET].max()),
+        "mean": float(df[TARGET].mean()),
+        "std": float(df[TARGET].std()),
+        "n_samples": int(len(df))
+    }
+
+    # 2) Correlaciones (abs) y top features
+    stats = feature_stats(df, FEATURES, TARGET)
+    corr = stats["corr"].fillna(0)
+    corr_abs = corr.abs().sort_values(ascending=False)
+    top_features = corr_abs.head(20).index.tolist()
+    top_corr_df = pd.DataFrame({
+        "feature": corr.index,
+        "corr": corr.values,
+        "abs_corr": corr.abs().values
+    }).sort_values("abs_corr", ascending=False)
+    top_corr_df.to_csv(os.path.join(diag_dir, "top_feature_correlations.csv"), index=False)
+
+    # 3) Detección de columnas con coincidencias exactas (data leakage)
+    exact_df = (stats[["pct_match", "matches"]].rename_axis("feature").reset_index()
+                .sort_values("pct_match", ascending=False))
+    exact_df.to_csv(os.path.join(diag_dir, "exact_matches_summary.csv"), index=False)
+
+    # 4) Feature importances / coefficients (si hay modelos)
+    model_explanations = {}
+    if models_dict:
+        for name, mdl in models_dict.items():
+            try:
+                if hasattr(mdl, "feature_importances_"):
+                    imps = mdl.feature_importances_
+                    imp_df = pd.DataFrame({"feature": FEATURES, "importance": imps}).sort_values("importance", ascending=False)
+                    imp_df.to_csv(os.path.join(diag_dir, f"feature_importances_{name}.csv"), index=False)
+                    model_explanations[name] = {
+                        "type": "tree",
+                        "top_features": imp_df.head(10).to_dict(orient="records")
+                    }
+                # Pipeline with Ridge
+                elif hasattr(mdl, "named_steps") and "ridge" in mdl.named_steps:
+                    coef = mdl.named_steps["ridge"].coef_
+                    coef_df = pd.DataFrame({"feature": FEATURES, "coef": coef}).sort_values("coef", key=abs, ascending=False)
+                    coef_df.to_csv(os.path.join(diag_dir, f"coefficients_{name}.csv"), index=False)
+                    model_explanations[name] = {
+                        "type": "linear",
+                        "top_features": coef_df.head(10).to_dict(orient="records")
+                    }
+            except Exception as e:
+                # p. ej. importancias de otra longitud que FEATURES: modelo ajustado con otras columnas
+                print(f"No se pudo explicar el modelo {name}: {type(e).__name__}: {e}")
+
+    # 5) Resumen por puntaje: para cada valor TARGET con >=2 muestras, gráfico de medias de top features.
+    # Las medias de todos los puntajes salen del mismo groupby; aquí solo se registran los datos
+    scores_to_plot, score_counts, means = score_groups(df, top_features, TARGET)
+    for s in scores_to_plot:
+        top = means.loc[s].sort_values(ascending=False).head(TOP_K)
+        plot(score_plot_name(s), "bar_series", dpi=200,
+             figsize=(8, 4), labels=list(top.index), values=top.values, color="steelblue",
+             title=f"Puntaje {s} (n={int(score_counts[s])}): medias de top {TOP_K} features", ylabel="Media")
+
+    # 6) Explicaciones automatizadas para el resumen (por modelo y por puntaje)
+    lines = []
+    lines.append("# Resumen de diagnóstico automático\n")
+    lines.append("## Estadísticas generales de la variable TARGET\n")
+    lines.append(f"- Mínimo: {total_stats['min']}")
+    lines.append(f"- Máximo: {total_stats['max']}")
+    lines.append(f"- Media: {total_stats['mean']:.2f}")
+    lines.append(f"- Desviación estándar: {total_stats['std']:.2f}")
+    lines.append(f"- N muestras: {total_stats['n_samples']}\n")
+
+    lines.append("## Top features por correlación absoluta con TARGET\n")
+    for feat, val in corr_abs.head(10).items():
+        lines.append(f"- {feat}: correlación {val:.3f}")
+
+    # advertencia de leak si alguna feature supera 1% coincidencias exactas
+    suspicious = exact_df[exact_df["pct_match"] >= 0.01]
+    if not suspicious.empty:
+        lines.append("\n## ALERTA: Posible data leakage\n")
+        lines.append("Las siguientes columnas contienen coincidencias exactas con el TARGET en ≥1% de las filas. Se recomienda revisar o eliminar estas columnas antes de entrenar modelos.\n")
+        for _, r in suspicious.iterrows():
+            lines.append(f"- {r['feature']}: {r['pct_match']*100:.2f}% coincidencias ({r['matches']} filas).")
+    else:
+        lines.append("\n## Data leakage: no detectado >1% coincidencias exactas.\n")
+
+    # Añadir explicación por modelo
+    if df_results is not None:
+        lines.append("\n## Resumen por modelo (métricas)\n")
+        for _, r in df_results.sort_values("rmse_test").iterrows():
+            m = r["model"]
+            lines.append(f"- {m}: RMSE test={r['rmse_test']:.3f}, MSE test={r.get('mse_test', float('nan')):.3f}, R² test={r['r2_test']:.4f}")
+            # añadir explicación breve
+            if r["rmse_test"] > (0.15 * total_stats['std']):  # heurística: RMSE > 15% std -> moderado/alto
+                lines.append(f"  - Interpretación: error moderado/alto respecto a la dispersión de los datos.")
+            else:
+                lines.append(f"  - Interpretación: error bajo respecto a la dispersión de los datos.")
+
+            # si hay explicación de importancia
+            if models_dict and m in model_explanations:
+                me = model_explanations[m]
+                topf = ', '.join([t['feature'] for t in me['top_features'][:5]])
+                lines.append(f"  - Features relevantes: {topf}.")
+
+    # Guardar resumen markdown
+    resumen_md = "\n".join(lines)
+    with open(os.path.join(diag_dir, "resumen_analisis.md"), "w", encoding="utf-8") as f:
+        f.write(resumen_md)
+
+    # Guardar también JSON con rutas e índices para UI o inspección
+    out = {
+        "stats": total_stats,
+        "top_features_by_corr": corr_abs.head(20).to_dict(),
+        "suspicious_features": suspicious.to_dict(orient="records"),
+        "models_summary": (df_results.sort_values("rmse_test").to_dict(orient="records") if df_results is not None else []),
+        "plots_by_score": [score_plot_name(s) for s in scores_to_plot]
+    }
+    with open(os.path.join(diag_dir, "resumen_analisis.json"), "w", encoding="utf-8") as f:
+        json.dump(out, f, indent=2, ensure_ascii=False)
+
+    print("Resumen diagnóstico generado en:", diag_dir)
+    return diag_dir
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Regenera Static/diagnostics/ desde el dataset limpio en caché, sin re-entrenar")
+    ap.add_argument("--workers", type=int, default=None, help="procesos para dibujar los gráficos por puntaje")
+    ap.add_argument("--no-render", action="store_true", help="solo registrar los datos de los gráficos")
+    args = ap.parse_args()
+
+    import train_model as tm
+
+    # ingest y clean salen de Static/stages (solo se ejecutan si faltan o están desactualizadas)
+    tm.pipeline.run(["clean"])
+    df = tm.pipeline.output("clean")
+    # modelos y métricas de la última comparación, si existe; no se re-entrena
+    try:
+        compared = tm.pipeline.output("compare")
+    except FileNotFoundError:
+        compared = None
+        print("Sin salida de la etapa compare: el resumen no incluirá modelos.")
+
+    screen = screen_features(feature_stats(df, tm.FEATURES, tm.TARGET))
+    dropped = set(screen["identical"] + screen["high_corr"] + screen["low_var"])
+    features = [f for f in tm.FEATURES if f not in dropped]
+    generar_resumen_diagnostico(
+        df, features, tm.TARGET, tm.STATIC_DIR,
+        models_dict=compared["models"] if compared else None,
+        df_results=pd.DataFrame(compared["results"]).sort_values("rmse_test").reset_index(drop=True) if compared else None,
+    )
+    if not args.no_render:
+        with open(os.path.join(tm.STATIC_DIR, "diagnostics", "resumen_analisis.json"), encoding="utf-8") as f:
+            files = json.load(f)["plots_by_score"]
+        done, skipped, errors = render_all(tm.STATIC_DIR, files, workers=args.workers)
+        print(f"Gráficos por puntaje dibujados: {len(done)}  sin cambios: {len(skipped)}  errores: {len(errors)}")
+        for f, e in errors.items():
+            print(f"  {f}: {e}")
@@ -0,0 +1,113 @@
+# explain.py
+# Contribución de cada feature a una predicción (modo explain de /predict).
+#   - árboles (motor compilado de tree_engine): atribución por camino. Cada nodo
+#     guarda la media de TARGET de sus muestras de entrenamiento (tree_.value); al
+#     bajar de un nodo a su hijo, la diferencia de medias se suma a la feature del
+#     nodo. base + suma de contribuciones = predicción, en O(árboles x profundidad)
+#     sobre las tablas de nodos que ya se compilan al cargar el modelo.
+#   - Ridge (pipeline scaler + ridge): términos lineales exactos coef_j * z_j, con
+#     z = (x - mean_) / scale_ del scaler del pipeline; base = intercept_.
+#   - XGBoost: contribuciones de TreeSHAP del propio booster (pred_contribs).
+# Una SHAP exacta con dataset de fondo tardaría segundos por tesis; esto, milisegundos.
+# Se pide con "explain": true (o ?explain=1; "explain": N para las N de mayor peso)
+# en /predict y /extract; el backend lo usa con mlService.getExplanation().
+import weakref
+
+import numpy as np
+
+from tree_engine import CompiledModel, compile_model
+
+# modelos de sklearn servidos sin motor compilado: se compilan una vez, en la primera explicación
+_compiled = weakref.WeakKeyDictionary()
+
+
+def _as_compiled(model):
+    if isinstance(model, CompiledModel):
+        return model
+    try:
+        return _compiled[model]
+    except (KeyError, TypeError):
+        pass
+    cm = compile_model(model)
+    try:
+        _compiled[model] = cm
+    except TypeError:
+        pass
+    return cm
+
+
+def path_contributions(cm, X):
+    # (base (n,), contribuciones (n, f)) de un ensamble compilado
+    a = cm.arrays
+    feature, threshold, children, value = a["feature"], a["threshold"], a["children"], a["value"]
+    X = np.ascontiguousarray(X, dtype=np.float32)
+    n, n_features = X.shape
+    flat = X.ravel()
+    rows = np.arange(n, dtype=np.intp)[:, None]
+    base = rows * n_features
+    node = np.broadcast_to(np.asarray(a["roots"], dtype=np.intp), (n, cm.n_trees)).copy()
+    root_value = value.take(node).astype(np.float64).sum(axis=1)
+    size = n * n_features
+    contrib = np.zeros(size)
+    for _ in range(cm.meta["depth"]):
+        feat = feature.take(node).astype(np.intp)
+        x = flat.take(base + feat)
+        go_right = ~(x <= threshold.take(node))
+        nxt = children.take(2 * node + go_right)
+        # en una hoja nxt == node y la diferencia es 0
+        delta = value.take(nxt).astype(np.float64) - value.take(node)
+        contrib += np.bincount((base + feat).ravel(), weights=delta.ravel(), minlength=size)
+        node = nxt
+    contrib = contrib.reshape(n, n_features)
+    if cm.meta["aggregate"] == "mean":
+        return root_value / cm.n_trees, contrib / cm.n_trees
+    scale = cm.meta["scale"]
+    return cm.meta["base"] + scale * root_value, scale * contrib
+
+
+def linear_contributions(cm, X):
+    a = cm.arrays
+    Z = (np.asarray(X, dtype=np.float64) - a["mean"]) / a["scale"]
+    contrib = Z * a["coef"]
+    return np.full(len(Z), cm.meta["intercept"]), contrib
+
+
+def xgb_contributions(model, X):
+    import xgboost as xgb
+
+    c = model.get_booster().predict(xgb.DMatrix(np.asarray(X, dtype=np.float32)), pred_contribs=True)
+    # la última columna es el sesgo (valor esperado)
+    return c[:, -1].astype(np.float64), c[:, :-1].astype(np.float64)
+
+
+def contributions(model, X):
+    # (base, contribuciones (n, f), método) o None si el tipo de modelo no se puede explicar
+    if hasattr(model, "get_booster"):
+        base, contrib = xgb_contributions(model, X)
+        return base, contrib, "tree_shap"
+    cm = _as_compiled(model)
+    if cm is None:
+        return None
+    if cm.kind == "forest":
+        return (*path_contributions(cm, X), "path")
+    return (*linear_contributions(cm, X), "linear")
+
+
+def explain_row(model, columns, X_scaled, raw, top=None):
+    # explicación de una sola fila: valores limpios (raw) y contribuciones por feature,
+    # de mayor a menor |contribución|; None si el modelo no se puede explicar
+    res = contributions(model, X_scaled)
+    if res is None:
+        return None
+    base, contrib, method = res
+    c = contrib[0]
+    order = np.argsort(-np.abs(c), kind="stable")
+    if top:
+        order = order[:top]
+    return {
+        "method": method,
+        "base": float(base[0]),
+        "contributions": [
+            {"feature": columns[j], "value": float(raw[j]), "contribution": float(c[j])} for j in order
+        ],
+    }
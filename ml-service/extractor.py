@@ -0,0 +1,384 @@
+# extractor.py
+# Extracción de los 21 indicadores a partir del texto (o PDF) de una tesis.
+# Es un port de bibliometrico-backend/services/indicadores.js con los mismos
+# valores, pero cada análisis del texto se hace una sola vez por documento
+# (analizar): una conversión a minúsculas, un conteo de palabras, un escaneo de
+# todas las palabras clave (KeywordScanner), las citas se cuentan una vez para
+# "% de citas textuales" y "% de parafraseo" y la sección de referencias se
+# localiza una vez. Los 21 indicadores se derivan luego de esos conteos.
+#
+# Las clases de caracteres replican las de JavaScript (\w y \d ASCII, \s de JS,
+# "." sin terminadores de línea) para dar exactamente los mismos conteos.
+#
+# El texto de un PDF sale de pypdf, en el propio proceso. Su texto no coincide
+# exactamente con el de pdf-parse en el backend (saltos de línea, guiones, PDFs
+# que pdf-parse no lee) y algunos indicadores pueden cambiar. Con
+# ML_PDF_TEXT=pdf-parse (opcional, requiere node y las dependencias instaladas
+# del backend) se usa el mismo pdf-parse y los indicadores son idénticos.
+#
+# Paridad contra el código JS (requiere node):
+#   python extractor.py --parity [pdf ...]     (por defecto bibliometrico-backend/uploads)
+#     los indicadores de Python sobre el texto del JS, y el texto de pdf_parse_text
+#   python extractor.py --parity --pypdf       (el mismo control con el texto de pypdf)
+import argparse
+import datetime
+import glob
+import hashlib
+import json
+import math
+import os
+import re
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "bibliometrico-backend")
+# "pypdf" (por defecto) | "pdf-parse" (opt-in: un proceso node por PDF, en BACKEND_DIR)
+PDF_TEXT = os.environ.get("ML_PDF_TEXT", "pypdf")
+PDF_PARSE_TIMEOUT = float(os.environ.get("ML_PDF_PARSE_TIMEOUT", "120"))
+# versión del análisis: hash de este archivo. Los conteos guardados en pdf_store con
+# otra versión se descartan (cualquier cambio en analizar o en los indicadores)
+with open(os.path.abspath(__file__), "rb") as _f:
+    ANALYSIS_VERSION = hashlib.sha256(_f.read()).hexdigest()[:16]
+# PDF por stdin, texto por stdout (los avisos de pdf.js van a stderr); como en el
+# backend, un PDF que pdf-parse no lee da ""
+_PDF_PARSE_JS = (
+    "console.log = (...a) => process.stderr.write(a.join(' ') + '\\n');"
+    "const pdf = require('pdf-parse/lib/pdf-parse.js');"
+    "const chunks = [];"
+    "process.stdin.on('data', c => chunks.push(c)).on('end', () =>"
+    " pdf(Buffer.concat(chunks)).catch(() => ({ text: '' })).then(d => process.stdout.write(d.text || '')));"
+)
+
+# espacios de \s y String.prototype.trim en JavaScript
+JS_SPACES = ("\t\n\v\f\r \u00a0\u1680" + "".join(chr(c) for c in range(0x2000, 0x200b))
+             + "\u2028\u2029\u202f\u205f\u3000\ufeff")
+_JS_S = "".join(re.escape(c) for c in JS_SPACES)
+# "." de JS: cualquier carácter salvo terminadores de línea
+_JS_DOT = "[^\n\r\u2028\u2029]"
+
+CITA_TEXTUAL = re.compile(r'"[^"]{20,}"')
+CITA = re.compile(r"\([A-Za-z0-9_" + _JS_S + r".,&]+[0-9]{4}\)|\[[0-9]+\]")
+SECCION_REFERENCIAS = re.compile("referencias|bibliograf" + _JS_DOT + "a|fuentes consultadas|references")
+FUENTE = re.compile(r"\[[0-9]+\]|[0-9]+\.")
+ANIO = re.compile(r"(20[0-9]{2}|19[0-9]{2})")
+# str.split() de Python separa también en \x1c-\x1f y \x85, que no son \s en JS
+_PALABRAS = {ord(c): " " for c in JS_SPACES}
+_PALABRAS.update({c: "x" for c in (0x1c, 0x1d, 0x1e, 0x1f, 0x85)})
+_SOLO_JS_O_PY = "\x1c\x1d\x1e\x1f\x85\ufeff"
+
+CONECTORES = ("además", "por lo tanto", "sin embargo", "por consiguiente", "en conclusión")
+PRUEBAS_ESTADISTICAS = ("t-student", "chi-cuadrado", "anova", "regresión lineal", "prueba estadística")
+METRICAS_RENDIMIENTO = ("performance", "rendimiento", "eficiencia")
+PALABRAS_CLAVE = (
+    "aplicada", "tecnológica", "mixto", "cualitativo",
+    "aplicativo", "explicativo", "correlacional", "descriptivo",
+    "experimental", "cuasi experimental",
+    "software", "iot", "blockchain", "inteligencia artificial", "validación",
+    "marco teórico", "prueba piloto",
+    "encuesta", "observación", "registro de datos", "entrevista",
+    "conclusiones", "discusión",
+) + PRUEBAS_ESTADISTICAS + METRICAS_RENDIMIENTO
+
+IMPACTO_REVISTAS = 3.0
+MAX_EDAD = 10
+
+
+class ExtractionError(Exception):
+    pass
+
+
+# =========================
+# SEMÁNTICA DE JAVASCRIPT
+# =========================
+def js_trim(text):
+    return text.strip(JS_SPACES)
+
+
+def js_round(x):
+    # Math.round: redondea .5 hacia +infinito
+    r = math.floor(x)
+    return r + 1 if x - r >= 0.5 else r
+
+
+def contar_palabras(texto):
+    # texto.split(/\s+/).length sobre un texto ya recortado
+    if any(c in texto for c in _SOLO_JS_O_PY):
+        texto = texto.translate(_PALABRAS)
+    return max(1, len(texto.split()))
+
+
+def inferir_anio(texto, today=None):
+    m = ANIO.search(texto)
+    return int(m.group(1)) if m else (today or datetime.date.today()).year
+
+
+# =========================
+# ANÁLISIS DEL TEXTO
+# =========================
+class KeywordScanner:
+    # todas las palabras clave de los indicadores sobre el texto en minúsculas de
+    # una vez. Los conectores se cuentan (str.count = split(c).length - 1 de JS);
+    # para el resto basta la presencia, que se detiene en la primera aparición.
+    # En CPython un str.count/in por literal (bucles en C) resultó ~3-4x más rápido
+    # que una única alternancia con re sobre textos de ~2 MB.
+    def __init__(self, counted, present):
+        self.counted = tuple(dict.fromkeys(counted))
+        self.present = tuple(k for k in dict.fromkeys(present) if k not in self.counted)
+
+    def scan(self, text):
+        counts = {k: text.count(k) for k in self.counted}
+        counts.update((k, int(k in text)) for k in self.present)
+        return counts
+
+
+SCANNER = KeywordScanner(CONECTORES, PALABRAS_CLAVE)
+
+
+def analizar(texto):
+    # todo lo que necesitan los indicadores, calculado una vez por documento
+    minus = texto.lower()
+    textuales = sum(1 for _ in CITA_TEXTUAL.finditer(texto))
+    citas = sum(1 for _ in CITA.finditer(texto)) + textuales
+    # textoMinusculas.split(/referencias|.../)[1]: lo que hay entre la primera y la segunda marca
+    fuentes = None
+    marcas = SECCION_REFERENCIAS.finditer(minus)
+    primera = next(marcas, None)
+    if primera is not None:
+        segunda = next(marcas, None)
+        seccion = minus[primera.end():segunda.start() if segunda else len(minus)]
+        fuentes = sum(1 for _ in FUENTE.finditer(seccion))
+    return {
+        "claves": SCANNER.scan(minus),
+        "palabras": contar_palabras(texto),
+        "citas_textuales": textuales,
+        "citas": citas,
+        "fuentes": fuentes or 0,
+    }
+
+
+# =========================
+# INDICADORES
+# =========================
+def _pct_textuales(a):
+    return a["citas_textuales"] / a["citas"] if a["citas"] > 0 else 0
+
+
+def _hay(a, *claves):
+    return any(a["claves"][k] for k in claves)
+
+
+def _antiguedad(a, anio, anio_actual):
+    edad = anio_actual - anio
+    score = max(0, 1 - min(edad, MAX_EDAD) / MAX_EDAD)
+    return score * 5
+
+
+def _citas_textuales(a, anio, anio_actual):
+    pct = _pct_textuales(a)
+    return 2 if pct > 0.1 else js_round(pct * 10) / 2
+
+
+def _conectores(a, anio, anio_actual):
+    n = sum(a["claves"][c] for c in CONECTORES)
+    ratio = n / a["palabras"] if a["palabras"] > 0 else 0
+    return min(5, ratio * 500)
+
+
+def _parafraseo(a, anio, anio_actual):
+    return (1 - _pct_textuales(a)) * 5
+
+
+def _fuentes(a, anio, anio_actual):
+    return min(5, (a["fuentes"] / 100) * 5)
+
+
+def _tipo(a, anio, anio_actual):
+    return 5 if _hay(a, "aplicada", "tecnológica") else 3
+
+
+def _enfoque(a, anio, anio_actual):
+    if _hay(a, "mixto"):
+        return 5
+    return 4 if _hay(a, "cualitativo") else 3
+
+
+def _nivel(a, anio, anio_actual):
+    for clave, valor in (("aplicativo", 5), ("explicativo", 4), ("correlacional", 3), ("descriptivo", 2)):
+        if _hay(a, clave):
+            return valor
+    return 1
+
+
+def _diseno(a, anio, anio_actual):
+    if _hay(a, "experimental"):
+        return 5
+    return 4 if _hay(a, "cuasi experimental") else 3
+
+
+def _presencia(claves, si, no):
+    return lambda a, anio, anio_actual: si if _hay(a, *claves) else no
+
+
+def _relevantes(a, anio, anio_actual):
+    return 5 if _hay(a, "conclusiones") and _hay(a, "discusión") else 3
+
+
+# mismo orden que la cadena de if/else de indicadores.js: gana la primera
+# subcadena contenida en el nombre de la columna (en minúsculas)
+INDICADORES = (
+    ("antigüedad", _antiguedad),
+    ("impacto de revistas", lambda a, anio, anio_actual: IMPACTO_REVISTAS),
+    ("citas textuales", _citas_textuales),
+    ("conectores", _conectores),
+    ("parafraseo", _parafraseo),
+    ("fuentes utilizadas", _fuentes),
+    ("tipo de investigación", _tipo),
+    ("enfoque", _enfoque),
+    ("nivel (alcance)", _nivel),
+    ("diseño de investigación", _diseno),
+    ("desarrollo de software", _presencia(("software",), 5, 0)),
+    ("tecnologías emergentes", _presencia(("iot", "blockchain", "inteligencia artificial"), 5, 0)),
+    ("validación de modelos", _presencia(("validación",), 5, 0)),
+    ("marcos de referencias", _presencia(("marco teórico",), 4, 2)),
+    ("validación del producto", _presencia(("prueba piloto",), 5, 2)),
+    ("encuestas", _presencia(("encuesta",), 5, 0)),
+    ("observación / registro de datos", _presencia(("observación", "registro de datos"), 5, 0)),
+    ("entrevistas", _presencia(("entrevista",), 5, 0)),
+    ("aplicación de pruebas estadísticas", _presencia(PRUEBAS_ESTADISTICAS, 5, 0)),
+    ("métricas de rendimiento", _presencia(METRICAS_RENDIMIENTO, 5, 0)),
+    ("relevantes y aportan", _relevantes),
+)
+
+
+def calcular_indicadores(texto, anio, columns, anio_actual=None):
+    # texto: texto del PDF ya recortado (js_trim); anio: año de la tesis
+    return indicadores_desde_analisis(analizar(texto), anio, columns, anio_actual)
+
+
+def indicadores_desde_analisis(a, anio, columns, anio_actual=None):
+    # los indicadores a partir de los conteos de analizar() (p. ej. guardados en pdf_store)
+    anio_actual = anio_actual or datetime.date.today().year
+    indicadores = {}
+    for col in columns:
+        lc = col.lower()
+        valor = 0
+        for clave, fn in INDICADORES:
+            if clave in lc:
+                valor = fn(a, anio, anio_actual)
+                break
+        indicadores[col] = valor
+    return indicadores
+
+
+def pdf_text_backend(backend=None):
+    backend = backend or PDF_TEXT
+    if backend not in ("pypdf", "pdf-parse"):
+        raise ValueError(f"ML_PDF_TEXT desconocido: {backend} (pypdf o pdf-parse)")
+    return backend
+
+
+def pdf_text(data, backend=None):
+    # texto de un PDF con el extractor configurado (ver pdf_text_backend)
+    if pdf_text_backend(backend) == "pdf-parse":
+        return pdf_parse_text(data)
+    return pypdf_text(data)
+
+
+def pdf_parse_text(data):
+    # mismo texto que `pdf(buffer).text` en el backend; referencia de --parity y de las pruebas
+    try:
+        out = subprocess.run(["node", "-e", _PDF_PARSE_JS], input=data, cwd=BACKEND_DIR, capture_output=True,
+                             timeout=PDF_PARSE_TIMEOUT, check=True)
+    except FileNotFoundError as e:
+        raise ExtractionError("node no está instalado: usar ML_PDF_TEXT=pypdf (por defecto) o enviar el texto") from e
+    except subprocess.TimeoutExpired as e:
+        raise ExtractionError(f"pdf-parse no terminó en {PDF_PARSE_TIMEOUT:.0f}s") from e
+    except subprocess.CalledProcessError as e:
+        raise ExtractionError(f"pdf-parse falló: {e.stderr.decode('utf-8', 'replace').strip()[-300:]}") from e
+    return out.stdout.decode("utf-8")
+
+
+def pypdf_text(data):
+    # texto de un PDF con pypdf (dependencia opcional); difiere del de pdf-parse
+    try:
+        from pypdf import PdfReader
+    except ImportError as e:
+        raise ExtractionError("pypdf no está instalado: enviar el texto en lugar del PDF") from e
+    import io
+    try:
+        reader = PdfReader(io.BytesIO(data))
+        return "\n".join(page.extract_text() or "" for page in reader.pages)
+    except Exception as e:
+        raise ExtractionError(f"PDF ilegible: {e}") from e
+
+
+# =========================
+# PARIDAD CON indicadores.js
+# =========================
+def parity(files, columns, backend_dir, with_pypdf=False):
+    # dos controles por documento, ambos sin diferencias:
+    #   - el port: indicadores de Python sobre el texto que extrajo el JS
+    #   - el camino de /extract y rescore.py: texto de pdf_text (pdf-parse, o pypdf con
+    #     --pypdf) y sus indicadores, contra el texto y los indicadores del JS
+    script = os.path.join(backend_dir, "services", "indicadores.js")
+    out = subprocess.run(["node", script, *files], cwd=backend_dir, capture_output=True,
+                         text=True, encoding="utf-8", check=True).stdout
+    backend = "pypdf" if with_pypdf else "pdf-parse"
+    failures = 0
+    checked = 0
+    for line in out.splitlines():
+        # pdf.js y mlService.js también escriben en stdout
+        if not line.startswith('{"file"'):
+            continue
+        doc = json.loads(line)
+        checked += 1
+        texto = doc["texto"]
+        diffs = _diff_indicadores(doc, texto, columns)
+        with open(doc["file"], "rb") as f:
+            try:
+                t = js_trim(pdf_text(f.read(), backend))
+            except ExtractionError as e:
+                t = None
+                diffs[backend] = (None, str(e))
+        if t is not None:
+            if t != texto:
+                diffs[f"texto ({backend})"] = (f"{len(texto)} chars", f"{len(t)} chars")
+            diffs.update({f"{c} ({backend})": v for c, v in _diff_indicadores(doc, t, columns).items()})
+        status = "OK " if not diffs else "DIF"
+        failures += bool(diffs)
+        print(f"{status} {os.path.basename(doc['file'])} ({len(texto)} chars)")
+        for c, (js, pv) in diffs.items():
+            print(f"      {c}: js={js} py={pv}")
+    print(f"{checked} documentos ({backend}), {failures} con diferencias")
+    return failures == 0 and checked > 0
+
+
+def _diff_indicadores(doc, texto, columns):
+    # {indicador: (js, py)} que no coinciden con los del JS
+    anio = inferir_anio(texto)
+    py = calcular_indicadores(texto, anio, columns)
+    diffs = {c: (doc["indicadores"].get(c), v) for c, v in py.items()
+             if not math.isclose(doc["indicadores"].get(c, math.nan), v, rel_tol=1e-12, abs_tol=1e-12)}
+    if anio != doc["anio"]:
+        diffs["anio"] = (doc["anio"], anio)
+    return diffs
+
+
+if __name__ == "__main__":
+    base = os.path.dirname(os.path.abspath(__file__))
+    backend = os.path.join(os.path.dirname(base), "bibliometrico-backend")
+    ap = argparse.ArgumentParser(description="Extracción de indicadores / paridad con indicadores.js")
+    ap.add_argument("files", nargs="*", help="PDFs (por defecto bibliometrico-backend/uploads/*.pdf)")
+    ap.add_argument("--parity", action="store_true", help="comparar contra services/indicadores.js")
+    ap.add_argument("--pypdf", action="store_true", help="con --parity, extraer el texto con pypdf en lugar de pdf-parse")
+    args = ap.parse_args()
+    with open(os.path.join(base, "Static", "model_columns.json"), encoding="utf-8") as f:
+        cols = json.load(f)
+    files = [os.path.abspath(p) for p in args.files] or sorted(glob.glob(os.path.join(backend, "uploads", "*.pdf")))
+    if args.parity:
+        sys.exit(0 if parity(files, cols, backend, with_pypdf=args.pypdf) else 1)
+    for p in files:
+        with open(p, "rb") as f:
+            t = js_trim(pdf_text(f.read()))
+        print(json.dumps({"file": p, "indicadores": calcular_indicadores(t, inferir_anio(t), cols)},
+                         ensure_ascii=False))
@@ -0,0 +1,174 @@
+# ingest.py
+# Ingesta tipada del CSV de métricas ("Metricas - Hoja 1.csv").
+# El esquema declara el tipo de cada columna de forced_cols; el CSV se lee una
+# sola vez, por bloques, como texto y cada columna se convierte con operaciones
+# vectorizadas según su tipo a float32. La matriz limpia se guarda en
+# Static/ingest_cache/<hash>/ (numeric.npy + meta.json), con clave = SHA-256 del
+# CSV + esquema; las siguientes lecturas la abren con mmap sin volver a parsear.
+#   python ingest.py [archivo.csv] [--no-cache]
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+# tipos de columna:
+#   text     se conserva como texto (no entra en la matriz numérica)
+#   numeric  coma decimal -> punto; no numérico -> 0
+#   percent  como numeric, sin "%" y dividido entre 100
+#   total    primer número del texto ("61 pts" -> 61), luego como numeric
+SCHEMA = [
+    ("N°", "text"),
+    ("Universidad", "text"),
+    ("Tesis", "text"),
+    ("Índice de antigüedad", "numeric"),
+    ("Índice de impacto de revistas", "numeric"),
+    ("% de citas textuales", "percent"),
+    ("% de conectores lógicos", "percent"),
+    ("% de parafraseo", "percent"),
+    ("% de fuentes utilizadas", "percent"),
+    ("Tipo de investigación", "numeric"),
+    ("Enfoque", "numeric"),
+    ("Nivel (alcance)", "numeric"),
+    ("Diseño de investigación", "numeric"),
+    ("Desarrollo de software", "numeric"),
+    ("Tecnologías emergentes", "numeric"),
+    ("Validación de modelos", "numeric"),
+    ("Marcos de referencias", "numeric"),
+    ("Validación del producto", "numeric"),
+    ("Encuestas", "numeric"),
+    ("Observación / Registro de datos", "numeric"),
+    ("Entrevistas", "numeric"),
+    ("Aplicación de pruebas estadísticas", "numeric"),
+    ("Métricas de rendimiento", "numeric"),
+    ("Relevantes y aportan a la ciencia y tecnología", "numeric"),
+    ("TOTAL", "total"),
+]
+DTYPES = {"text": object, "numeric": np.float32, "percent": np.float32, "total": np.float32}
+CHUNK_ROWS = 50_000
+CACHE_SUBDIR = "ingest_cache"
+
+
+def columns(schema=SCHEMA):
+    return [name for name, _ in schema]
+
+
+def numeric_columns(schema=SCHEMA):
+    return [name for name, kind in schema if DTYPES[kind] is not object]
+
+
+def schema_key(path, schema=SCHEMA):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    h.update(json.dumps(schema, ensure_ascii=False).encode("utf-8"))
+    return h.hexdigest()[:16]
+
+
+def _to_float(s, kind):
+    # misma semántica que la limpieza anterior de train_model.py (clean_total_column + clean_column).
+    # Las columnas tienen pocos valores distintos ("0", "5", "1,5"...): se convierten solo los
+    # valores únicos y se expanden con los códigos de factorize, sin operar cadena por cadena
+    codes, uniques = pd.factorize(s)
+    u = pd.Series(uniques, dtype=object).astype(str)
+    if kind == "total":
+        u = u.str.extract(r"(\d+\.?\d*)", expand=False)
+    else:
+        u = u.str.replace(",", ".", regex=False)
+        if kind == "percent":
+            u = u.str.replace("%", "", regex=False)
+    v = pd.to_numeric(u, errors="coerce").to_numpy(dtype=np.float64)
+    if kind == "percent":
+        v = v / 100.0
+    # código -1 = celda vacía (NaN) -> 0, igual que los valores no numéricos
+    v = np.append(np.nan_to_num(v, nan=0.0), 0.0).astype(np.float32)
+    return v[codes]
+
+
+def parse(path, schema=SCHEMA, chunk_rows=CHUNK_ROWS):
+    # (matriz float32 (n, columnas numéricas), {columna de texto: lista})
+    names = columns(schema)
+    num_cols = numeric_columns(schema)
+    blocks, text = [], {name: [] for name, kind in schema if DTYPES[kind] is object}
+    # header=None como la lectura original: la fila de encabezado entra como una fila
+    # más (numéricas en 0), para no cambiar los datos de entrenamiento
+    reader = pd.read_csv(path, header=None, dtype=str, usecols=range(len(names)), chunksize=chunk_rows)
+    for chunk in reader:
+        chunk.columns = names
+        block = np.empty((len(chunk), len(num_cols)), dtype=np.float32)
+        j = 0
+        for name, kind in schema:
+            if DTYPES[kind] is object:
+                text[name].extend(chunk[name].tolist())
+            else:
+                block[:, j] = _to_float(chunk[name], kind)
+                j += 1
+        blocks.append(block)
+    matrix = np.concatenate(blocks) if blocks else np.empty((0, len(num_cols)), dtype=np.float32)
+    return matrix, text
+
+
+def _cache_dir(static_dir, key):
+    return os.path.join(static_dir, CACHE_SUBDIR, key)
+
+
+def load(path, static_dir, schema=SCHEMA, mmap=True, use_cache=True):
+    # (matriz, columnas numéricas, texto, clave); usa la caché si existe y si no la crea
+    key = schema_key(path, schema)
+    target = _cache_dir(static_dir, key)
+    num_cols = numeric_columns(schema)
+    if use_cache and os.path.exists(os.path.join(target, "meta.json")):
+        with open(os.path.join(target, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        matrix = np.load(os.path.join(target, "numeric.npy"), mmap_mode="r" if mmap else None)
+        return matrix, meta["numeric"], meta["text"], key
+
+    matrix, text = parse(path, schema)
+    if use_cache:
+        # se escribe en un directorio temporal y se renombra: nunca queda una caché a medias
+        tmp = f"{target}.{os.getpid()}.tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        np.save(os.path.join(tmp, "numeric.npy"), matrix)
+        with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"source": os.path.basename(path), "rows": int(len(matrix)), "numeric": num_cols,
+                       "text": text}, f, ensure_ascii=False)
+        try:
+            os.replace(tmp, target)
+        except OSError:
+            # otro proceso la creó primero
+            shutil.rmtree(tmp, ignore_errors=True)
+        # solo se conserva la caché del CSV actual
+        root = os.path.dirname(target)
+        for old in os.listdir(root):
+            if old != key and not old.endswith(".tmp"):
+                shutil.rmtree(os.path.join(root, old), ignore_errors=True)
+    return matrix, num_cols, text, key
+
+
+def read_metrics(path, static_dir, schema=SCHEMA, use_cache=True):
+    # DataFrame limpio: columnas numéricas en float32 y las de texto como object
+    matrix, num_cols, text, _ = load(path, static_dir, schema, mmap=True, use_cache=use_cache)
+    df = pd.DataFrame(np.array(matrix), columns=num_cols)
+    for name, values in text.items():
+        df[name] = values
+    return df[columns(schema)]
+
+
+if __name__ == "__main__":
+    base = os.path.dirname(os.path.abspath(__file__))
+    ap = argparse.ArgumentParser(description="Parsea el CSV de métricas a la caché binaria de Static/ingest_cache")
+    ap.add_argument("csv", nargs="?", default=os.path.join(base, "Metricas - Hoja 1.csv"))
+    ap.add_argument("--no-cache", action="store_true", help="parsear sin leer ni escribir la caché")
+    args = ap.parse_args()
+    static = os.path.join(base, "Static")
+    for label in (["sin caché"] if args.no_cache else ["primera lectura", "desde caché"]):
+        t0 = time.time()
+        matrix, num_cols, text, key = load(args.csv, static, use_cache=not args.no_cache)
+        print(f"{label}: {matrix.shape[0]} filas x {matrix.shape[1]} columnas float32 "
+              f"en {time.time() - t0:.3f}s (clave {key})")
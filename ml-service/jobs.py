@@ -0,0 +1,232 @@
+# jobs.py
+# Cola local de trabajos para operaciones lentas (lotes grandes, explicaciones,
+# modelos pesados). POST /jobs encola y responde al instante con un id;
+# GET /jobs/<id> consulta el estado y el resultado. Los trabajos corren en un
+# pool de hilos acotado y los resultados se guardan en SQLite (Static/jobs.sqlite3),
+# compartido entre workers de gunicorn: no hace falta broker externo y /predict
+# no pierde slots de worker esperando trabajo pesado.
+# Cada trabajo guarda el pid del proceso que lo ejecuta. Al abrir el almacén y al
+# consultar un trabajo, los que siguen en cola o en ejecución pero cuyo proceso ya
+# no existe (worker reiniciado o caído), o que llevan más de `timeout` segundos
+# ejecutándose, pasan a "failed": no quedan pendientes para siempre. Un hilo de
+# Python no se puede interrumpir, así que un trabajo vencido sigue ocupando su
+# hilo (y su lugar en max_pending) hasta que el handler termina; su resultado se
+# descarta. ML_JOB_WORKERS y ML_JOB_MAX_PENDING acotan cuántos pueden quedar así.
+# En api_ml.py: tipos predict_batch ({"model", "items"}), explain (el cuerpo de
+# /predict) y predict_multi (el de /predict/multi); ML_JOB_WORKERS (2),
+# ML_JOB_DB, ML_JOB_TTL (resultados, 86400 s), ML_JOB_TIMEOUT (3600 s, 0 = sin
+# límite) y ML_JOB_MAX_PENDING (32, por proceso: con N workers de gunicorn caben
+# N veces más); por encima responde 429.
+import json
+import os
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+STATUSES = ("queued", "running", "done", "failed")
+
+
+class QueueFull(Exception):
+    pass
+
+
+class UnknownJobType(Exception):
+    pass
+
+
+def pid_alive(pid):
+    # el pid existe en esta máquina (la base es local: todos los workers la comparten en el mismo host)
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    except OSError:
+        return False
+    return True
+
+
+class JobStore:
+    def __init__(self, path, timeout=0.0):
+        self.path = path
+        self.timeout = timeout  # segundos máximos en "running"; 0 = sin límite
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as db:
+            # WAL: lecturas de GET /jobs concurrentes con las escrituras de los workers
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    type TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    params TEXT,
+                    result TEXT,
+                    error TEXT,
+                    pid INTEGER,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL
+                )""")
+            db.execute("CREATE INDEX IF NOT EXISTS jobs_finished ON jobs(finished_at)")
+            db.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs(status)")
+        self.recover()
+
+    @contextmanager
+    def _connect(self):
+        # una conexión por operación (sqlite3 no comparte conexiones entre hilos), en una
+        # transacción y cerrada al salir: `with sqlite3.connect()` solo hace commit
+        db = sqlite3.connect(self.path, timeout=30)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def create(self, job_type, params):
+        job_id = uuid.uuid4().hex
+        with self._connect() as db:
+            db.execute(
+                "INSERT INTO jobs (id, type, status, params, pid, created_at) VALUES (?, ?, 'queued', ?, ?, ?)",
+                (job_id, job_type, json.dumps(params, ensure_ascii=False), os.getpid(), time.time()),
+            )
+        return job_id
+
+    def update(self, job_id, only_if=None, **fields):
+        # only_if: estado esperado; si el trabajo ya cambió (p. ej. recuperado como failed) no se toca
+        cols = ", ".join(f"{k} = ?" for k in fields)
+        where, args = ("id = ?", (job_id,)) if only_if is None else ("id = ? AND status = ?", (job_id, only_if))
+        with self._connect() as db:
+            cur = db.execute(f"UPDATE jobs SET {cols} WHERE {where}", (*fields.values(), *args))
+            return cur.rowcount
+
+    def _lost_reason(self, status, pid, started_at, now):
+        if not pid_alive(pid):
+            return f"Trabajo perdido: el proceso {pid} que lo tenía ya no existe"
+        if self.timeout and status == "running" and started_at and now - started_at > self.timeout:
+            return f"Trabajo abandonado: más de {self.timeout:.0f}s en ejecución"
+        return None
+
+    def recover(self, job_id=None):
+        # marca como failed los trabajos en cola / en ejecución perdidos (todos, o solo job_id)
+        now = time.time()
+        sql = "SELECT id, status, pid, started_at FROM jobs WHERE status IN ('queued', 'running')"
+        with self._connect() as db:
+            rows = db.execute(sql + (" AND id = ?" if job_id else ""), (job_id,) if job_id else ()).fetchall()
+            lost = 0
+            for jid, status, pid, started_at in rows:
+                reason = self._lost_reason(status, pid, started_at, now)
+                if reason:
+                    lost += db.execute("UPDATE jobs SET status = 'failed', error = ?, finished_at = ? "
+                                       "WHERE id = ? AND status = ?", (reason, now, jid, status)).rowcount
+        return lost
+
+    def get(self, job_id, with_params=False):
+        with self._connect() as db:
+            db.row_factory = sqlite3.Row
+            row = db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        if row["status"] in ("queued", "running") and self.recover(job_id):
+            return self.get(job_id, with_params)
+        job = {k: row[k] for k in ("id", "type", "status", "error", "created_at", "started_at", "finished_at")}
+        job["result"] = json.loads(row["result"]) if row["result"] is not None else None
+        if with_params:
+            job["params"] = json.loads(row["params"]) if row["params"] is not None else None
+        return job
+
+    def purge(self, older_than):
+        # borrar trabajos terminados hace más de `older_than` segundos
+        with self._connect() as db:
+            cur = db.execute("DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?",
+                             (time.time() - older_than,))
+            return cur.rowcount
+
+    def counts(self):
+        with self._connect() as db:
+            return dict(db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+
+class JobQueue:
+    def __init__(self, store, workers=2, max_pending=32, ttl=86400.0):
+        self.store = store
+        self.workers = workers          # trabajos ejecutándose a la vez en este proceso
+        self.max_pending = max_pending  # en cola + en ejecución en este proceso; por encima se rechaza (429)
+        self.ttl = ttl                  # segundos que se conservan los resultados; 0 = siempre
+        self.handlers = {}              # tipo -> función(params) -> resultado JSON-serializable
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+        self.submitted = 0
+        self.rejected = 0
+
+    def register(self, job_type, handler):
+        self.handlers[job_type] = handler
+
+    def _pool(self):
+        # el pool se crea en el proceso que atiende (los hilos no sobreviven al fork de gunicorn)
+        if self._executor is None or self._pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="job")
+            self._pid = os.getpid()
+            self._pending = 0
+        return self._executor
+
+    def submit(self, job_type, params):
+        if job_type not in self.handlers:
+            raise UnknownJobType(job_type)
+        with self._lock:
+            pool = self._pool()
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                raise QueueFull(self._pending)
+            self._pending += 1
+        try:
+            job_id = self.store.create(job_type, params)
+            if self.ttl:
+                self.store.purge(self.ttl)
+            pool.submit(self._run, job_id, job_type, params)
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+            raise
+        self.submitted += 1
+        return job_id
+
+    def _run(self, job_id, job_type, params):
+        try:
+            if not self.store.update(job_id, only_if="queued", status="running", pid=os.getpid(),
+                                     started_at=time.time()):
+                return  # ya recuperado como failed
+            try:
+                result = self.handlers[job_type](params)
+            except Exception as e:
+                traceback.print_exc()
+                self.store.update(job_id, only_if="running", status="failed", error=f"{type(e).__name__}: {e}",
+                                  finished_at=time.time())
+                return
+            # si superó el timeout y ya quedó como failed, el resultado tardío se descarta
+            self.store.update(job_id, only_if="running", status="done",
+                              result=json.dumps(result, ensure_ascii=False), finished_at=time.time())
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def info(self):
+        with self._lock:
+            pending = self._pending
+        return {
+            "types": sorted(self.handlers),
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "pending": pending,
+            "submitted": self.submitted,
+            "rejected": self.rejected,
+            "store": self.store.counts(),
+        }
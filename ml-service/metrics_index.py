@@ -0,0 +1,74 @@
+# metrics_index.py
+# Índice de métricas precomputado por conjunto de artefactos. Se lee
+# model_comparison.csv (base) y model_comparison_tuned.csv (tuned) una vez al
+# cargar y cada fila se serializa a un fragmento JSON; /predict lo incrusta tal
+# cual en la respuesta, sin filtrar DataFrames ni convertir Series por petición.
+# La tabla se elige con "metrics": "base"|"tuned" en el payload o ?metrics=; por
+# defecto los modelos tuned_* usan la tabla tuned.
+import json
+import math
+import os
+
+import pandas as pd
+
+TABLES = {
+    "base": "model_comparison.csv",
+    "tuned": "model_comparison_tuned.csv",
+}
+# prefijos con los que train_model.py guarda variantes de una familia de modelos
+MODEL_PREFIXES = {
+    "tuned_": "tuned",
+    "mejor_": "base",
+    "compact_": "base",  # podados por compact.py; tienen su propia fila en model_comparison.csv
+}
+EMPTY = "{}"
+
+
+def _clean(value):
+    # NaN/inf no son JSON válido; los enteros/floats de numpy pasan a tipos de Python
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    if hasattr(value, "item"):
+        return _clean(value.item())
+    return value
+
+
+def _fragment(row):
+    # mismas claves ordenadas y separadores compactos que jsonify
+    return json.dumps({k: _clean(v) for k, v in row.items()}, sort_keys=True,
+                      separators=(",", ":"), ensure_ascii=False)
+
+
+class MetricsIndex:
+    def __init__(self, static_dir):
+        self.tables = {}  # tabla -> {modelo: fragmento JSON}
+        for table, filename in TABLES.items():
+            path = os.path.join(static_dir, filename)
+            if not os.path.exists(path):
+                self.tables[table] = {}
+                continue
+            df = pd.read_csv(path, float_precision="round_trip")
+            index = {}
+            if "model" in df.columns:
+                for row in df.to_dict(orient="records"):
+                    # la primera fila de cada modelo, como el filtro anterior
+                    index.setdefault(str(row["model"]), _fragment(row))
+            self.tables[table] = index
+
+    @staticmethod
+    def resolve(model_name):
+        # tabla por defecto y nombre de la familia: "tuned_RandomForest" -> ("tuned", "RandomForest")
+        for prefix, table in MODEL_PREFIXES.items():
+            if model_name.startswith(prefix):
+                return table, model_name[len(prefix):]
+        return "base", model_name
+
+    def fragment(self, model_name, table=None):
+        # fragmento JSON de las métricas del modelo; "{}" si no hay fila
+        default_table, family = self.resolve(model_name)
+        table = table or default_table
+        index = self.tables.get(table, {})
+        return index.get(model_name) or index.get(family, EMPTY)
+
+    def info(self):
+        return {table: sorted(index) for table, index in self.tables.items()}
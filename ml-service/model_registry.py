@@ -0,0 +1,148 @@
+# model_registry.py
+# Registro perezoso de modelos: indexa Static/modelo_*.pkl sin cargarlos,
+# carga cada modelo la primera vez que se usa y mantiene en memoria como
+# máximo N modelos / M bytes, expulsando el menos usado recientemente (LRU).
+# El motor de inferencia se elige por modelo: "compiled" (tree_engine, tablas
+# de nodos planas) o "sklearn" (el estimador deserializado tal cual).
+# En api_ml.py los límites vienen de ML_MAX_MODELS (3 por defecto) y
+# ML_MAX_MODEL_MB (0 = sin límite); GET /models lista los modelos disponibles,
+# los residentes y su tamaño.
+import glob
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import joblib
+
+import shared_artifacts
+from tree_engine import CompiledModel, compile_model
+
+ENGINES = ("compiled", "sklearn")
+
+
+class ModelLoadError(Exception):
+    pass
+
+
+class ModelRegistry:
+    def __init__(self, static_dir, max_models=0, max_bytes=0, pattern="modelo_*.pkl", shared=False,
+                 engine="compiled", engines=None):
+        self.static_dir = static_dir
+        self.shared = shared  # preferir artefactos planos mmap de Static/shared
+        self.engine = engine
+        self.engines = dict(engines or {})  # motor por modelo, p. ej. {"tesis": "sklearn"}
+        self.max_models = max_models  # 0 = sin límite
+        self.max_bytes = max_bytes    # 0 = sin límite
+        self.paths = OrderedDict()
+        for p in glob.glob(os.path.join(static_dir, pattern)):
+            name = os.path.basename(p).replace("modelo_", "").replace(".pkl", "")
+            self.paths[name] = p
+        self._resident = OrderedDict()  # name -> (modelo, bytes, cargado_en)
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self.loads = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __contains__(self, name):
+        return name in self.paths
+
+    def names(self):
+        return list(self.paths.keys())
+
+    def resident_names(self):
+        with self._lock:
+            return list(self._resident)
+
+    def default_name(self):
+        return next(iter(self.paths), None)
+
+    def engine_for(self, name):
+        return self.engines.get(name, self.engine)
+
+    def _load(self, name):
+        path = self.paths[name]
+        compiled = self.engine_for(name) == "compiled"
+        if compiled and self.shared:
+            try:
+                packed = shared_artifacts.load_model(self.static_dir, name, path)
+            except Exception as e:
+                print(f"Artefacto compartido de '{name}' inválido, se usa el .pkl: {e}")
+                packed = None
+            if packed is not None:
+                # páginas mapeadas y compartidas con los demás workers
+                return packed, packed.nbytes
+        try:
+            model = joblib.load(path)
+        except Exception as e:
+            raise ModelLoadError(f"No se pudo cargar '{name}': {e}") from e
+        if compiled:
+            # compilar al cargar; los modelos sin formato plano (XGBoost...) siguen en sklearn
+            cm = compile_model(model, name)
+            if cm is not None:
+                return cm, cm.nbytes
+        # tamaño aproximado en memoria: los arrays de los árboles dominan el pickle
+        return model, os.path.getsize(path)
+
+    def get(self, name):
+        with self._lock:
+            entry = self._resident.get(name)
+            if entry is not None:
+                self._resident.move_to_end(name)
+                return entry[0]
+            if name not in self.paths:
+                raise KeyError(name)
+            load_lock = self._load_locks.setdefault(name, threading.Lock())
+
+        # un solo hilo carga cada modelo; el resto espera y reutiliza el resultado
+        with load_lock:
+            with self._lock:
+                entry = self._resident.get(name)
+                if entry is not None:
+                    self._resident.move_to_end(name)
+                    return entry[0]
+            model, nbytes = self._load(name)
+            with self._lock:
+                self._resident[name] = (model, nbytes, time.time())
+                self.loads += 1
+                self._evict(keep=name)
+            return model
+
+    def _evict(self, keep):
+        def over():
+            if self.max_models and len(self._resident) > self.max_models:
+                return True
+            if self.max_bytes and self.resident_bytes() > self.max_bytes:
+                return True
+            return False
+
+        while over():
+            oldest = next(iter(self._resident))
+            if oldest == keep:
+                break
+            del self._resident[oldest]
+            self.evictions += 1
+
+    def resident_bytes(self):
+        return sum(e[1] for e in self._resident.values())
+
+    def info(self):
+        with self._lock:
+            resident = [
+                {"name": n, "bytes": e[1], "loaded_at": e[2],
+                 "engine": "compiled" if isinstance(e[0], CompiledModel) else "sklearn",
+                 "shared": bool(getattr(e[0], "shared", False))}
+                for n, e in self._resident.items()
+            ]
+            return {
+                "available": self.names(),
+                "resident": resident,  # del menos al más usado recientemente
+                "resident_bytes": self.resident_bytes(),
+                "max_models": self.max_models,
+                "max_bytes": self.max_bytes,
+                "loads": self.loads,
+                "evictions": self.evictions,
+            }
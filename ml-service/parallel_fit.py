@@ -0,0 +1,139 @@
+# parallel_fit.py
+# Entrenamiento concurrente de las familias de la etapa `compare` de train_model.py.
+# Antes se ajustaban una tras otra: mientras GradientBoosting (un solo hilo) entrenaba,
+# el resto de los núcleos quedaba ocioso. Aquí cada familia corre en su propio proceso
+# con un presupuesto de núcleos (ver tuning.cpu_budget) repartido según cuánto
+# escala cada una:
+#   - sin n_jobs (GradientBoosting, Ridge): 1 núcleo, más hilos no sirven
+#   - con n_jobs (RandomForest, ExtraTrees, XGBoost): el resto, en proporción a PARALLEL_WEIGHT
+# Si hay menos núcleos que familias, cada proceso usa 1 hilo y las familias más
+# costosas se lanzan primero, así el tiempo de pared se acerca al de la más lenta.
+# Los resultados no dependen del reparto: cada estimador conserva random_state=42 y
+# el número de hilos no cambia los árboles; se devuelven en el orden de entrada,
+# no en el de llegada.
+# El presupuesto sale de --cores N / ML_TRAIN_CORES. Cada familia se agrega a
+# Static/stages/compare/model_comparison.csv en cuanto termina; el
+# Static/model_comparison.csv que leen la API y el vigilante solo lo escribe export.
+#   python parallel_fit.py [--cores N]   # compara secuencial vs concurrente sobre el split en caché
+import argparse
+import csv
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from tuning import _inner_param, cpu_budget
+
+# costo relativo aproximado de cada familia en la etapa compare (orden de lanzamiento y
+# reparto de núcleos entre las que usan hilos); las desconocidas cuentan 1
+PARALLEL_WEIGHT = {"RandomForest": 3.0, "GradientBoosting": 3.0, "ExtraTrees": 1.5, "XGBoost": 1.0, "Ridge": 0.1}
+
+
+def assign_threads(models, budget):
+    # {familia: hilos} con una familia por proceso y, si caben todas a la vez, sum(hilos) <= budget
+    serial = [n for n, m in models.items() if not _inner_param(m)]
+    threaded = [n for n in models if n not in serial]
+    threads = {n: 1 for n in models}
+    spare = budget - len(models)
+    if spare > 0 and threaded:
+        weight = sum(PARALLEL_WEIGHT.get(n, 1.0) for n in threaded)
+        for n in threaded:
+            threads[n] += int(spare * PARALLEL_WEIGHT.get(n, 1.0) / weight)
+        # núcleos que quedan por el redondeo: a la familia paralela más costosa
+        leftover = budget - sum(threads.values())
+        threads[max(threaded, key=lambda n: PARALLEL_WEIGHT.get(n, 1.0))] += leftover
+    return threads
+
+
+def launch_order(models):
+    # las más costosas primero: con menos procesos que familias, la más lenta no queda para el final
+    return sorted(models, key=lambda n: -PARALLEL_WEIGHT.get(n, 1.0))
+
+
+def fit_family(name, mdl, threads, data, evaluate):
+    # ajusta y evalúa una familia; corre en un proceso worker (o en el mismo, con 1 núcleo)
+    key = _inner_param(mdl)
+    original = mdl.get_params()[key] if key else None
+    if key:
+        mdl.set_params(**{key: threads})
+    t0, c0 = time.perf_counter(), time.process_time()
+    mdl.fit(data["X_train"], data["y_train"])
+    _, _, m = evaluate(mdl, data["X_train"], data["y_train"], data["X_test"], data["y_test"])
+    timing = {"wall_s": time.perf_counter() - t0, "cpu_s": time.process_time() - c0, "threads": threads}
+    # el modelo guardado conserva los hilos originales (n_jobs=-1) para predecir
+    if key:
+        mdl.set_params(**{key: original})
+    return name, mdl, m, timing
+
+
+def stream_row(path, row):
+    # agrega (o reemplaza) la fila de una familia en el CSV de progreso apenas termina,
+    # conservando las demás filas y el orden por rmse_test
+    rows = []
+    if os.path.exists(path):
+        with open(path, newline="", encoding="utf-8") as f:
+            rows = [r for r in csv.DictReader(f) if r.get("model") != row["model"]]
+    rows.append(row)
+    fields = list(dict.fromkeys(k for r in rows for k in r))
+    rows.sort(key=lambda r: float(r.get("rmse_test") or "inf"))
+    tmp = path + ".tmp"
+    with open(tmp, "w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=fields)
+        w.writeheader()
+        w.writerows(rows)
+    os.replace(tmp, path)
+
+
+def fit_concurrent(models, data, evaluate, budget=None, on_result=None, on_error=None):
+    # {familia: (modelo, métricas, tiempos)} en el orden de `models`
+    budget = cpu_budget(budget)
+    threads = assign_threads(models, budget)
+    workers = min(len(models), budget)
+    done = {}
+
+    def collect(result):
+        name, mdl, m, timing = result
+        done[name] = (mdl, m, timing)
+        if on_result:
+            on_result(name, mdl, m, timing)
+
+    if workers <= 1:
+        # un solo núcleo: sin procesos extra (ni copias de los datos)
+        for name in models:
+            try:
+                collect(fit_family(name, models[name], threads[name], data, evaluate))
+            except Exception as e:
+                if on_error:
+                    on_error(name, e)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            futures = {ex.submit(fit_family, n, models[n], threads[n], data, evaluate): n
+                       for n in launch_order(models)}
+            for fut in as_completed(futures):
+                try:
+                    collect(fut.result())
+                except Exception as e:
+                    if on_error:
+                        on_error(futures[fut], e)
+    return {n: done[n] for n in models if n in done}
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Compara el entrenamiento secuencial y concurrente de la etapa compare")
+    ap.add_argument("--cores", type=int, default=None, help="presupuesto de núcleos (por defecto ML_TRAIN_CORES o todos)")
+    args = ap.parse_args()
+
+    import train_model as tm
+
+    tm.pipeline.run(["split"])
+    data = tm.pipeline.output("split")
+    budget = cpu_budget(args.cores)
+    runs = {}
+    for label, cores in (("secuencial", 1), ("concurrente", budget)):
+        t0 = time.perf_counter()
+        res = fit_concurrent(tm.comparison_estimators(), data, tm.evaluate, budget=cores)
+        runs[label] = (time.perf_counter() - t0, res)
+        print(f"{label:12s} {runs[label][0]:7.1f}s  ({cores} núcleos)")
+        for name, (_, m, timing) in res.items():
+            print(f"  {name:18s} {timing['wall_s']:7.1f}s  {timing['threads']} hilos  RMSE test={m['rmse_test']:.4f}")
+    same = all(runs["secuencial"][1][n][1] == runs["concurrente"][1][n][1] for n in runs["secuencial"][1])
+    print("Métricas idénticas:", same)
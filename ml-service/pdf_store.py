@@ -0,0 +1,224 @@
+# pdf_store.py
+# Almacén por contenido de los PDFs que llegan a /extract. La clave es el SHA-256
+# de los bytes del PDF: el mismo artículo subido varias veces (en uploads/ hay
+# copias con distintos prefijos de timestamp) se parsea una sola vez.
+#   documents: estadísticas del texto por PDF (los conteos de extractor.analizar,
+#              nº de caracteres, año inferido): con ellas se derivan los
+#              indicadores de cualquier año sin volver a leer el PDF
+#   scores:    vector de indicadores y predicciones por modelo, por versión de
+#              artefactos (un reentrenamiento no reutiliza predicciones viejas)
+# SQLite local (Static/pdf_store.sqlite3), compartido entre workers de gunicorn
+# como la cola de trabajos (jobs.py). Los conteos dependen del extractor de texto
+# (pypdf o pdf-parse, ver extractor.pdf_text) y del código que cuenta
+# (extractor.ANALYSIS_VERSION): la base recuerda con cuáles se llenó y, si se
+# abre con otros, se vacía.
+# En la API (ML_PDF_DB; ML_PDF_STORE=0 lo desactiva) una subida repetida no se
+# parsea ni se vuelve a predecir (~1.3 s -> ~5 ms) y la respuesta de /extract
+# incluye sha256 y cached.
+#   python pdf_store.py stats
+#   python pdf_store.py dedup [directorio] [--apply]   # colapsa copias idénticas en hard links
+#   python pdf_store.py prune --keep VERSION [...]     # borra predicciones de otras versiones (--keep obligatorio)
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+UPLOADS_DIR = os.path.join(BASE_DIR, "..", "bibliometrico-backend", "uploads")
+
+
+def digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_digest(path, chunk=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class PdfStore:
+    def __init__(self, path, extractor=None, analysis=None):
+        self.path = path
+        self.extractor = extractor
+        self.analysis = analysis
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS documents (
+                    sha256 TEXT PRIMARY KEY,
+                    n_bytes INTEGER NOT NULL,
+                    n_chars INTEGER NOT NULL,
+                    anio INTEGER,
+                    stats TEXT NOT NULL,
+                    hits INTEGER NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    last_seen REAL NOT NULL
+                )""")
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS scores (
+                    sha256 TEXT NOT NULL,
+                    version TEXT NOT NULL,
+                    anio INTEGER NOT NULL,
+                    anio_actual INTEGER NOT NULL,
+                    indicadores TEXT NOT NULL,
+                    predictions TEXT NOT NULL DEFAULT '{}',
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (sha256, version, anio, anio_actual)
+                )""")
+            db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        stamp = {k: v for k, v in (("extractor", extractor), ("analysis", analysis)) if v}
+        if stamp:
+            self._check_stamp(stamp)
+
+    def _check_stamp(self, stamp):
+        # vacía la base si se llenó con otro extractor u otra versión del análisis. Una base sin
+        # registro de extractor es anterior a pdf-parse (pypdf); sin registro de análisis, se vacía
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            stored = dict(db.execute("SELECT key, value FROM meta").fetchall())
+            if "extractor" not in stored and db.execute("SELECT 1 FROM documents LIMIT 1").fetchone():
+                stored["extractor"] = "pypdf"
+            if any(stored.get(k) != v for k, v in stamp.items()):
+                db.execute("DELETE FROM documents")
+                db.execute("DELETE FROM scores")
+                db.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", stamp.items())
+
+    @contextmanager
+    def _connect(self):
+        # una conexión por operación (sqlite3 no comparte conexiones entre hilos), en una
+        # transacción y cerrada al salir, como en jobs.JobStore
+        db = sqlite3.connect(self.path, timeout=30)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def get_document(self, sha256):
+        # {"n_bytes", "n_chars", "anio", "stats"} o None; cuenta la visita
+        with self._connect() as db:
+            row = db.execute("SELECT n_bytes, n_chars, anio, stats FROM documents WHERE sha256 = ?",
+                             (sha256,)).fetchone()
+            if row is None:
+                return None
+            db.execute("UPDATE documents SET hits = hits + 1, last_seen = ? WHERE sha256 = ?", (time.time(), sha256))
+        return {"n_bytes": row[0], "n_chars": row[1], "anio": row[2], "stats": json.loads(row[3])}
+
+    def put_document(self, sha256, n_bytes, n_chars, anio, stats):
+        now = time.time()
+        with self._connect() as db:
+            db.execute(
+                "INSERT OR IGNORE INTO documents (sha256, n_bytes, n_chars, anio, stats, created_at, last_seen) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (sha256, n_bytes, n_chars, anio, json.dumps(stats, ensure_ascii=False), now, now),
+            )
+
+    def get_scores(self, sha256, version, anio, anio_actual):
+        # (indicadores, {modelo: predicción}) o None
+        with self._connect() as db:
+            row = db.execute(
+                "SELECT indicadores, predictions FROM scores WHERE sha256 = ? AND version = ? AND anio = ? "
+                "AND anio_actual = ?", (sha256, version, anio, anio_actual)).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), json.loads(row[1])
+
+    def put_scores(self, sha256, version, anio, anio_actual, indicadores, model=None, prediction=None):
+        # guarda el vector de indicadores y, si se da, suma la predicción de `model` a las ya guardadas
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            row = db.execute(
+                "SELECT predictions FROM scores WHERE sha256 = ? AND version = ? AND anio = ? AND anio_actual = ?",
+                (sha256, version, anio, anio_actual)).fetchone()
+            predictions = json.loads(row[0]) if row else {}
+            if model is not None:
+                predictions[model] = prediction
+            db.execute(
+                "INSERT OR REPLACE INTO scores (sha256, version, anio, anio_actual, indicadores, predictions, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (sha256, version, anio, anio_actual, json.dumps(indicadores, ensure_ascii=False),
+                 json.dumps(predictions), time.time()),
+            )
+
+    def prune(self, keep_versions):
+        # borra indicadores y predicciones de versiones de artefactos que ya no se sirven;
+        # sin versiones a conservar no borra nada (no vaciar la caché por un argumento olvidado)
+        keep = list(keep_versions)
+        if not keep:
+            raise ValueError("prune necesita al menos una versión a conservar")
+        marks = ",".join("?" * len(keep))
+        with self._connect() as db:
+            cur = db.execute(f"DELETE FROM scores WHERE version NOT IN ({marks})", keep)
+            return cur.rowcount
+
+    def stats(self):
+        with self._connect() as db:
+            docs, hits, n_bytes = db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(hits), 0), COALESCE(SUM(n_bytes), 0) FROM documents").fetchone()
+            versions = dict(db.execute("SELECT version, COUNT(*) FROM scores GROUP BY version").fetchall())
+            meta = dict(db.execute("SELECT key, value FROM meta").fetchall())
+        return {"documents": docs, "hits": hits, "bytes": n_bytes, "scores_by_version": versions,
+                "extractor": meta.get("extractor"), "analysis": meta.get("analysis")}
+
+
+# =========================
+# COPIAS DUPLICADAS EN DISCO
+# =========================
+def find_duplicates(directory):
+    # {sha256: [rutas]} de los PDFs con más de una copia (la más antigua primero)
+    groups = defaultdict(list)
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if name.lower().endswith(".pdf") and os.path.isfile(path):
+            groups[file_digest(path)].append(path)
+    return {h: sorted(paths, key=os.path.getmtime) for h, paths in groups.items() if len(paths) > 1}
+
+
+def collapse(groups, apply=False):
+    # reemplaza cada copia por un hard link a la primera: las rutas (las que guarda
+    # la base de datos del backend) siguen siendo válidas. Devuelve los bytes liberados.
+    freed = 0
+    for paths in groups.values():
+        keep = paths[0]
+        for dup in paths[1:]:
+            if os.path.samefile(keep, dup):
+                continue
+            freed += os.path.getsize(dup)
+            if apply:
+                tmp = dup + ".link"
+                os.link(keep, tmp)
+                os.replace(tmp, dup)
+    return freed
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Almacén de PDFs por contenido (SHA-256)")
+    ap.add_argument("command", choices=("stats", "dedup", "prune"))
+    ap.add_argument("directory", nargs="?", default=UPLOADS_DIR, help="directorio de PDFs para dedup")
+    ap.add_argument("--db", default=os.environ.get("ML_PDF_DB", os.path.join(BASE_DIR, "Static", "pdf_store.sqlite3")))
+    ap.add_argument("--apply", action="store_true", help="dedup: reemplazar las copias por hard links (si no, solo informa)")
+    ap.add_argument("--keep", nargs="*", default=[], help="prune: versiones de artefactos a conservar")
+    args = ap.parse_args()
+    if args.command == "prune" and not args.keep:
+        ap.error("prune requiere --keep VERSION [...] (las versiones de artefactos a conservar)")
+
+    if args.command == "dedup":
+        groups = find_duplicates(args.directory)
+        for h, paths in groups.items():
+            print(f"{h[:12]}  {len(paths)} copias  {os.path.basename(paths[0])}")
+        freed = collapse(groups, apply=args.apply)
+        print(f"{'Liberados' if args.apply else 'Se liberarían'}: {freed / 1e6:.1f} MB"
+              + ("" if args.apply else " (usar --apply)"))
+    else:
+        store = PdfStore(args.db)
+        if args.command == "prune":
+            print("Filas borradas:", store.prune(args.keep))
+        print(json.dumps(store.stats(), ensure_ascii=False, indent=2))
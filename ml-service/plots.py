@@ -0,0 +1,282 @@
+# plots.py
+# Etapa de renderizado de gráficos, separada del entrenamiento.
+# train_model.py solo guarda los datos de cada figura (JSON compacto en
+# Static/plot_data/<archivo>.json); las figuras se dibujan después:
+#   - python plots.py [--workers N] [--force] [archivo ...]   (pool de procesos)
+#   - bajo demanda, la primera vez que /plots/<archivo> pide una figura
+# Una figura se vuelve a dibujar solo si cambió el hash de sus datos. Así
+# train_model.py no importa matplotlib.
+import argparse
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+DATA_SUBDIR = "plot_data"
+# subir si cambia el aspecto de algún renderizador para invalidar los PNG
+RENDER_VERSION = 1
+
+
+def _jsonable(v):
+    if isinstance(v, dict):
+        return {str(k): _jsonable(x) for k, x in v.items()}
+    if isinstance(v, (list, tuple)):
+        return [_jsonable(x) for x in v]
+    if hasattr(v, "tolist"):  # arrays/Series de numpy o pandas y escalares numpy
+        return _jsonable(v.tolist())
+    return v
+
+
+def _paths(static_dir, filename):
+    # filename llega desde la URL de /plots: no puede salir de Static/
+    norm = os.path.normpath(filename)
+    if os.path.isabs(norm) or norm == ".." or norm.startswith(".." + os.sep):
+        raise ValueError(f"Ruta de figura no válida: {filename}")
+    data = os.path.join(static_dir, DATA_SUBDIR, filename + ".json")
+    return os.path.join(static_dir, filename), data, data[:-len(".json")] + ".rendered"
+
+
+def spec_hash(spec):
+    raw = json.dumps(spec, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(f"{RENDER_VERSION}|{raw}".encode("utf-8")).hexdigest()[:16]
+
+
+# =========================
+# REGISTRO (lo usa train_model.py)
+# =========================
+def record_plot(static_dir, filename, kind, dpi=300, **data):
+    # guarda los datos de una figura; no importa matplotlib
+    spec = _jsonable({"kind": kind, "dpi": dpi, "data": data})
+    _, data_path, _ = _paths(static_dir, filename)
+    os.makedirs(os.path.dirname(data_path), exist_ok=True)
+    tmp = data_path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(spec, f, ensure_ascii=False)
+    os.replace(tmp, data_path)
+    return data_path
+
+
+def load_spec(static_dir, filename):
+    _, data_path, _ = _paths(static_dir, filename)
+    if not os.path.exists(data_path):
+        return None
+    with open(data_path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def recorded(static_dir):
+    # archivos de figura con datos registrados, relativos a Static/
+    root = os.path.join(static_dir, DATA_SUBDIR)
+    out = []
+    for dirpath, _, files in os.walk(root):
+        for fn in files:
+            if fn.endswith(".json"):
+                rel = os.path.relpath(os.path.join(dirpath, fn), root)
+                out.append(rel[:-len(".json")].replace(os.sep, "/"))
+    return sorted(out)
+
+
+def is_stale(static_dir, filename, spec=None):
+    spec = spec or load_spec(static_dir, filename)
+    if spec is None:
+        return False
+    png, _, stamp = _paths(static_dir, filename)
+    if not os.path.exists(png) or not os.path.exists(stamp):
+        return True
+    with open(stamp, encoding="utf-8") as f:
+        return f.read().strip() != spec_hash(spec)
+
+
+# =========================
+# RENDERIZADORES
+# =========================
+def _annotate_bars(plt, bars, fontsize=8):
+    for b in bars:
+        h = b.get_height()
+        plt.annotate(f"{h:.3f}", xy=(b.get_x() + b.get_width() / 2, h), xytext=(0, 3),
+                     textcoords="offset points", ha="center", va="bottom", fontsize=fontsize)
+
+
+def _importance(plt, d):
+    import pandas as pd
+    import seaborn as sns
+    df = pd.DataFrame({d["ylabel"]: d["labels"], d["xlabel"]: d["values"]})
+    plt.figure(figsize=d.get("figsize", (10, 8)))
+    sns.barplot(x=d["xlabel"], y=d["ylabel"], data=df)
+    plt.title(d["title"])
+
+
+def _scatter_ideal(plt, d):
+    plt.figure(figsize=d.get("figsize", (6, 6)))
+    for s in d["series"]:
+        plt.scatter(s["x"], s["y"], alpha=s.get("alpha"), label=s.get("label"))
+    lo, hi = d["ideal"]
+    plt.plot([lo, hi], [lo, hi], d.get("ideal_style", "r--"), label=d.get("ideal_label"))
+    plt.xlabel(d["xlabel"])
+    plt.ylabel(d["ylabel"])
+    plt.title(d["title"])
+    if d.get("legend", True):
+        plt.legend()
+
+
+def _metric_panels(plt, d):
+    plt.figure(figsize=d.get("figsize", (15, 5)))
+    panels = d["panels"]
+    for i, p in enumerate(panels):
+        plt.subplot(1, len(panels), i + 1)
+        plt.bar(["Entrenamiento", "Prueba"], [p["train"], p["test"]], color=["steelblue", "coral"])
+        plt.title(p["title"])
+        plt.ylabel(p["ylabel"])
+        plt.grid(True, alpha=0.3)
+
+
+def _metric_pairs(plt, d):
+    plt.figure(figsize=d.get("figsize", (9, 5)))
+    x = np.arange(len(d["names"]))
+    width = 0.35
+    bars1 = plt.bar(x - width / 2, d["train"], width, label="Entrenamiento", color="steelblue")
+    bars2 = plt.bar(x + width / 2, d["test"], width, label="Prueba", color="coral")
+    plt.xticks(x, d["names"])
+    plt.title(d["title"])
+    if d.get("ylabel"):
+        plt.ylabel(d["ylabel"])
+    plt.legend()
+    _annotate_bars(plt, list(bars1) + list(bars2))
+
+
+def _bar_values(plt, d):
+    plt.figure(figsize=d.get("figsize", (10, 6)))
+    plt.bar(d["labels"], d["values"], color=d.get("color", "teal"))
+    plt.ylabel(d["ylabel"])
+    plt.title(d["title"])
+    if d.get("rotation"):
+        plt.xticks(rotation=d["rotation"], ha="right")
+    for i, v in enumerate(d["values"]):
+        plt.annotate(f"{v:.3f}", xy=(i, v), xytext=(0, 3), textcoords="offset points", ha="center", fontsize=9)
+
+
+def _curves(plt, d):
+    plt.figure(figsize=d.get("figsize", (6, 5)))
+    for s in d["series"]:
+        plt.plot(s["x"], s["y"], label=s.get("label"), color=s.get("color"))
+    if d.get("vline") is not None:
+        plt.axvline(x=d["vline"], linestyle="--", color="red", alpha=0.4)
+    plt.xlabel(d["xlabel"])
+    plt.ylabel(d["ylabel"])
+    plt.title(d["title"])
+    plt.legend()
+
+
+def _hist(plt, d):
+    plt.figure(figsize=d.get("figsize", (6, 4)))
+    plt.hist(d["values"], bins=d.get("bins", 30), color=d.get("color", "coral"), edgecolor="k")
+    plt.title(d["title"])
+
+
+def _bar_series(plt, d):
+    import pandas as pd
+    plt.figure(figsize=d.get("figsize", (8, 4)))
+    pd.Series(d["values"], index=d["labels"]).plot(kind="bar", color=d.get("color", "steelblue"))
+    plt.title(d["title"])
+    plt.ylabel(d["ylabel"])
+
+
+RENDERERS = {
+    "importance": _importance,
+    "scatter_ideal": _scatter_ideal,
+    "metric_panels": _metric_panels,
+    "metric_pairs": _metric_pairs,
+    "bar_values": _bar_values,
+    "curves": _curves,
+    "hist": _hist,
+    "bar_series": _bar_series,
+}
+
+
+# =========================
+# RENDERIZADO
+# =========================
+# los renderizadores dibujan con el estado global de pyplot (figura actual, plt.title,
+# plt.savefig, plt.close): desde los hilos de /plots, una figura a la vez por proceso
+_pyplot_lock = threading.Lock()
+
+
+def render(static_dir, filename, force=False):
+    # dibuja una figura si sus datos cambiaron; True si se dibujó
+    spec = load_spec(static_dir, filename)
+    if spec is None:
+        return False
+    if not force and not is_stale(static_dir, filename, spec):
+        return False
+    with _pyplot_lock:
+        if not force and not is_stale(static_dir, filename, spec):
+            return False
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+
+        png, _, stamp = _paths(static_dir, filename)
+        os.makedirs(os.path.dirname(png), exist_ok=True)
+        # archivo temporal + os.replace: nunca se sirve un PNG a medio escribir
+        tmp = f"{png}.{os.getpid()}.{threading.get_ident()}.tmp.png"
+        try:
+            RENDERERS[spec["kind"]](plt, spec["data"])
+            plt.tight_layout()
+            plt.savefig(tmp, dpi=spec.get("dpi", 300))
+        finally:
+            plt.close("all")
+        os.replace(tmp, png)
+        with open(stamp, "w", encoding="utf-8") as f:
+            f.write(spec_hash(spec))
+        return True
+
+
+def _render_one(args):
+    static_dir, filename, force = args
+    try:
+        return filename, render(static_dir, filename, force), None
+    except Exception as e:
+        return filename, False, f"{type(e).__name__}: {e}"
+
+
+def render_all(static_dir, filenames=None, workers=None, force=False):
+    # dibuja en un pool de procesos las figuras pendientes; devuelve (dibujadas, omitidas, errores)
+    filenames = filenames or recorded(static_dir)
+    todo = [f for f in filenames if force or is_stale(static_dir, f)]
+    skipped = [f for f in filenames if f not in todo]
+    rendered, errors = [], {}
+    if not todo:
+        return rendered, skipped, errors
+    workers = workers or min(len(todo), os.cpu_count() or 1)
+    jobs = [(static_dir, f, force) for f in todo]
+    if workers <= 1:
+        results = map(_render_one, jobs)
+    else:
+        pool = ProcessPoolExecutor(max_workers=workers)
+        results = pool.map(_render_one, jobs)
+    for filename, done, err in results:
+        if err:
+            errors[filename] = err
+        elif done:
+            rendered.append(filename)
+        else:
+            skipped.append(filename)
+    if workers > 1:
+        pool.shutdown()
+    return rendered, skipped, errors
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Dibuja las figuras registradas en Static/plot_data")
+    ap.add_argument("files", nargs="*", help="figuras concretas (por defecto, todas)")
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--force", action="store_true", help="dibujar aunque los datos no hayan cambiado")
+    args = ap.parse_args()
+    static = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Static")
+    done, skipped, errors = render_all(static, args.files or None, workers=args.workers, force=args.force)
+    print(f"Dibujadas: {len(done)}  sin cambios: {len(skipped)}  errores: {len(errors)}")
+    for f, e in errors.items():
+        print(f"  {f}: {e}")
@@ -0,0 +1,96 @@
+# prediction_cache.py
+# Caché en proceso de predicciones. La clave es (modelo, versión de artefactos,
+# vector de features limpio y cuantizado): muchos indicadores son discretos
+# (0/2/3/4/5), así que los vectores repetidos son frecuentes (re-subidas del
+# mismo PDF, re-calificaciones, refrescos del dashboard). Un acierto no toca ni
+# el scaler ni el modelo.
+# LRU con TTL (ML_CACHE_SIZE, 0 = desactivada; ML_CACHE_TTL; ML_CACHE_DECIMALS
+# para cuantizar). Se vacía sola cuando cambian los artefactos de Static/;
+# GET /cache muestra aciertos y fallos y DELETE /cache la vacía.
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+class PredictionCache:
+    def __init__(self, maxsize=4096, ttl=3600.0, decimals=9):
+        self.maxsize = maxsize  # 0 = caché desactivada
+        self.ttl = ttl          # segundos; 0 = sin expiración
+        self.decimals = decimals
+        self._data = OrderedDict()  # clave -> (valor, expira_en)
+        self._lock = threading.Lock()
+        self._version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self):
+        return self.maxsize > 0
+
+    def key(self, model_name, version, x):
+        # + 0.0 unifica -0.0 y 0.0 para que generen los mismos bytes
+        q = np.round(np.asarray(x, dtype=np.float64).ravel(), self.decimals) + 0.0
+        return (model_name, version, q.tobytes())
+
+    def check_version(self, version):
+        # vaciar todo cuando cambian los artefactos de Static/ (lo llama el ArtifactManager al intercambiar)
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    if self._version is not None:
+                        self._data.clear()
+                        self.invalidations += 1
+                    self._version = version
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires = entry
+            if expires and expires < time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        if not self.enabled:
+            return
+        expires = time.monotonic() + self.ttl if self.ttl else 0.0
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / total) if total else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "artifact_version": self._version,
+            }
@@ -0,0 +1,111 @@
+# preprocessing.py
+# Preprocesamiento precompilado de las peticiones de /predict sin pandas.
+# Se construye una sola vez a partir de model_columns y escribe directo en un
+# buffer float64 de NumPy que luego se escala y se pasa al modelo.
+import re
+import threading
+
+import numpy as np
+
+# pd.to_numeric usa su propio parser de floats, que solo coincide bit a bit con
+# float() cuando el número tiene pocos dígitos. Con hasta 15 dígitos (sin
+# exponente ni espacios) ambos dan exactamente el mismo double; el resto de
+# casos se delega a pandas para conservar los resultados del camino anterior.
+# Solo dígitos ASCII: float() también lee otros dígitos Unicode ("١٢" -> 12.0)
+# que pandas convierte en NaN; "inf", "nan", "1e400"... van siempre a pandas.
+_FAST_NUMBER = re.compile(r"[+-]?(?:[0-9]+\.?[0-9]*|\.[0-9]+)")
+_MAX_FAST_DIGITS = 15
+
+
+def _to_numeric(v):
+    if _FAST_NUMBER.fullmatch(v) and sum("0" <= ch <= "9" for ch in v) <= _MAX_FAST_DIGITS:
+        return float(v)
+    import pandas as pd
+    return float(pd.to_numeric(v, errors="coerce"))
+
+
+def parse_number(value):
+    if value is None:
+        return 0.0
+    return _to_numeric(str(value).replace(",", "."))
+
+
+def parse_percent(value):
+    if value is None:
+        return 0.0
+    v = str(value).replace(",", ".").replace("%", "")
+    return _to_numeric(v) / 100.0
+
+
+def clean_value(col_name, value):
+    # equivalente escalar de Preprocessor para una sola columna
+    if "%" in col_name:
+        return parse_percent(value)
+    return parse_number(value)
+
+
+class Preprocessor:
+    def __init__(self, columns, scaler=None):
+        self.columns = list(columns)
+        self.index = {c: i for i, c in enumerate(self.columns)}
+        self.n_features = len(self.columns)
+        self.percent = np.array(["%" in c for c in self.columns], dtype=bool)
+        self._plan = [
+            (c, parse_percent if "%" in c else parse_number) for c in self.columns
+        ]
+        self.mean = None
+        self.scale = None
+        if scaler is not None:
+            # mismos pasos que StandardScaler.transform: X -= mean_; X /= scale_
+            if getattr(scaler, "with_mean", True):
+                self.mean = np.asarray(scaler.mean_, dtype=np.float64)
+            if getattr(scaler, "with_std", True):
+                self.scale = np.asarray(scaler.scale_, dtype=np.float64)
+        self._local = threading.local()
+
+    def unknown_columns(self, data):
+        return [k for k in data if k not in self.index]
+
+    def non_finite_columns(self, row):
+        # columnas con ±inf en una fila limpia ("inf", "1e400"...; NaN ya es 0): no se
+        # predicen (scaler.transform tampoco las aceptaba) y la API responde 400
+        return [self.columns[i] for i in np.flatnonzero(~np.isfinite(row))]
+
+    def _row_buffer(self):
+        buf = getattr(self._local, "row", None)
+        if buf is None:
+            buf = np.empty((1, self.n_features), dtype=np.float64)
+            self._local.row = buf
+        return buf
+
+    def fill_row(self, out, data):
+        get = data.get
+        for i, (col, parse) in enumerate(self._plan):
+            v = parse(get(col, 0))
+            out[i] = 0.0 if v != v else v  # fillna(0)
+        return out
+
+    def clean_one(self, data):
+        # buffer (1, n_features) reutilizado por hilo; no guardar referencias
+        buf = self._row_buffer()
+        self.fill_row(buf[0], data)
+        return buf
+
+    def clean_many(self, rows):
+        X = np.empty((len(rows), self.n_features), dtype=np.float64)
+        for i, data in enumerate(rows):
+            self.fill_row(X[i], data)
+        return X
+
+    def scale_inplace(self, X):
+        if self.mean is not None:
+            np.subtract(X, self.mean, out=X)
+        if self.scale is not None:
+            np.divide(X, self.scale, out=X)
+        return X
+
+    def transform_one(self, data):
+        return self.scale_inplace(self.clean_one(data))
+
+    def transform_many(self, rows):
+        return self.scale_inplace(self.clean_many(rows))
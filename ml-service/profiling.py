@@ -0,0 +1,143 @@
+# profiling.py
+# Instrumentación ligera del entrenamiento: tiempo de pared, tiempo de CPU y
+# pico de memoria (RSS) por sección. Las secciones se anidan ("tune/RandomForest")
+# y se escriben en Static/train_profile.json; cada ejecución se añade además a
+# Static/train_profile_history.jsonl para seguir regresiones entre corridas.
+# Opcionalmente se guarda un volcado de cProfile (ver con python -m pstats).
+#   with profiler.section("fit"): ...
+#   @profiler.timed("diagnostics")
+#   def ...
+# cpu_s es el tiempo de CPU del proceso (todos sus hilos); no incluye los procesos
+# worker de joblib (n_jobs en búsquedas de hiperparámetros). Lo medido dentro de
+# otros procesos se añade con profiler.record(...).
+# train_model.py --cprofile guarda Static/train_profile.prof; python profiling.py
+# muestra las secciones más lentas.
+import cProfile
+import functools
+import json
+import os
+import platform
+import sys
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_mb():
+    # pico de memoria residente del proceso desde que arrancó, en MB (None si no se puede medir)
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux lo da en KB, macOS en bytes
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) / (1024 * 1024)
+    except Exception:
+        return None
+
+
+class Profiler:
+    def __init__(self, cprofile=False):
+        self.sections = []  # en orden de cierre: las internas antes que las externas
+        self._stack = []
+        self._cprofile = cProfile.Profile() if cprofile else None
+        self.started = time.time()
+        self._t0 = time.perf_counter()
+        self._c0 = time.process_time()
+        if self._cprofile:
+            self._cprofile.enable()
+
+    @contextmanager
+    def section(self, name, **extra):
+        self._stack.append(name)
+        path = "/".join(self._stack)
+        t0, c0 = time.perf_counter(), time.process_time()
+        rss0 = peak_rss_mb()
+        error = None
+        try:
+            yield
+        except BaseException as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            rss = peak_rss_mb()
+            entry = {
+                "name": path,
+                "wall_s": round(time.perf_counter() - t0, 6),
+                "cpu_s": round(time.process_time() - c0, 6),
+                "peak_rss_mb": round(rss, 1) if rss is not None else None,
+                # cuánto subió el pico del proceso dentro de la sección
+                "peak_rss_growth_mb": round(rss - rss0, 1) if rss is not None and rss0 is not None else None,
+                **extra,
+            }
+            if error:
+                entry["error"] = error
+            self.sections.append(entry)
+            self._stack.pop()
+
+    def record(self, name, wall_s, cpu_s, **extra):
+        # sección medida en otro proceso (p. ej. un worker de parallel_fit), anidada en la actual
+        self.sections.append({"name": "/".join(self._stack + [name]), "wall_s": round(wall_s, 6),
+                              "cpu_s": round(cpu_s, 6), **extra})
+
+    def timed(self, name=None):
+        # decorador: cada llamada a la función se registra como una sección
+        def wrap(fn):
+            @functools.wraps(fn)
+            def inner(*args, **kwargs):
+                with self.section(name or fn.__name__):
+                    return fn(*args, **kwargs)
+            return inner
+        return wrap
+
+    def summary(self):
+        rss = peak_rss_mb()
+        return {
+            "started": self.started,
+            "wall_s": round(time.perf_counter() - self._t0, 6),
+            "cpu_s": round(time.process_time() - self._c0, 6),
+            "peak_rss_mb": round(rss, 1) if rss is not None else None,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "argv": sys.argv[1:],
+            "sections": self.sections,
+        }
+
+    def save(self, path, history=True, **extra):
+        # escribe el perfil (JSON), lo añade al historial y, si se pidió, el volcado de cProfile
+        data = {**self.summary(), **extra}
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, path)
+        if history:
+            base, _ = os.path.splitext(path)
+            with open(base + "_history.jsonl", "a", encoding="utf-8") as f:
+                f.write(json.dumps(data, ensure_ascii=False, separators=(",", ":")) + "\n")
+        if self._cprofile:
+            self._cprofile.disable()
+            self._cprofile.dump_stats(os.path.splitext(path)[0] + ".prof")
+        return data
+
+
+def top_sections(data, n=15):
+    # secciones más lentas (por tiempo de pared) de un perfil guardado
+    return sorted(data["sections"], key=lambda s: s["wall_s"], reverse=True)[:n]
+
+
+if __name__ == "__main__":
+    # resumen de Static/train_profile.json (o del archivo indicado)
+    base = os.path.dirname(os.path.abspath(__file__))
+    path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(base, "Static", "train_profile.json")
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    print(f"Total: {data['wall_s']:.1f}s pared, {data['cpu_s']:.1f}s CPU, pico RSS {data['peak_rss_mb']} MB")
+    for s in top_sections(data):
+        print(f"  {s['wall_s']:8.2f}s  {s['cpu_s']:8.2f}s CPU  {s['peak_rss_mb'] or '-':>8} MB  {s['name']}")
@@ -0,0 +1,269 @@
+# rescore.py
+# Re-calificación masiva tras un reentrenamiento: recorre un directorio de PDFs
+# (por defecto bibliometrico-backend/uploads) o un manifiesto, extrae los
+# indicadores en un pool de procesos y los califica por lotes grandes con los
+# artefactos actuales de Static/, sin pasar por /predict.
+#   - extracción: un proceso por núcleo (imap_unordered, en trozos), cada uno lee el
+#     PDF, calcula su SHA-256 y reutiliza los conteos de texto de pdf_store si ya
+#     estaba (ver pdf_store.py); si no, lo parsea con pdf-parse como el backend (o
+#     pypdf, ver extractor.pdf_text) y los guarda
+#   - calificación: en el proceso principal, una matriz por lote (clean_many +
+#     scale_inplace) y un predict por modelo, igual que /predict/batch
+#   - salida: JSONL o CSV según la extensión de --out, una fila por PDF (los PDFs
+#     ilegibles, o cualquier fallo al extraer uno, quedan con "error" y se sigue)
+#   - checkpoint: tras escribir cada lote se guarda en <out>.ckpt la versión de los
+#     artefactos, los modelos y el tamaño de la salida. Al reanudar se trunca la
+#     salida a ese tamaño (un lote a medio escribir se descarta) y se saltan los
+#     PDFs ya calificados en ella; las filas con "error" se quitan de la salida y
+#     esos PDFs se vuelven a intentar. Si cambiaron los artefactos o los modelos,
+#     hay que empezar de cero con --restart
+#   - el avance (docs/s, errores, ETA) se informa por stderr
+#   python rescore.py [directorio] [--manifest lista.txt] [--out Static/rescore.jsonl]
+#                     [--models tesis Ridge | --models all] [--workers N] [--batch 512] [--restart]
+import argparse
+import csv
+import datetime
+import json
+import os
+import sqlite3
+import sys
+import time
+import traceback
+from multiprocessing import Pool
+
+from artifact_manager import ArtifactSet, detect_version
+from extractor import (ANALYSIS_VERSION, ExtractionError, analizar, indicadores_desde_analisis, inferir_anio,
+                       js_trim, pdf_text, pdf_text_backend)
+from pdf_store import UPLOADS_DIR, PdfStore, digest
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(BASE_DIR, "Static")
+DEFAULT_OUT = os.path.join(STATIC_DIR, "rescore.jsonl")
+DEFAULT_DB = os.environ.get("ML_PDF_DB", os.path.join(STATIC_DIR, "pdf_store.sqlite3"))
+BASE_FIELDS = ["path", "sha256", "anio", "n_chars", "cached", "error"]
+
+
+# =========================
+# ENTRADAS
+# =========================
+def list_pdfs(directory=None, manifest=None):
+    # rutas en orden estable: las líneas del manifiesto (o su columna "path" si es CSV/JSONL)
+    # o los .pdf del directorio, recursivamente
+    if manifest:
+        base = os.path.dirname(os.path.abspath(manifest))
+        with open(manifest, encoding="utf-8") as f:
+            if manifest.endswith(".csv"):
+                paths = [r["path"] for r in csv.DictReader(f)]
+            elif manifest.endswith(".jsonl"):
+                paths = [json.loads(line)["path"] for line in f if line.strip()]
+            else:
+                paths = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+        return [p if os.path.isabs(p) else os.path.join(base, p) for p in paths]
+    paths = []
+    for root, _, files in os.walk(directory):
+        paths.extend(os.path.join(root, n) for n in files if n.lower().endswith(".pdf"))
+    return sorted(paths)
+
+
+# =========================
+# EXTRACCIÓN (procesos worker)
+# =========================
+_worker = {}
+
+
+def _init_worker(store_path, columns, anio_actual):
+    store = PdfStore(store_path, pdf_text_backend(), ANALYSIS_VERSION) if store_path else None
+    _worker.update(store=store, columns=columns, anio_actual=anio_actual)
+
+
+def extract_file(path):
+    # fila sin predicciones: {path, sha256, anio, n_chars, cached, indicadores} o {path, error}
+    store = _worker["store"]
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+        sha = digest(data)
+        doc = store.get_document(sha) if store else None
+        cached = doc is not None
+        if doc is None:
+            texto = js_trim(pdf_text(data))
+            if len(texto) < 10:
+                raise ExtractionError("PDF vacío o ilegible.")
+            doc = {"n_chars": len(texto), "anio": inferir_anio(texto), "stats": analizar(texto)}
+            if store:
+                store.put_document(sha, len(data), doc["n_chars"], doc["anio"], doc["stats"])
+        indicadores = indicadores_desde_analisis(doc["stats"], doc["anio"], _worker["columns"], _worker["anio_actual"])
+    except (OSError, ExtractionError) as e:
+        return {"path": path, "error": str(e)}
+    except sqlite3.Error as e:
+        # pdf_store bloqueado o dañado: el documento queda con error, el resto del lote sigue
+        return {"path": path, "error": f"pdf_store: {type(e).__name__}: {e}"}
+    except Exception as e:
+        # un PDF malformado puede romper pypdf con cualquier excepción
+        traceback.print_exc()
+        return {"path": path, "error": f"{type(e).__name__}: {e}"}
+    return {"path": path, "sha256": sha, "anio": doc["anio"], "n_chars": doc["n_chars"], "cached": cached,
+            "indicadores": indicadores}
+
+
+# =========================
+# CALIFICACIÓN
+# =========================
+def score(arts, models, records):
+    # agrega a cada registro válido la predicción de cada modelo (un predict por modelo y lote)
+    ok = [r for r in records if "error" not in r]
+    if not ok:
+        return records
+    X = arts.preprocessor.scale_inplace(arts.preprocessor.clean_many([r["indicadores"] for r in ok]))
+    for name in models:
+        for r, p in zip(ok, arts.models.get(name).predict(X).tolist()):
+            r[name] = p
+    return records
+
+
+# =========================
+# SALIDA Y CHECKPOINT
+# =========================
+class Output:
+    # JSONL o CSV con reanudación: el checkpoint guarda el tamaño de la salida tras cada lote
+    def __init__(self, path, fields, meta, restart=False):
+        self.path, self.fields, self.meta = path, fields, meta
+        self.ckpt = path + ".ckpt"
+        self.csv = path.endswith(".csv")
+        self.done = set()
+        ckpt = None
+        if not restart and os.path.exists(self.ckpt):
+            with open(self.ckpt, encoding="utf-8") as f:
+                ckpt = json.load(f)
+            if ckpt["meta"] != meta:
+                raise SystemExit(f"El checkpoint {self.ckpt} es de otra versión de artefactos o de otros modelos "
+                                 f"({ckpt['meta']}); usar --restart para empezar de cero")
+        # menor que el checkpoint si la salida ya se reescribió sin errores (ver _drop_errors)
+        offset = min(ckpt["offset"], os.path.getsize(path)) if ckpt and os.path.exists(path) else 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.f = open(path, "r+" if offset else "w", newline="", encoding="utf-8")
+        if offset:
+            # lo escrito después del último checkpoint es un lote incompleto
+            self.f.truncate(offset)
+            self.f.seek(0)
+            rows = list(csv.DictReader(self.f) if self.csv else (json.loads(line) for line in self.f))
+            kept = [r for r in rows if not r.get("error")]
+            if len(kept) < len(rows):
+                self._drop_errors(kept)
+            self.done = {r["path"] for r in kept}
+            self.f.seek(0, os.SEEK_END)
+        elif self.csv:
+            csv.DictWriter(self.f, fieldnames=fields).writeheader()
+
+    def _write_rows(self, f, rows):
+        writer = csv.DictWriter(f, fieldnames=self.fields, extrasaction="ignore") if self.csv else None
+        for r in rows:
+            if self.csv:
+                # en CSV los indicadores van como columnas
+                writer.writerow({**r.get("indicadores", {}), **r})
+            else:
+                f.write(json.dumps(r, ensure_ascii=False) + "\n")
+
+    def _checkpoint(self, offset):
+        tmp = self.ckpt + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"meta": self.meta, "offset": offset, "time": time.time()}, f)
+        os.replace(tmp, self.ckpt)
+
+    def _drop_errors(self, kept):
+        # reescribe la salida solo con las filas sin error para que esos PDFs se reintenten;
+        # primero la salida y después el checkpoint (un corte entre ambos deja un offset
+        # mayor que el archivo, que __init__ acota)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", newline="", encoding="utf-8") as f:
+            if self.csv:
+                csv.DictWriter(f, fieldnames=self.fields).writeheader()
+            self._write_rows(f, kept)
+            f.flush()
+            os.fsync(f.fileno())
+        self.f.close()
+        os.replace(tmp, self.path)
+        self.f = open(self.path, "r+", newline="", encoding="utf-8")
+        self._checkpoint(os.path.getsize(self.path))
+
+    def write(self, records):
+        self._write_rows(self.f, records)
+        self.f.flush()
+        os.fsync(self.f.fileno())
+        self._checkpoint(self.f.tell())
+
+    def close(self):
+        self.f.close()
+
+
+def progress(done, total, skipped, t0, errors, final=False):
+    elapsed = time.perf_counter() - t0
+    rate = done / elapsed if elapsed > 0 else 0.0
+    eta = (total - skipped - done) / rate if rate > 0 else float("inf")
+    end = "\n" if final else "\r"
+    sys.stderr.write(f"{done + skipped}/{total} PDFs  {rate:7.1f} docs/s  errores={errors}  "
+                     f"{elapsed:7.1f}s  ETA {eta:7.0f}s   {end}")
+    sys.stderr.flush()
+    return rate
+
+
+def rescore(paths, out, models=None, workers=None, batch=512, chunksize=8, store_path=DEFAULT_DB, restart=False):
+    version, _ = detect_version(STATIC_DIR)
+    arts = ArtifactSet(STATIC_DIR, version, {"shared": True})
+    if models == ["all"]:
+        models = arts.models.names()
+    models = models or [arts.models.default_name()]
+    unknown = [m for m in models if m not in arts.models]
+    if unknown:
+        raise SystemExit(f"Modelos no disponibles: {unknown}. Opciones: {arts.models.names()}")
+    for name in models:
+        arts.models.get(name)  # cargar antes de medir
+
+    fields = BASE_FIELDS + models + ([] if not out.endswith(".csv") else list(arts.model_columns))
+    anio_actual = datetime.date.today().year
+    output = Output(out, fields, {"version": version, "models": models, "anio_actual": anio_actual}, restart)
+    todo = [p for p in paths if p not in output.done]
+    skipped = len(paths) - len(todo)
+    if skipped:
+        print(f"Reanudando: {skipped} PDFs ya calificados en {out}", file=sys.stderr)
+
+    workers = workers or os.cpu_count() or 1
+    done = errors = 0
+    pending = []
+    t0 = time.perf_counter()
+    with Pool(workers, initializer=_init_worker, initargs=(store_path, arts.model_columns, anio_actual)) as pool:
+        # los workers extraen sin esperar a la calificación: el lote siguiente ya está en curso
+        for rec in pool.imap_unordered(extract_file, todo, chunksize=chunksize):
+            pending.append(rec)
+            if len(pending) >= batch:
+                output.write(score(arts, models, pending))
+                done += len(pending)
+                errors += sum("error" in r for r in pending)
+                pending = []
+                progress(done, len(paths), skipped, t0, errors)
+        if pending:
+            output.write(score(arts, models, pending))
+            done += len(pending)
+            errors += sum("error" in r for r in pending)
+    output.close()
+    rate = progress(done, len(paths), skipped, t0, errors, final=True)
+    return {"version": version, "models": models, "total": len(paths), "scored": done, "skipped": skipped,
+            "errors": errors, "docs_per_s": rate, "wall_s": time.perf_counter() - t0, "out": out}
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Re-califica todos los PDFs de un directorio o manifiesto con los artefactos actuales")
+    ap.add_argument("directory", nargs="?", default=UPLOADS_DIR)
+    ap.add_argument("--manifest", default=None, help="lista de rutas (.txt, o .csv/.jsonl con columna path) en lugar del directorio")
+    ap.add_argument("--out", default=DEFAULT_OUT, help="salida .jsonl o .csv (checkpoint en <out>.ckpt)")
+    ap.add_argument("--models", nargs="*", default=None, help="modelos a usar (por defecto el modelo por defecto de la API; 'all' = todos)")
+    ap.add_argument("--workers", type=int, default=None, help="procesos de extracción (por defecto, todos los núcleos)")
+    ap.add_argument("--batch", type=int, default=512, help="PDFs por lote de calificación y por checkpoint")
+    ap.add_argument("--chunksize", type=int, default=8, help="PDFs por envío a cada worker")
+    ap.add_argument("--no-store", action="store_true", help="no leer ni guardar conteos de texto en pdf_store")
+    ap.add_argument("--restart", action="store_true", help="ignorar el checkpoint y reescribir la salida")
+    args = ap.parse_args()
+
+    summary = rescore(list_pdfs(args.directory, args.manifest), args.out, args.models, args.workers, args.batch,
+                      args.chunksize, None if args.no_store else DEFAULT_DB, args.restart)
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
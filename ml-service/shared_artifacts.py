@@ -0,0 +1,168 @@
+# shared_artifacts.py
+# Formato de artefactos "planos" para compartir los pesos entre workers de gunicorn.
+# Cada modelo se exporta a Static/shared/<nombre>/ como arrays .npy (nodos de los
+# árboles, coeficientes de Ridge, media/escala del scaler) más un meta.json. Al
+# cargarlos con np.load(mmap_mode="r") todos los workers mapean las mismas
+# páginas del page cache: N workers cuestan ~1 copia de los pesos, no N.
+# Cada export escribe sus arrays con un token propio (<clave>-<token>.npy) y
+# meta.json, reemplazado al final, apunta al token: un worker que lee durante un
+# export ve todos los arrays del export anterior o todos los del nuevo, nunca
+# una mezcla.
+# train_model.py exporta al terminar; la API los usa salvo con ML_SHARED_ARTIFACTS=0
+# y, si un .pkl cambió después del export, carga el .pkl.
+#
+# Uso: python shared_artifacts.py      (exporta todos los Static/modelo_*.pkl)
+import glob
+import json
+import os
+import uuid
+
+import joblib
+import numpy as np
+
+from tree_engine import COMPACT_PREFIX, CompiledModel, pack_model
+
+FORMAT_VERSION = 3
+SHARED_SUBDIR = "shared"
+
+
+def _source_stamp(path):
+    st = os.stat(path)
+    return {"source": os.path.basename(path), "source_size": st.st_size, "source_mtime": st.st_mtime}
+
+
+# =========================
+# EXPORT
+# =========================
+def _array_path(d, key, token):
+    return os.path.join(d, f"{key}-{token}.npy")
+
+
+def write_packed(dest_dir, meta, arrays):
+    os.makedirs(dest_dir, exist_ok=True)
+    token = uuid.uuid4().hex[:12]
+    for key, arr in arrays.items():
+        # archivos nuevos con el token de este export: no se toca ningún array
+        # que un worker pueda estar mapeando
+        tmp = os.path.join(dest_dir, f"{key}-{token}.tmp.npy")
+        np.save(tmp, np.ascontiguousarray(arr))
+        os.replace(tmp, _array_path(dest_dir, key, token))
+    meta = dict(meta, format_version=FORMAT_VERSION, token=token, arrays=sorted(arrays))
+    # meta.json se reemplaza al final y de una vez: es el puntero al export completo
+    tmp = os.path.join(dest_dir, "meta.json.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, os.path.join(dest_dir, "meta.json"))
+    # arrays de exports anteriores: los workers que ya los mapean conservan el inodo
+    keep = {os.path.basename(_array_path(dest_dir, k, token)) for k in arrays}
+    for p in glob.glob(os.path.join(dest_dir, "*.npy")):
+        if os.path.basename(p) not in keep and not p.endswith(".tmp.npy"):
+            try:
+                os.remove(p)
+            except OSError:
+                pass
+
+
+def export_model(static_dir, name, model=None):
+    src = os.path.join(static_dir, f"modelo_{name}.pkl")
+    if model is None:
+        model = joblib.load(src)
+    packed = pack_model(model, float32=name.startswith(COMPACT_PREFIX))
+    if packed is None:
+        return False
+    meta, arrays = packed
+    meta.update(_source_stamp(src))
+    write_packed(os.path.join(static_dir, SHARED_SUBDIR, name), meta, arrays)
+    return True
+
+
+def export_scaler(static_dir, scaler=None):
+    src = os.path.join(static_dir, "scaler_tesis.pkl")
+    if scaler is None:
+        scaler = joblib.load(src)
+    arrays = {"mean": np.asarray(scaler.mean_, dtype=np.float64),
+              "scale": np.asarray(scaler.scale_, dtype=np.float64)}
+    meta = {"kind": "scaler", "with_mean": bool(scaler.with_mean), "with_std": bool(scaler.with_std)}
+    meta.update(_source_stamp(src))
+    write_packed(os.path.join(static_dir, SHARED_SUBDIR, "_scaler"), meta, arrays)
+
+
+def export_all(static_dir):
+    exported, skipped = [], []
+    for p in sorted(glob.glob(os.path.join(static_dir, "modelo_*.pkl"))):
+        name = os.path.basename(p).replace("modelo_", "").replace(".pkl", "")
+        try:
+            (exported if export_model(static_dir, name) else skipped).append(name)
+        except Exception as e:
+            print(f"No se pudo exportar {name}: {e}")
+            skipped.append(name)
+    if os.path.exists(os.path.join(static_dir, "scaler_tesis.pkl")):
+        export_scaler(static_dir)
+    return exported, skipped
+
+
+# =========================
+# CARGA (mmap)
+# =========================
+def _read_packed(static_dir, name, source_path, attempts=3):
+    d = os.path.join(static_dir, SHARED_SUBDIR, name)
+    meta_path = os.path.join(d, "meta.json")
+    for _ in range(attempts):
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("format_version") != FORMAT_VERSION:
+            return None
+        # si el .pkl cambió después del export, el artefacto plano está desactualizado
+        if source_path and os.path.exists(source_path):
+            stamp = _source_stamp(source_path)
+            if stamp["source_size"] != meta.get("source_size") or stamp["source_mtime"] != meta.get("source_mtime"):
+                return None
+        try:
+            # todos los arrays del mismo token que este meta.json
+            arrays = {k: np.load(_array_path(d, k, meta["token"]), mmap_mode="r") for k in meta["arrays"]}
+        except FileNotFoundError:
+            # otro export reemplazó meta.json y borró estos arrays entre medio: releer
+            continue
+        return meta, arrays
+    return None
+
+
+class SharedScaler:
+    # expone mean_/scale_ como StandardScaler para Preprocessor
+    def __init__(self, meta, arrays):
+        self.with_mean = meta["with_mean"]
+        self.with_std = meta["with_std"]
+        self.mean_ = arrays["mean"]
+        self.scale_ = arrays["scale"]
+
+    def transform(self, X):
+        X = np.array(X, dtype=np.float64)
+        if self.with_mean:
+            X -= self.mean_
+        if self.with_std:
+            X /= self.scale_
+        return X
+
+
+def load_model(static_dir, name, source_path=None):
+    packed = _read_packed(static_dir, name, source_path)
+    if packed is None or packed[0].get("kind") not in ("forest", "linear"):
+        return None
+    return CompiledModel(name, *packed, shared=True)
+
+
+def load_scaler(static_dir):
+    packed = _read_packed(static_dir, "_scaler", os.path.join(static_dir, "scaler_tesis.pkl"))
+    if packed is None:
+        return None
+    return SharedScaler(*packed)
+
+
+if __name__ == "__main__":
+    static = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Static")
+    ok, skipped = export_all(static)
+    print("Exportados a Static/shared:", ok)
+    if skipped:
+        print("Sin formato plano (se usa el .pkl):", skipped)
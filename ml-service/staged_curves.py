@@ -0,0 +1,68 @@
+# staged_curves.py
+# Curvas train/validation por número de árboles (iteraciones) en O(T).
+# Las predicciones de cada árbol se calculan una sola vez y se apilan en una
+# matriz (T, n); la predicción del ensamble con los primeros i árboles sale de
+# la suma acumulada, en lugar de volver a predecir los i árboles para cada i.
+#   - bagging (RandomForest, ExtraTrees, Bagging...): media de prefijos
+#   - GradientBoosting: staged_predict
+#   - XGBoost: aporte de cada árbol con iteration_range + suma acumulada
+import numpy as np
+
+
+def _tree_matrix(model, X):
+    # predicciones por árbol de un ensamble de bagging: (T, n)
+    from tree_engine import compile_model
+
+    compiled = compile_model(model)
+    if compiled is not None and compiled.meta["aggregate"] == "mean":
+        # motor compilado: todas las hojas de todos los árboles en una pasada vectorizada
+        return compiled.arrays["value"][compiled.leaves(X)].T
+    X = np.asarray(X)
+    features = getattr(model, "estimators_features_", None)
+    rows = []
+    for i, est in enumerate(model.estimators_):
+        Xi = X[:, features[i]] if features is not None else X
+        rows.append(est.predict(Xi))
+    return np.vstack(rows)
+
+
+def _xgb_staged(model, X):
+    # margen de cada ronda por separado: iteration_range=(i, i+1) da base + aporte del árbol i
+    n_rounds = model.get_booster().num_boosted_rounds()
+    full = model.predict(X, output_margin=True)
+    if n_rounds <= 1:
+        return full[None, :]
+    P = np.vstack([model.predict(X, iteration_range=(i, i + 1), output_margin=True)
+                   for i in range(n_rounds)])
+    # sum(P) = T * base + sum(aportes) y full = base + sum(aportes)
+    base = (P.sum(axis=0) - full) / (n_rounds - 1)
+    # objetivo de regresión por defecto (reg:squarederror): la predicción es el margen
+    return base + np.cumsum(P - base, axis=0)
+
+
+def staged_predictions(model, X):
+    # predicción del ensamble con los primeros 1..T estimadores: (T, n), o None si no aplica
+    from sklearn.pipeline import Pipeline
+
+    if isinstance(model, Pipeline):
+        for _, step in model.steps[:-1]:
+            X = step.transform(X)
+        model = model.steps[-1][1]
+    if hasattr(model, "get_booster"):
+        return _xgb_staged(model, X)
+    if hasattr(model, "staged_predict"):
+        return np.vstack(list(model.staged_predict(X)))
+    if isinstance(getattr(model, "estimators_", None), list):
+        P = _tree_matrix(model, X)
+        return np.cumsum(P, axis=0) / np.arange(1, P.shape[0] + 1)[:, None]
+    return None
+
+
+def staged_rmse(model, X, y):
+    # (pasos, rmse por paso) o (None, None) si el modelo no es un ensamble por etapas
+    staged = staged_predictions(model, X)
+    if staged is None:
+        return None, None
+    err = staged - np.asarray(y, dtype=np.float64)[None, :]
+    rmse = np.sqrt(np.mean(err * err, axis=1))
+    return np.arange(1, len(rmse) + 1), rmse
@@ -0,0 +1,267 @@
+# stages.py
+# Pipeline de etapas con caché por contenido para train_model.py.
+# Cada etapa declara de qué etapas depende, sus parámetros y sus archivos de
+# entrada; su clave es el hash de:
+#   - el código de la función (AST normalizado: los comentarios no cuentan),
+#     de las funciones auxiliares declaradas (code=) y de las funciones y clases
+#     del mismo archivo que usan, de forma transitiva
+#   - el contenido de los módulos del proyecto que usan (p. ej. ingest.py por
+#     ingest.read_metrics) y de los que esos importan
+#   - los parámetros
+#   - el contenido de los archivos de entrada
+#   - el hash de la *salida* de cada etapa previa
+# La salida se guarda con joblib en Static/stages/<etapa>.joblib y la clave en
+# Static/stages/index.json. Una etapa está al día si su clave coincide con la de
+# la última ejecución (y existen los archivos que declara como salida); si una
+# etapa previa se vuelve a ejecutar pero produce lo mismo, las siguientes no se
+# invalidan.
+import ast
+import hashlib
+import inspect
+import json
+import os
+import sys
+import textwrap
+import time
+import types
+from contextlib import nullcontext
+
+import joblib
+
+
+def _code_digest(fn):
+    try:
+        src = textwrap.dedent(inspect.getsource(fn))
+        return ast.dump(ast.parse(src))
+    except (OSError, TypeError, SyntaxError):
+        return getattr(fn, "__qualname__", repr(fn))
+
+
+def _names(code):
+    # nombres globales que usa un objeto código, incluidas funciones anidadas y lambdas
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            names |= _names(const)
+    return names
+
+
+_CODE_OBJECTS = (types.ModuleType, type, types.FunctionType)
+
+
+def _project_file(obj, root):
+    # archivo .py del proyecto (directamente en root) que define un módulo, función o clase;
+    # None para instancias, stdlib y site-packages
+    if not isinstance(obj, _CODE_OBJECTS):
+        return None
+    mod = obj if isinstance(obj, types.ModuleType) else sys.modules.get(getattr(obj, "__module__", None) or "")
+    path = getattr(mod, "__file__", None)
+    if not path or not path.endswith(".py"):
+        return None
+    path = os.path.abspath(path)
+    return path if os.path.dirname(path) == root else None
+
+
+def code_dependencies(fns):
+    # (funciones y clases del mismo archivo que fns[0] alcanzables desde fns,
+    #  archivos de los demás módulos del proyecto que usan, y los que esos importan)
+    own = os.path.abspath(inspect.getsourcefile(fns[0]))
+    root = os.path.dirname(own)
+    helpers, files = [], set()
+    seen = {id(fn) for fn in fns}
+    stack = list(fns)
+    while stack:
+        fn = stack.pop()
+        if isinstance(fn, type):
+            # clase: los nombres que usan sus métodos
+            scope = fns[0].__globals__
+            names = set().union(*(_names(getattr(a, "__func__", a).__code__) for a in vars(fn).values()
+                                  if hasattr(getattr(a, "__func__", a), "__code__")))
+        else:
+            scope, names = fn.__globals__, _names(fn.__code__)
+        for name in names:
+            obj = scope.get(name)
+            path = _project_file(obj, root)
+            if path is None or id(obj) in seen:
+                continue
+            seen.add(id(obj))
+            if path != own:
+                files.add(path)
+            elif not isinstance(obj, types.ModuleType):
+                helpers.append(obj)
+                stack.append(obj)
+    by_file = {os.path.abspath(m.__file__): m for m in list(sys.modules.values())
+               if isinstance(getattr(m, "__file__", None), str)}
+    pending = list(files)
+    while pending:
+        mod = by_file.get(pending.pop())
+        for obj in vars(mod).values() if mod else ():
+            path = _project_file(obj, root)
+            if path and path != own and path not in files:
+                files.add(path)
+                pending.append(path)
+    return helpers, sorted(files)
+
+
+def file_digest(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class Stage:
+    def __init__(self, name, fn, deps=(), params=None, inputs=(), outputs=(), code=()):
+        self.name = name
+        self.fn = fn
+        self.deps = list(deps)        # etapas previas; su salida llega como argumento posicional
+        self.params = params or {}    # llegan como argumentos con nombre
+        self.inputs = list(inputs)    # archivos leídos por la etapa (se hashea su contenido)
+        self.outputs = list(outputs)  # archivos escritos en Static/ (relativos); si faltan, se re-ejecuta
+        self.code = list(code)        # funciones auxiliares cuyo código también forma parte de la clave
+        self._deps = None             # (funciones del mismo archivo, módulos del proyecto) que usa
+
+    def dependencies(self):
+        if self._deps is None:
+            self._deps = code_dependencies([self.fn] + self.code)
+        return self._deps
+
+
+class Pipeline:
+    def __init__(self, static_dir, subdir="stages"):
+        self.static_dir = static_dir
+        self.cache_dir = os.path.join(static_dir, subdir)
+        self.index_path = os.path.join(self.cache_dir, "index.json")
+        self.stages = {}  # en orden de declaración (= orden topológico)
+        self._loaded = {}
+
+    def stage(self, name, deps=(), params=None, inputs=(), outputs=(), code=()):
+        # decorador: @pipeline.stage("split", deps=["clean"], params={...})
+        def register(fn):
+            for d in deps:
+                if d not in self.stages:
+                    raise ValueError(f"La etapa {name} depende de {d}, que no está declarada antes")
+            self.stages[name] = Stage(name, fn, deps, params, inputs, outputs, code)
+            return fn
+        return register
+
+    # ---------- índice ----------
+    def _index(self):
+        if not os.path.exists(self.index_path):
+            return {}
+        with open(self.index_path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def _write_index(self, index):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp = self.index_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(index, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.index_path)
+
+    def _entry_path(self, name):
+        return os.path.join(self.cache_dir, f"{name}.joblib")
+
+    def work_dir(self, name):
+        # directorio de trabajo de una etapa (Static/stages/<etapa>/): archivos intermedios que
+        # no son artefactos servidos; solo la etapa export escribe en Static/
+        path = os.path.join(self.cache_dir, name)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    # ---------- claves ----------
+    def key(self, name, index):
+        st = self.stages[name]
+        h = hashlib.sha256()
+        h.update(name.encode("utf-8"))
+        helpers, modules = st.dependencies()
+        for fn in [st.fn] + st.code + sorted(helpers, key=lambda f: f.__qualname__):
+            h.update(_code_digest(fn).encode("utf-8"))
+        for path in modules:
+            h.update(os.path.basename(path).encode("utf-8"))
+            h.update(file_digest(path).encode("utf-8"))
+        h.update(json.dumps(st.params, sort_keys=True, ensure_ascii=False, default=repr).encode("utf-8"))
+        for path in st.inputs:
+            h.update(file_digest(path).encode("utf-8") if os.path.exists(path) else b"-")
+        for d in st.deps:
+            h.update(index.get(d, {}).get("out", "-").encode("utf-8"))
+        return h.hexdigest()[:16]
+
+    def _fresh(self, name, key, index):
+        entry = index.get(name)
+        if not entry or entry.get("key") != key or not os.path.exists(self._entry_path(name)):
+            return False
+        return all(os.path.exists(os.path.join(self.static_dir, o)) for o in self.stages[name].outputs)
+
+    def _ancestors(self, names):
+        seen = set()
+        stack = list(names)
+        while stack:
+            n = stack.pop()
+            if n in seen:
+                continue
+            seen.add(n)
+            stack.extend(self.stages[n].deps)
+        return seen
+
+    def status(self):
+        # [(etapa, estado)] sin ejecutar nada; "stale (previa)" si alguna previa está desactualizada
+        index = self._index()
+        out, stale = [], set()
+        for name, st in self.stages.items():
+            if any(d in stale for d in st.deps):
+                state = "stale (previa)"
+            elif self._fresh(name, self.key(name, index), index):
+                entry = index[name]
+                state = f"ok ({entry['seconds']:.1f}s, {time.strftime('%Y-%m-%d %H:%M', time.localtime(entry['time']))})"
+            else:
+                state = "stale"
+            if not state.startswith("ok"):
+                stale.add(name)
+            out.append((name, state))
+        return out
+
+    # ---------- ejecución ----------
+    def output(self, name):
+        # salida de una etapa ya ejecutada (se carga de la caché solo si hace falta)
+        if name not in self._loaded:
+            self._loaded[name] = joblib.load(self._entry_path(name))
+        return self._loaded[name]
+
+    def run(self, targets=None, force=False, profiler=None):
+        # ejecuta las etapas pedidas (por defecto todas) que estén desactualizadas, y las
+        # previas que haga falta; con force se re-ejecutan las pedidas aunque estén al día.
+        # Con un profiling.Profiler cada etapa se registra como sección
+        unknown = [t for t in targets or [] if t not in self.stages]
+        if unknown:
+            raise ValueError(f"Etapas desconocidas: {unknown}. Disponibles: {list(self.stages)}")
+        targets = set(targets or self.stages)
+        needed = self._ancestors(targets)
+        index = self._index()
+        executed = []
+        for name, st in self.stages.items():
+            if name not in needed:
+                continue
+            key = self.key(name, index)
+            if not (force and name in targets) and self._fresh(name, key, index):
+                print(f"[{name}] al día ({key})")
+                if profiler:
+                    with profiler.section(name, cached=True):
+                        pass
+                continue
+            print(f"[{name}] ejecutando ({key}) ...")
+            t0 = time.time()
+            with profiler.section(name, cached=False) if profiler else nullcontext():
+                result = st.fn(*[self.output(d) for d in st.deps], **st.params)
+            seconds = time.time() - t0
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp = self._entry_path(name) + ".tmp"
+            joblib.dump(result, tmp)
+            os.replace(tmp, self._entry_path(name))
+            self._loaded[name] = result
+            index[name] = {"key": key, "out": joblib.hash(result), "time": time.time(), "seconds": seconds}
+            self._write_index(index)
+            executed.append(name)
+            print(f"[{name}] terminada en {seconds:.1f}s")
+        return executed
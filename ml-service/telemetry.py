@@ -0,0 +1,187 @@
+# telemetry.py
+# Métricas en proceso para api_ml.py en formato de texto de Prometheus (GET /metrics),
+# sin servicios externos ni dependencias. Contadores, gauges e histogramas de
+# buckets fijos: observar es un bisect + una suma bajo un lock, apto para el
+# camino caliente de /predict.
+# Cada petición lleva una Trace que marca el fin de cada etapa (json, clean,
+# load, scale, predict, metrics, serialize); al terminar se vuelcan todas al
+# histograma ml_stage_seconds{model, stage}, así se ve si la latencia viene del
+# preprocesamiento o del modelo.
+# Con gunicorn cada worker tiene su propio registro: /metrics muestra el del
+# worker que atiende la petición.
+# api_ml.py registra peticiones y latencia por endpoint y código, peticiones en
+# curso, errores por motivo, filas de lote rechazadas, tesis calificadas por
+# modelo, memoria de cada modelo residente y pico de RSS. ML_METRICS=0 desactiva
+# los tiempos por etapa.
+import bisect
+import math
+import threading
+import time
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# segundos; desde 50 µs (un Ridge) hasta 10 s (lotes grandes / carga de un modelo)
+DEFAULT_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 10.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)] + list(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(v):
+    if v == math.inf:
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *values, amount=1):
+        with self._lock:
+            self._values[values] = self._values.get(values, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for values, v in sorted(items):
+            yield self.name, _labels(self.labels, values), v
+
+
+class Gauge:
+    kind = "gauge"
+
+    def __init__(self, name, help, labels=(), collect=None):
+        # collect: función que devuelve {tupla de etiquetas: valor} al exportar
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self.collect = collect
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *values, amount=1):
+        with self._lock:
+            self._values[values] = self._values.get(values, 0) + amount
+
+    def dec(self, *values, amount=1):
+        self.inc(*values, amount=-amount)
+
+    def set(self, *values, value):
+        with self._lock:
+            self._values[values] = value
+
+    def samples(self):
+        if self.collect is not None:
+            items = list(self.collect().items())
+        else:
+            with self._lock:
+                items = list(self._values.items())
+        for values, v in sorted(items):
+            yield self.name, _labels(self.labels, values), v
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # etiquetas -> [conteos por bucket (no acumulados) + +Inf, suma]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *values):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            s = self._series.get(values)
+            if s is None:
+                s = self._series[values] = [[0] * (len(self.buckets) + 1), 0.0]
+            s[0][i] += 1
+            s[1] += value
+
+    def samples(self):
+        with self._lock:
+            items = [(k, list(counts), total) for k, (counts, total) in self._series.items()]
+        for values, counts, total in sorted(items):
+            acc = 0
+            for le, c in zip(self.buckets + (math.inf,), counts):
+                acc += c
+                yield self.name + "_bucket", _labels(self.labels, values, [f'le="{_number(le)}"']), acc
+            yield self.name + "_sum", _labels(self.labels, values), total
+            yield self.name + "_count", _labels(self.labels, values), acc
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, *args, **kwargs):
+        return self.add(Counter(*args, **kwargs))
+
+    def gauge(self, *args, **kwargs):
+        return self.add(Gauge(*args, **kwargs))
+
+    def histogram(self, *args, **kwargs):
+        return self.add(Histogram(*args, **kwargs))
+
+    def render(self):
+        lines = []
+        for m in self.metrics:
+            lines.append(f"# HELP {m.name} {m.help}")
+            lines.append(f"# TYPE {m.name} {m.kind}")
+            for name, labels, value in m.samples():
+                lines.append(f"{name}{labels} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+class Trace:
+    # tiempos por etapa de una petición; se vuelcan al histograma al conocer el modelo
+    __slots__ = ("marks", "_t")
+
+    def __init__(self):
+        self.marks = []
+        self._t = time.perf_counter()
+
+    def mark(self, stage):
+        # cierra la etapa `stage` (desde la marca anterior) y empieza a contar la siguiente
+        t = time.perf_counter()
+        self.marks.append((stage, t - self._t))
+        self._t = t
+
+    def skip(self):
+        # descarta el tiempo desde la última marca (trabajo que no pertenece a ninguna etapa)
+        self._t = time.perf_counter()
+
+    def flush(self, histogram, model):
+        for stage, seconds in self.marks:
+            histogram.observe(seconds, model, stage)
+        self.marks = []
+
+
+class NullTrace:
+    # con ML_METRICS=0: mismas llamadas, sin costo
+    __slots__ = ()
+
+    def mark(self, stage):
+        pass
+
+    def skip(self):
+        pass
+
+    def flush(self, histogram, model):
+        pass
+
+
+NULL_TRACE = NullTrace()
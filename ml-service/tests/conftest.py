@@ -0,0 +1,30 @@
+# conftest.py
+# Pruebas de ml-service contra los artefactos de Static/ (python -m pytest ml-service/tests).
+# Las bases SQLite de la API (trabajos, pdf_store) van a un directorio temporal.
+import os
+import sys
+import tempfile
+
+import pytest
+
+ML_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ML_DIR)
+
+_tmp = tempfile.mkdtemp(prefix="ml-tests-")
+os.environ.setdefault("ML_RELOAD_INTERVAL", "0")
+os.environ.setdefault("ML_JOB_DB", os.path.join(_tmp, "jobs.sqlite3"))
+os.environ.setdefault("ML_PDF_DB", os.path.join(_tmp, "pdf_store.sqlite3"))
+
+
+@pytest.fixture(scope="session")
+def api():
+    import api_ml
+
+    if api_ml.artifacts.current is None or not api_ml.artifacts.current.models:
+        pytest.skip("sin artefactos en Static/ (ejecutar train_model.py)")
+    return api_ml
+
+
+@pytest.fixture
+def client(api):
+    return api.app.test_client()
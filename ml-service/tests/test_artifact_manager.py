@@ -0,0 +1,40 @@
+import os
+
+from artifact_manager import detect_version, write_manifest
+
+
+def _static(tmp_path):
+    static = tmp_path / "Static"
+    static.mkdir()
+    (static / "modelo_tesis.pkl").write_bytes(b"a")
+    (static / "model_columns.pkl").write_bytes(b"c")
+    return str(static)
+
+
+def test_manifest_version_while_files_unchanged(tmp_path):
+    static = _static(tmp_path)
+    version = write_manifest(static)
+    assert detect_version(static) == ("m-" + version, True)
+
+
+def test_new_model_copied_without_manifest_is_detected(tmp_path):
+    static = _static(tmp_path)
+    write_manifest(static)
+    (tmp_path / "Static" / "modelo_nuevo.pkl").write_bytes(b"n")
+    version, from_manifest = detect_version(static)
+    assert version.startswith("f-") and not from_manifest
+
+
+def test_replaced_model_is_detected(tmp_path):
+    static = _static(tmp_path)
+    write_manifest(static)
+    path = os.path.join(static, "modelo_tesis.pkl")
+    with open(path, "wb") as f:
+        f.write(b"otro modelo")
+    before, _ = detect_version(static)
+    assert before.startswith("f-")
+    # mismo tamaño, otro mtime
+    with open(path, "wb") as f:
+        f.write(b"otro modelx")
+    os.utime(path, ns=(1, 1))
+    assert detect_version(static)[0] != before
@@ -0,0 +1,29 @@
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+
+from diagnostics import generar_resumen_diagnostico
+
+
+def _data():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(rng.integers(0, 6, size=(40, 3)).astype(float), columns=["a", "b", "c"])
+    df["TOTAL"] = df.sum(axis=1)
+    return df
+
+
+def test_importances_use_the_training_columns(tmp_path):
+    df = _data()
+    model = RandomForestRegressor(n_estimators=5, random_state=0).fit(df[["a", "b", "c"]], df["TOTAL"])
+    generar_resumen_diagnostico(df, ["a", "b", "c"], "TOTAL", str(tmp_path), models_dict={"RF": model},
+                                plot=lambda *a, **kw: None)
+    imp = pd.read_csv(tmp_path / "diagnostics" / "feature_importances_RF.csv")
+    assert sorted(imp["feature"]) == ["a", "b", "c"]
+
+
+def test_column_mismatch_is_reported(tmp_path, capsys):
+    df = _data()
+    model = RandomForestRegressor(n_estimators=5, random_state=0).fit(df[["a", "b", "c"]], df["TOTAL"])
+    generar_resumen_diagnostico(df, ["a", "b"], "TOTAL", str(tmp_path), models_dict={"RF": model},
+                                plot=lambda *a, **kw: None)
+    assert "No se pudo explicar el modelo RF" in capsys.readouterr().out
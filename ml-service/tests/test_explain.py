@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import ExtraTreesRegressor, GradientBoostingRegressor, RandomForestRegressor
+from sklearn.linear_model import Ridge
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+from explain import contributions
+from tree_engine import compile_model
+
+MODELS = {
+    "RandomForest": lambda: RandomForestRegressor(n_estimators=15, random_state=0),
+    "ExtraTrees": lambda: ExtraTreesRegressor(n_estimators=15, random_state=0),
+    "GradientBoosting": lambda: GradientBoostingRegressor(n_estimators=25, random_state=0),
+    "Ridge": lambda: Pipeline([("scaler", StandardScaler()), ("ridge", Ridge(alpha=1.0))]),
+}
+
+
+@pytest.mark.parametrize("kind", sorted(MODELS))
+@pytest.mark.parametrize("compiled", [True, False], ids=["compilado", "sklearn"])
+def test_base_plus_contributions_is_prediction(kind, compiled):
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(150, 5))
+    X[:, 0] = rng.integers(0, 6, size=150)
+    y = 2 * X[:, 0] + X[:, 1] * X[:, 2] + rng.normal(scale=0.1, size=150)
+    model = MODELS[kind]().fit(X, y)
+    served = compile_model(model, kind) if compiled else model
+    Xt = rng.normal(size=(40, 5))
+    base, contrib, _ = contributions(served, Xt)
+    np.testing.assert_allclose(base + contrib.sum(axis=1), model.predict(Xt), rtol=1e-9, atol=1e-9)
+
+
+def test_api_explanation_adds_up_to_prediction(api, client):
+    row = {c: i % 5 for i, c in enumerate(api.artifacts.current.model_columns)}
+    checked = 0
+    for model in api.artifacts.current.models.names():
+        r = client.post("/predict", json={"model": model, "explain": True, **row})
+        if r.status_code != 200:
+            continue  # modelo que no se puede cargar en este entorno
+        body = r.get_json()
+        exp = body["explanation"]
+        if exp is None:
+            continue
+        total = exp["base"] + sum(c["contribution"] for c in exp["contributions"])
+        assert total == pytest.approx(body["prediction"], rel=1e-6, abs=1e-6), model
+        checked += 1
+    assert checked
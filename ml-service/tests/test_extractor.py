@@ -0,0 +1,59 @@
+import glob
+import json
+import os
+import shutil
+
+import pytest
+
+import extractor
+from pdf_store import PdfStore
+
+UPLOADS = sorted(glob.glob(os.path.join(extractor.BACKEND_DIR, "uploads", "*.pdf")))
+COLUMNS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Static", "model_columns.json")
+
+needs_pdf_parse = pytest.mark.skipif(
+    not shutil.which("node") or not os.path.isdir(os.path.join(extractor.BACKEND_DIR, "node_modules", "pdf-parse"))
+    or not UPLOADS,
+    reason="sin node / pdf-parse del backend o sin PDFs en uploads/")
+
+
+@needs_pdf_parse
+def test_pdf_path_matches_backend(capsys):
+    # el mismo control que `python extractor.py --parity`, sobre unos pocos PDFs
+    with open(COLUMNS_PATH, encoding="utf-8") as f:
+        columns = json.load(f)
+    files = [os.path.abspath(p) for p in UPLOADS[:3]]
+    assert extractor.parity(files, columns, extractor.BACKEND_DIR), capsys.readouterr().out
+
+
+@needs_pdf_parse
+def test_unreadable_pdf_gives_empty_text():
+    # como `pdf(...).catch(() => ({ text: '' }))` en el backend
+    assert extractor.pdf_text(b"%PDF-1.4 basura", "pdf-parse") == ""
+
+
+def test_serving_path_defaults_to_pypdf(monkeypatch):
+    monkeypatch.delenv("ML_PDF_TEXT", raising=False)
+    monkeypatch.setattr(extractor, "PDF_TEXT", "pypdf")
+    assert extractor.pdf_text_backend() == "pypdf"
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        extractor.pdf_text_backend("pdfminer")
+
+
+def test_store_is_emptied_when_extractor_changes(tmp_path):
+    path = str(tmp_path / "pdf_store.sqlite3")
+    store = PdfStore(path)
+    store.put_document("a" * 64, 10, 100, 2020, {"n": 1})
+    store.put_scores("a" * 64, "v1", 2020, 2026, {"x": 1.0}, "tesis", 3.0)
+    # una base sin registro se llenó con pypdf
+    assert PdfStore(path, "pypdf").get_document("a" * 64) is not None
+    store = PdfStore(path, "pdf-parse")
+    assert store.get_document("a" * 64) is None
+    assert store.get_scores("a" * 64, "v1", 2020, 2026) is None
+    assert store.stats()["extractor"] == "pdf-parse"
+    store.put_document("b" * 64, 10, 100, 2020, {"n": 1})
+    assert PdfStore(path, "pdf-parse").get_document("b" * 64) is not None
+
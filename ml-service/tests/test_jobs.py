@@ -0,0 +1,119 @@
+import subprocess
+import sys
+import threading
+import time
+
+from jobs import JobQueue, JobStore
+
+
+def _dead_pid():
+    # pid de un proceso que ya terminó
+    proc = subprocess.Popen([sys.executable, "-c", "pass"])
+    proc.wait()
+    return proc.pid
+
+
+def test_job_of_dead_process_fails_on_lookup(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    job_id = store.create("predict_batch", {})
+    store.update(job_id, status="running", pid=_dead_pid(), started_at=time.time())
+    job = store.get(job_id)
+    assert job["status"] == "failed"
+    assert "ya no existe" in job["error"]
+    assert job["finished_at"] is not None
+
+
+def test_jobs_of_dead_process_fail_at_startup(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    store = JobStore(path)
+    dead = _dead_pid()
+    lost = [store.create("predict_batch", {}) for _ in range(2)]
+    for job_id in lost:
+        store.update(job_id, pid=dead)
+    alive = store.create("predict_batch", {})
+    JobStore(path)
+    assert store.counts() == {"failed": 2, "queued": 1}
+    assert store.get(alive)["status"] == "queued"
+
+
+def test_running_job_times_out_and_late_result_is_dropped(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"), timeout=0.05)
+    release = threading.Event()
+    queue = JobQueue(store, workers=1)
+    queue.register("slow", lambda params: release.wait(5) and {"ok": True})
+    job_id = queue.submit("slow", {})
+    time.sleep(0.2)
+    job = store.get(job_id)
+    assert job["status"] == "failed"
+    assert "en ejecución" in job["error"]
+    release.set()
+    queue._pool().shutdown(wait=True)
+    assert store.get(job_id)["status"] == "failed"
+    assert store.get(job_id)["result"] is None
+
+
+def test_live_job_is_not_recovered(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    queue = JobQueue(store, workers=1)
+    queue.register("echo", lambda params: params)
+    job_id = queue.submit("echo", {"x": 1})
+    queue._pool().shutdown(wait=True)
+    job = store.get(job_id)
+    assert job["status"] == "done" and job["result"] == {"x": 1}
+
+
+def _wait(client, job_id, timeout=30):
+    t0 = time.time()
+    while time.time() - t0 < timeout:
+        job = client.get(f"/jobs/{job_id}").get_json()
+        if job["status"] in ("done", "failed"):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"el trabajo {job_id} no terminó")
+
+
+def test_explain_job_matches_sync_explain(api, client):
+    row = {c: 1 for c in api.artifacts.current.model_columns}
+    model = api.artifacts.current.models.default_name()
+    sync = client.post("/predict", json={"model": model, "explain": True, **row}).get_json()
+    r = client.post("/jobs", json={"type": "explain", "params": {"model": model, **row}})
+    assert r.status_code == 202
+    job = _wait(client, r.get_json()["id"])
+    assert job["status"] == "done", job["error"]
+    assert job["result"]["prediction"] == sync["prediction"]
+    assert job["result"]["explanation"] == sync["explanation"]
+
+
+def test_multi_job_and_invalid_params(api, client):
+    row = {c: 1 for c in api.artifacts.current.model_columns}
+    model = api.artifacts.current.models.default_name()
+    r = client.post("/jobs", json={"type": "predict_multi", "params": {"models": [model], "items": [row, row]}})
+    job = _wait(client, r.get_json()["id"])
+    assert job["status"] == "done", job["error"]
+    assert job["result"]["n_ok"] == 2 and job["result"]["models"] == [model]
+    r = client.post("/jobs", json={"type": "predict_multi", "params": {"models": ["no_existe"], **row}})
+    job = _wait(client, r.get_json()["id"])
+    assert job["status"] == "failed" and "no_existe" in job["error"]
+
+
+def test_store_closes_connections(tmp_path, monkeypatch):
+    import sqlite3
+
+    opened = []
+    real = sqlite3.connect
+
+    class Tracked(sqlite3.Connection):
+        def close(self):
+            opened.remove(self)
+            super().close()
+
+    def connect(*a, **kw):
+        db = real(*a, factory=Tracked, **kw)
+        opened.append(db)
+        return db
+
+    monkeypatch.setattr(sqlite3, "connect", connect)
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    store.get(store.create("predict_batch", {}))
+    store.counts()
+    assert opened == []
@@ -0,0 +1,64 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from metrics_index import TABLES, MetricsIndex
+
+
+def _old_metrics(df, model_name):
+    # filtro de /predict antes del índice: primera fila del modelo, convertida por jsonify
+    metrics = {}
+    if not df.empty:
+        r = df[df["model"] == model_name]
+        if not r.empty:
+            metrics = r.iloc[0].to_dict()
+    # jsonify escribía NaN (JSON inválido); el índice lo publica como null
+    return {k: None if isinstance(v, float) and np.isnan(v) else v for k, v in metrics.items()}
+
+
+@pytest.fixture
+def static_dir(tmp_path):
+    pd.DataFrame({
+        "model": ["Ridge", "RandomForest", "Ridge", "ExtraTrees"],
+        "rmse_test": [0.2011351448551136, 1.5, 9.9, float("nan")],
+        "r2_test": [0.9997668264808209, 0.98, 0.1, 0.5],
+        "n_trees": [0, 300, 0, 200],
+    }).to_csv(tmp_path / TABLES["base"], index=False)
+    pd.DataFrame({"model": ["RandomForest"], "rmse_test": [1.25]}).to_csv(tmp_path / TABLES["tuned"], index=False)
+    return tmp_path
+
+
+def test_fragments_match_old_filtering(static_dir):
+    index = MetricsIndex(str(static_dir))
+    # el índice lee los floats exactos del CSV; el parser por defecto de pandas puede
+    # diferir en el último bit (ver la comparación aproximada sobre Static/)
+    df = pd.read_csv(static_dir / TABLES["base"], float_precision="round_trip")
+    for name in ["Ridge", "RandomForest", "ExtraTrees", "no_existe"]:
+        assert json.loads(index.fragment(name)) == _old_metrics(df, name), name
+    tuned = pd.read_csv(static_dir / TABLES["tuned"], float_precision="round_trip")
+    assert json.loads(index.fragment("tuned_RandomForest")) == _old_metrics(tuned, "RandomForest")
+
+
+def test_static_fragments_match_old_filtering(api):
+    static_dir = api.artifacts.current.static_dir
+    index = MetricsIndex(static_dir)
+    for table, filename in TABLES.items():
+        try:
+            df = pd.read_csv(f"{static_dir}/{filename}")
+        except FileNotFoundError:
+            continue
+        for name in df["model"].astype(str).unique():
+            got = json.loads(index.fragment(name, table))
+            assert got == pytest.approx(_old_metrics(df, name), rel=1e-15), (table, name)
+
+
+@pytest.mark.parametrize("metrics", [["base"], {"t": "base"}, 1, "otra"], ids=repr)
+@pytest.mark.parametrize("path", ["/predict", "/predict/batch", "/predict/multi"])
+def test_invalid_metrics_table_is_400(api, client, path, metrics):
+    row = {api.artifacts.current.model_columns[0]: 1}
+    payload = {"metrics": metrics, **row} if path == "/predict" else {"metrics": metrics, "items": [row]}
+    r = client.post(path, json=payload)
+    assert r.status_code == 400
+    assert r.get_json()["available"]
@@ -0,0 +1,42 @@
+import joblib
+import numpy as np
+from sklearn.linear_model import Ridge
+
+from model_registry import ModelRegistry
+
+
+def _static(tmp_path, names):
+    X = np.arange(12, dtype=float).reshape(6, 2)
+    for i, name in enumerate(names):
+        joblib.dump(Ridge(alpha=1.0 + i).fit(X, X[:, 0]), tmp_path / f"modelo_{name}.pkl")
+    return str(tmp_path)
+
+
+def test_lru_keeps_at_most_max_models(tmp_path):
+    reg = ModelRegistry(_static(tmp_path, ["a", "b", "c", "d"]), max_models=2)
+    reg.get("a")
+    reg.get("b")
+    reg.get("a")  # "a" pasa a ser el más reciente
+    reg.get("c")
+    assert reg.resident_names() == ["a", "c"]
+    assert reg.evictions == 1
+    reg.get("d")
+    assert reg.resident_names() == ["c", "d"]
+    assert reg.loads == 4 and reg.evictions == 2
+    # un modelo residente no se vuelve a cargar
+    reg.get("d")
+    assert reg.loads == 4
+
+
+def test_unlimited_registry_keeps_everything(tmp_path):
+    reg = ModelRegistry(_static(tmp_path, ["a", "b", "c"]))
+    for name in reg.names():
+        reg.get(name)
+    assert sorted(reg.resident_names()) == ["a", "b", "c"] and reg.evictions == 0
+
+
+def test_byte_limit_never_evicts_the_model_just_loaded(tmp_path):
+    reg = ModelRegistry(_static(tmp_path, ["a", "b"]), max_bytes=1)
+    reg.get("a")
+    reg.get("b")
+    assert reg.resident_names() == ["b"]
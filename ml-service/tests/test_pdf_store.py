@@ -0,0 +1,31 @@
+import pytest
+
+from pdf_store import PdfStore
+
+
+def test_prune_requires_versions_to_keep(tmp_path):
+    store = PdfStore(str(tmp_path / "pdf_store.sqlite3"))
+    store.put_scores("a" * 64, "v1", 2020, 2026, {"x": 1.0})
+    store.put_scores("a" * 64, "v2", 2020, 2026, {"x": 1.0})
+    with pytest.raises(ValueError):
+        store.prune([])
+    assert store.prune(["v2"]) == 1
+    assert store.stats()["scores_by_version"] == {"v2": 1}
+
+
+def test_store_is_emptied_when_analysis_changes(tmp_path):
+    path = str(tmp_path / "pdf_store.sqlite3")
+    store = PdfStore(path, "pypdf", "a1")
+    store.put_document("a" * 64, 10, 100, 2020, {"n": 1})
+    store.put_scores("a" * 64, "v1", 2020, 2026, {"x": 1.0})
+    assert PdfStore(path, "pypdf", "a1").get_document("a" * 64) is not None
+    store = PdfStore(path, "pypdf", "a2")
+    assert store.get_document("a" * 64) is None
+    assert store.get_scores("a" * 64, "v1", 2020, 2026) is None
+    assert store.stats()["analysis"] == "a2"
+
+
+def test_store_without_analysis_stamp_is_emptied(tmp_path):
+    path = str(tmp_path / "pdf_store.sqlite3")
+    PdfStore(path, "pypdf").put_document("a" * 64, 10, 100, 2020, {"n": 1})
+    assert PdfStore(path, "pypdf", "a1").get_document("a" * 64) is None
@@ -0,0 +1,14 @@
+import logging
+
+
+def test_render_failure_is_logged_and_counted(api, client, monkeypatch, caplog):
+    def boom(static_dir, filename):
+        raise RuntimeError("matplotlib")
+
+    monkeypatch.setattr(api, "render_plot", boom)
+    before = dict(api.PLOT_ERRORS._values).get((), 0)
+    with caplog.at_level(logging.ERROR, logger=api.app.logger.name):
+        r = client.get("/plots/no_existe.png")
+    assert r.status_code == 404
+    assert api.PLOT_ERRORS._values[()] == before + 1
+    assert "no_existe.png" in caplog.text and "matplotlib" in caplog.text
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+
+def _rows(api, n=25, seed=7):
+    # filas distintas con valores discretos y continuos, como los indicadores reales
+    rng = np.random.default_rng(seed)
+    cols = api.artifacts.current.model_columns
+    return [{c: (float(rng.integers(0, 6)) if i % 2 else round(float(rng.normal(3, 2)), 3))
+             for i, c in enumerate(cols)} for _ in range(n)]
+
+
+@pytest.fixture
+def no_cache(api, monkeypatch):
+    # sin caché: las dos rutas deben calcular la predicción, no leer la de la otra
+    monkeypatch.setattr(api.prediction_cache, "maxsize", 0)
+
+
+def _models(api):
+    models = api.artifacts.current.models
+    return [n for n in models.names() if not n.startswith("compact_")][:4]
+
+
+@pytest.mark.usefixtures("no_cache")
+def test_batch_matches_per_row_predict(api, client):
+    rows = _rows(api)
+    for model in _models(api):
+        r = client.post("/predict/batch", json={"model": model, "items": rows})
+        if r.status_code == 500:
+            continue  # modelo que no se puede cargar en este entorno
+        batch = r.get_json()
+        assert batch["n_ok"] == len(rows) and batch["errors"] == []
+        single = [client.post("/predict", json={"model": model, **row}).get_json()["prediction"] for row in rows]
+        # árboles: bit a bit; Ridge: el producto matriz-vector puede redondear distinto por fila
+        assert batch["predictions"] == pytest.approx(single, rel=1e-12, abs=1e-12), model
+
+
+@pytest.mark.usefixtures("no_cache")
+def test_batch_with_bad_rows_matches_per_row_predict(api, client):
+    rows = _rows(api, n=6, seed=11)
+    col = api.artifacts.current.model_columns[0]
+    items = [rows[0], {"no_existe": 1}, rows[1], "x", {col: "inf"}, rows[2]]
+    batch = client.post("/predict/batch", json=items).get_json()
+    assert [e["index"] for e in batch["errors"]] == [1, 3, 4]
+    for i, item in enumerate(items):
+        r = client.post("/predict", json=item) if isinstance(item, dict) else None
+        if i in (1, 3, 4):
+            assert batch["predictions"][i] is None
+            assert r is None or r.status_code == 400
+        else:
+            assert batch["predictions"][i] == pytest.approx(r.get_json()["prediction"], rel=1e-12)
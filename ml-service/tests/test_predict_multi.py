@@ -0,0 +1,58 @@
+import pytest
+
+
+def _payload(api):
+    # una tesis con todos los indicadores en 1
+    return {c: 1 for c in api.artifacts.current.model_columns}
+
+
+def _loadable(api, names):
+    # modelos que se pueden cargar en este entorno (un pickle de otra versión de sklearn falla)
+    from model_registry import ModelLoadError
+
+    ok = []
+    for n in names:
+        try:
+            api.artifacts.current.models.get(n)
+            ok.append(n)
+        except ModelLoadError:
+            pass
+    return ok
+
+
+def test_default_set_keeps_predict_model_resident(api, client):
+    models = api.artifacts.current.models
+    if not models.max_models:
+        pytest.skip("registro sin límite (ML_MAX_MODELS=0)")
+    hot = _loadable(api, [models.default_name()] + models.names())[:1]
+    if not hot:
+        pytest.skip("ningún modelo se puede cargar")
+    # valores que ninguna otra prueba usa: la predicción no sale de la caché y el modelo se usa
+    r = client.post("/predict", json={"model": hot[0], **{c: 7.25 for c in api.artifacts.current.model_columns}})
+    assert r.status_code == 200
+    evictions = models.evictions
+
+    r = client.post("/predict/multi", json=_payload(api))
+    assert r.status_code == 200
+    body = r.get_json()
+    assert hot[0] in body["models"]
+    assert len(body["models"]) + len(body["model_errors"]) <= models.max_models
+    assert hot[0] in models.resident_names()
+    assert models.evictions == evictions
+
+
+def test_multi_matches_single_predictions(api, client):
+    names = _loadable(api, api.artifacts.current.models.names())[:2]
+    if not names:
+        pytest.skip("ningún modelo se puede cargar")
+    body = client.post("/predict/multi", json={"models": names, **_payload(api)}).get_json()
+    for n in names:
+        single = client.post("/predict", json={"model": n, **_payload(api)}).get_json()
+        assert body["predictions"][n] == pytest.approx(single["prediction"])
+    assert body["consensus"]["spread"] == pytest.approx(
+        max(body["predictions"].values()) - min(body["predictions"].values()))
+
+
+def test_unknown_model_is_rejected(client):
+    r = client.post("/predict/multi", json={"models": ["no-existe"]})
+    assert r.status_code == 400
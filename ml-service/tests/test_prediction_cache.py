@@ -0,0 +1,59 @@
+import os
+import shutil
+
+import pytest
+
+from artifact_manager import ArtifactManager, write_manifest
+from prediction_cache import PredictionCache
+
+STATIC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Static")
+BASE_FILES = ["scaler_tesis.pkl", "model_columns.pkl", "model_comparison.csv"]
+
+
+def test_version_change_clears_cache():
+    cache = PredictionCache()
+    cache.check_version("v1")
+    key = cache.key("tesis", "v1", [1.0, 2.0])
+    cache.put(key, [3.0])
+    cache.check_version("v1")
+    assert cache.get(key) == [3.0]
+    cache.check_version("v2")
+    assert cache.get(key) is None and cache.invalidations == 1
+
+
+@pytest.fixture
+def static_copy(tmp_path):
+    if not all(os.path.exists(os.path.join(STATIC, f)) for f in BASE_FILES + ["modelo_Ridge.pkl"]):
+        pytest.skip("sin artefactos en Static/ (ejecutar train_model.py)")
+    d = tmp_path / "Static"
+    d.mkdir()
+    for f in BASE_FILES:
+        shutil.copy2(os.path.join(STATIC, f), d / f)
+    shutil.copy2(os.path.join(STATIC, "modelo_Ridge.pkl"), d / "modelo_tesis.pkl")
+    return d
+
+
+@pytest.mark.parametrize("manifest", [True, False], ids=["manifiesto", "huella"])
+def test_swapped_model_is_not_served_from_cache(api, client, monkeypatch, static_copy, manifest):
+    # /predict tras reemplazar modelo_tesis.pkl: la respuesta es la del modelo nuevo, no la cacheada
+    if manifest:
+        write_manifest(str(static_copy))
+    cache = PredictionCache()
+    manager = ArtifactManager(str(static_copy), interval=0, on_swap=lambda arts: cache.check_version(arts.version))
+    manager.load()
+    monkeypatch.setattr(api, "artifacts", manager)
+    monkeypatch.setattr(api, "prediction_cache", cache)
+    row = {c: 2 for c in manager.current.model_columns}
+    old = client.post("/predict", json={"model": "tesis", **row}).get_json()["prediction"]
+    assert client.post("/predict", json={"model": "tesis", **row}).get_json()["prediction"] == old
+    assert cache.hits == 1
+
+    new_src = next(os.path.join(STATIC, f"modelo_{n}.pkl") for n in ("ExtraTrees", "RandomForest", "tuned_ExtraTrees")
+                   if os.path.exists(os.path.join(STATIC, f"modelo_{n}.pkl")))
+    shutil.copy2(new_src, static_copy / "modelo_tesis.pkl")
+    # sin manifiesto, la huella se confirma en dos comprobaciones
+    manager.check()
+    manager.check()
+    assert manager.reloads == 1 and cache.invalidations == 1
+    new = client.post("/predict", json={"model": "tesis", **row}).get_json()["prediction"]
+    assert new != old
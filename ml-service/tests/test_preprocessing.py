@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from preprocessing import Preprocessor
+
+COLUMNS = ["Citas", "% Autocitas"]
+
+VALUES = [
+    None, 0, 12, -3.5, "12", "12,5", " 7 ", "+4", "-.5", "5.", "1e3", "1E-2", "12%", "3,5%",
+    "1234567890.12345", "12345678901234567890", "0.1000000000000000055511151231257827",
+    "abc", "", "0x10", "1_000", "١٢", "٣.٥", "１２", "²", "nan", "NaN", "inf", "-inf", "Infinity", "1e400",
+]
+
+
+def _baseline_clean_value(col_name, value):
+    # clean_value de api_ml.py antes del preprocesamiento precompilado
+    if value is None:
+        return 0
+    v = str(value).replace(",", ".")
+    if "%" in col_name:
+        v = v.replace("%", "")
+        return pd.to_numeric(v, errors="coerce") / 100.0
+    return pd.to_numeric(v, errors="coerce")
+
+
+def _baseline_row(data):
+    row = {col: _baseline_clean_value(col, data.get(col, 0)) for col in COLUMNS}
+    return pd.DataFrame([row])[COLUMNS].fillna(0).to_numpy(dtype=np.float64)[0]
+
+
+@pytest.mark.parametrize("value", VALUES, ids=repr)
+def test_clean_matches_baseline(value):
+    prep = Preprocessor(COLUMNS)
+    data = {c: value for c in COLUMNS}
+    expected = _baseline_row(data)
+    got = prep.clean_one(data)[0]
+    # bit a bit (NaN ya es 0 en ambos)
+    assert got.tobytes() == expected.tobytes()
+    # ±inf: el camino anterior fallaba en scaler.transform; aquí se marca para rechazarlo
+    assert prep.non_finite_columns(got) == [c for c, x in zip(COLUMNS, expected) if not np.isfinite(x)]
+
+
+def test_clean_many_matches_clean_one():
+    prep = Preprocessor(COLUMNS)
+    rows = [{c: v for c in COLUMNS} for v in VALUES]
+    X = prep.clean_many(rows)
+    for i, data in enumerate(rows):
+        assert X[i].tobytes() == prep.clean_one(data)[0].tobytes()
+
+
+def test_predict_rejects_non_finite(api, client):
+    col = api.artifacts.current.model_columns[0]
+    r = client.post("/predict", json={col: "inf"})
+    assert r.status_code == 400
+    assert r.get_json()["columns"] == [col]
+
+
+def test_batch_rejects_non_finite_rows_only(api, client):
+    col = api.artifacts.current.model_columns[0]
+    r = client.post("/predict/batch", json=[{col: "1e400"}, {col: "١٢"}])
+    assert r.status_code == 200
+    body = r.get_json()
+    assert body["n_ok"] == 1
+    assert [e["index"] for e in body["errors"]] == [0]
+    assert body["predictions"][0] is None and body["predictions"][1] is not None
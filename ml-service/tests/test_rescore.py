@@ -0,0 +1,67 @@
+import csv
+import json
+import sqlite3
+
+import pytest
+
+import rescore
+
+
+class _LockedStore:
+    def get_document(self, sha256):
+        raise sqlite3.OperationalError("database is locked")
+
+
+def _pdf(tmp_path, name="a.pdf"):
+    path = tmp_path / name
+    path.write_bytes(b"%PDF-1.4\n")
+    return str(path)
+
+
+def test_store_error_is_recorded_per_document(tmp_path):
+    rescore._init_worker(None, ["x"], 2026)
+    rescore._worker["store"] = _LockedStore()
+    rec = rescore.extract_file(_pdf(tmp_path))
+    assert set(rec) == {"path", "error"}
+    assert "database is locked" in rec["error"]
+
+
+def test_unexpected_parser_error_is_recorded_per_document(tmp_path, monkeypatch):
+    def boom(data):
+        raise KeyError("/Root")
+
+    monkeypatch.setattr(rescore, "pdf_text", boom)
+    rescore._init_worker(None, ["x"], 2026)
+    rec = rescore.extract_file(_pdf(tmp_path))
+    assert rec["error"] == "KeyError: '/Root'"
+
+
+@pytest.mark.parametrize("ext", ["jsonl", "csv"])
+def test_failed_documents_are_retried_on_resume(tmp_path, monkeypatch, ext):
+    def boom(data):
+        raise RuntimeError("pypdf")
+
+    rescore._init_worker(None, ["x"], 2026)
+    ok = [{"path": _pdf(tmp_path, f"ok{i}.pdf"), "sha256": str(i), "anio": 2020, "n_chars": 10, "cached": False,
+           "indicadores": {"x": i}} for i in range(2)]
+    monkeypatch.setattr(rescore, "pdf_text", boom)
+    failed = [rescore.extract_file(_pdf(tmp_path, f"{i}.pdf")) for i in range(3)]
+    out = str(tmp_path / f"out.{ext}")
+    fields = rescore.BASE_FIELDS + ["x"]
+    output = rescore.Output(out, fields, {"version": "v"})
+    output.write([ok[0], *failed, ok[1]])
+    output.close()
+
+    resumed = rescore.Output(out, fields, {"version": "v"})
+    # los PDFs con error no cuentan como hechos y su fila sale de la salida
+    assert resumed.done == {r["path"] for r in ok}
+    resumed.write(failed[:1])
+    resumed.close()
+    again = rescore.Output(out, fields, {"version": "v"})
+    again.close()
+    assert again.done == {r["path"] for r in ok}
+    with open(out, encoding="utf-8") as f:
+        rows = list(csv.DictReader(f)) if ext == "csv" else [json.loads(line) for line in f]
+    assert [r["path"] for r in rows] == [r["path"] for r in ok]
+    if ext == "csv":
+        assert [r["x"] for r in rows] == ["0", "1"]
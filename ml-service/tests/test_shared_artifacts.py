@@ -0,0 +1,46 @@
+import json
+import os
+
+import numpy as np
+
+import shared_artifacts
+
+
+def _export(d, value):
+    shared_artifacts.write_packed(str(d), {"kind": "linear"},
+                                  {"coef": np.full(4, value), "intercept": np.array([value])})
+
+
+def test_reader_sees_one_complete_export(tmp_path):
+    d = tmp_path / "shared" / "m"
+    _export(d, 1.0)
+    meta, arrays = shared_artifacts._read_packed(str(tmp_path), "m", None)
+    old = arrays["coef"]
+    _export(d, 2.0)
+    meta2, arrays2 = shared_artifacts._read_packed(str(tmp_path), "m", None)
+    assert meta2["token"] != meta["token"]
+    assert all((a == 2.0).all() for a in arrays2.values())
+    # el worker que ya mapeaba el export anterior sigue viendo sus datos
+    assert (old == 1.0).all()
+    # solo quedan los arrays del export vigente
+    assert sorted(os.listdir(d)) == sorted(["meta.json"] + [f"{k}-{meta2['token']}.npy" for k in meta2["arrays"]])
+
+
+def test_meta_read_before_a_new_export_is_reread(tmp_path, monkeypatch):
+    d = tmp_path / "shared" / "m"
+    _export(d, 1.0)
+    real_load = np.load
+    calls = []
+
+    def load(path, **kw):
+        # el primer intento llega justo después de que otro export borró los arrays viejos
+        if not calls:
+            calls.append(path)
+            _export(d, 2.0)
+        return real_load(path, **kw)
+
+    monkeypatch.setattr(shared_artifacts.np, "load", load)
+    meta, arrays = shared_artifacts._read_packed(str(tmp_path), "m", None)
+    with open(d / "meta.json", encoding="utf-8") as f:
+        assert meta["token"] == json.load(f)["token"]
+    assert all((a == 2.0).all() for a in arrays.values())
@@ -0,0 +1,56 @@
+import importlib
+import sys
+import textwrap
+
+from stages import Pipeline
+
+STAGE_MODULE = textwrap.dedent('''
+    import helper_mod
+    from helper_mod import double
+    from stages import Pipeline
+
+    pipeline = Pipeline(STATIC_DIR)
+
+
+    def local_helper(x):
+        return helper_mod.inc(x)
+
+
+    @pipeline.stage("a")
+    def a():
+        return double(local_helper(1))
+''')
+
+
+def _load(tmp_path, helper_src):
+    (tmp_path / "helper_mod.py").write_text(helper_src)
+    (tmp_path / "stage_mod.py").write_text(f"STATIC_DIR = {str(tmp_path / 'Static')!r}\n" + STAGE_MODULE)
+    sys.path.insert(0, str(tmp_path))
+    try:
+        for name in ("helper_mod", "stage_mod"):
+            sys.modules.pop(name, None)
+        return importlib.import_module("stage_mod")
+    finally:
+        sys.path.remove(str(tmp_path))
+
+
+def test_key_depends_on_imported_project_modules(tmp_path):
+    mod = _load(tmp_path, "def double(x):\n    return 2 * x\n\n\ndef inc(x):\n    return x + 1\n")
+    helpers, files = mod.pipeline.stages["a"].dependencies()
+    assert [h.__name__ for h in helpers] == ["local_helper"]
+    assert [f.rsplit("/", 1)[-1] for f in files] == ["helper_mod.py"]
+    before = mod.pipeline.key("a", {})
+    # el módulo importado cambia sin tocar el código de la etapa
+    (tmp_path / "helper_mod.py").write_text("def double(x):\n    return 3 * x\n\n\ndef inc(x):\n    return x + 1\n")
+    assert mod.pipeline.key("a", {}) != before
+
+
+def test_key_ignores_third_party_modules():
+    p = Pipeline("/nonexistent")
+
+    @p.stage("s")
+    def s():
+        return importlib.import_module("json")
+
+    _, files = p.stages["s"].dependencies()
+    assert files == []
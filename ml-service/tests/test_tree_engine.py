@@ -0,0 +1,75 @@
+import glob
+import os
+
+import joblib
+import numpy as np
+import pytest
+from sklearn.ensemble import ExtraTreesRegressor, GradientBoostingRegressor, RandomForestRegressor
+from sklearn.linear_model import Ridge
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+from tree_engine import compile_model
+
+STATIC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Static")
+# el mismo margen que reporta `python tree_engine.py` (max|dif| ~1e-14)
+TOL = 1e-9
+
+
+def _data(n=200, f=6, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n, f))
+    # discretos, como los indicadores 0/2/3/4/5: muchas filas caen justo en los umbrales
+    X[:, :2] = rng.integers(0, 6, size=(n, 2))
+    y = 3 * X[:, 0] - X[:, 1] * X[:, 2] + rng.normal(scale=0.1, size=n)
+    return X, y
+
+
+SYNTHETIC = {
+    "RandomForest": lambda: RandomForestRegressor(n_estimators=20, random_state=0),
+    "ExtraTrees": lambda: ExtraTreesRegressor(n_estimators=20, random_state=0),
+    "GradientBoosting": lambda: GradientBoostingRegressor(n_estimators=30, random_state=0),
+    "Ridge": lambda: Pipeline([("scaler", StandardScaler()), ("ridge", Ridge(alpha=1.0))]),
+}
+
+
+@pytest.mark.parametrize("kind", sorted(SYNTHETIC))
+def test_compiled_matches_sklearn(kind):
+    X, y = _data()
+    model = SYNTHETIC[kind]().fit(X, y)
+    cm = compile_model(model, kind)
+    assert cm is not None
+    X_new, _ = _data(n=500, seed=1)
+    for Xt in (X, X_new, X_new[:1]):
+        np.testing.assert_allclose(cm.predict(Xt), model.predict(Xt), rtol=0, atol=TOL)
+
+
+def test_compiled_float32_stays_on_the_same_leaves():
+    # modelos compact_*: umbrales float32 redondeados hacia abajo; solo cambia el redondeo de las hojas
+    X, y = _data()
+    model = RandomForestRegressor(n_estimators=10, random_state=0).fit(X, y)
+    cm64 = compile_model(model, "RandomForest")
+    cm32 = compile_model(model, "compact_RandomForest")
+    X_new, _ = _data(n=500, seed=2)
+    np.testing.assert_array_equal(
+        cm32.leaves(X_new), cm64.leaves(X_new))
+    np.testing.assert_allclose(cm32.predict(X_new), model.predict(X_new), rtol=1e-5, atol=1e-6)
+
+
+def _static_models():
+    return sorted(glob.glob(os.path.join(STATIC, "modelo_*.pkl")))
+
+
+@pytest.mark.parametrize("path", _static_models(), ids=os.path.basename)
+def test_static_models_match_sklearn(path):
+    name = os.path.basename(path)[len("modelo_"):-len(".pkl")]
+    try:
+        model = joblib.load(path)
+    except Exception as e:
+        pytest.skip(f"no se pudo cargar {name}: {e}")
+    cm = compile_model(model, name)
+    if cm is None:
+        pytest.skip(f"{name} sin motor compilado")
+    X = np.random.default_rng(42).normal(size=(300, cm.n_features_in_))
+    tol = dict(rtol=1e-5, atol=1e-6) if cm.meta.get("dtype") == "float32" else dict(rtol=0, atol=TOL)
+    np.testing.assert_allclose(cm.predict(X), model.predict(X), **tol)
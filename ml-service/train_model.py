@@ -3,10 +3,8 @@ import pandas as pd
 import numpy as np
 import json
 import joblib
-import matplotlib.pyplot as plt
-import seaborn as sns
+import argparse
 
-from sklearn.ensemble import RandomForestRegressor
 from sklearn.preprocessing import StandardScaler
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_squared_error, r2_score
@@ -14,9 +12,19 @@ from sklearn.linear_model import Ridge
 from sklearn.ensemble import GradientBoostingRegressor, ExtraTreesRegressor, RandomForestRegressor
 from sklearn.pipeline import Pipeline
 import importlib
-from sklearn.model_selection import RandomizedSearchCV
-from scipy.stats import randint, uniform
-import time
+from sklearn.model_selection import cross_val_score
+
+from compact import (METHODS as COMPACT_METHODS, compact_model, compact_name, cv_curve, oob_curve, oob_mask,
+                     select_greedy, select_prefix, staged, subset_model)
+from diagnostics import feature_stats, generar_resumen_diagnostico, score_groups, screen_features
+from plots import record_plot
+from profiling import Profiler
+from staged_curves import staged_rmse
+from parallel_fit import fit_concurrent, fit_family, stream_row
+from ingest import SCHEMA, columns as ingest_columns, read_metrics
+from stages import Pipeline as StagePipeline
+from tree_engine import compile_model
+from tuning import SEARCH_MODES, run_search
 
 # =========================
 # RUTAS
@@ -25,51 +33,24 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 STATIC_DIR = os.path.join(BASE_DIR, "Static")
 os.makedirs(STATIC_DIR, exist_ok=True)
 
-# =========================
-# 1. CARGA DEL CSV
-# =========================
 FILE_PATH = os.path.join(BASE_DIR, "Metricas - Hoja 1.csv")
-print("Leyendo:", FILE_PATH)
-df = pd.read_csv(FILE_PATH, header=None)
-
-forced_cols = [
-    "N°",
-    "Universidad",
-    "Tesis",
-    "Índice de antigüedad",
-    "Índice de impacto de revistas",
-    "% de citas textuales",
-    "% de conectores lógicos",
-    "% de parafraseo",
-    "% de fuentes utilizadas",
-    "Tipo de investigación",
-    "Enfoque",
-    "Nivel (alcance)",
-    "Diseño de investigación",
-    "Desarrollo de software",
-    "Tecnologías emergentes",
-    "Validación de modelos",
-    "Marcos de referencias",
-    "Validación del producto",
-    "Encuestas",
-    "Observación / Registro de datos",
-    "Entrevistas",
-    "Aplicación de pruebas estadísticas",
-    "Métricas de rendimiento",
-    "Relevantes y aportan a la ciencia y tecnología",
-    "TOTAL",
-]
-
-df = df.iloc[:, :len(forced_cols)]
-df.columns = forced_cols
 
-print("Columnas forzadas:")
-for c in df.columns:
-    print(" -", c)
+# Etapas: ingest -> clean -> split -> fit-baseline -> compare -> tune -> compact -> diagnose -> export
+# Cada salida se guarda en Static/stages/ con una clave que depende del código de la
+# etapa, sus parámetros, sus archivos de entrada y las salidas de las etapas previas;
+# solo se re-ejecuta lo que cambió (ver stages.py). Uso:
+#   python train_model.py                  # etapas desactualizadas
+#   python train_model.py diagnose export  # solo esas (y las previas que falten)
+#   python train_model.py tune --force     # re-ejecutar aunque esté al día
+#   python train_model.py --list           # estado de cada etapa
+#   python train_model.py tune --search halving --cores 4   # successive halving con 4 núcleos
+pipeline = StagePipeline(STATIC_DIR)
+# tiempos, CPU y pico de memoria por etapa y sección -> Static/train_profile.json (ver profiling.py)
+profiler = Profiler()
+PROFILE_PATH = os.path.join(STATIC_DIR, "train_profile.json")
+
+forced_cols = ingest_columns(SCHEMA)
 
-# =========================
-# 2. FEATURES / TARGET
-# =========================
 FEATURES = [
     "Validación del producto",
     "Observación / Registro de datos",
@@ -95,351 +76,6 @@ FEATURES = [
 ]
 TARGET = "TOTAL"
 
-# Después de cargar el DataFrame y antes de las estadísticas, agregar:
-def clean_total_column(df):
-    # Extraer solo los números de la columna TOTAL
-    df['TOTAL'] = df['TOTAL'].astype(str).str.extract(r'(\d+\.?\d*)').astype(float)
-    return df
-
-# Limpiar los datos
-df = clean_total_column(df)
-
-# Ahora sí calcular las estadísticas
-print("\nEstadísticas de TOTAL:")
-print(f"Mínimo: {df[TARGET].min():.2f}")
-print(f"Máximo: {df[TARGET].max():.2f}")
-print(f"Media: {df[TARGET].mean():.2f}")
-print(f"Desviación estándar: {df[TARGET].std():.2f}")
-
-def clean_column(s: pd.Series) -> pd.Series:
-    s = s.astype(str).str.replace(",", ".", regex=False)
-    if s.str.contains("%").any():
-        s = s.str.replace("%", "", regex=False)
-        s = pd.to_numeric(s, errors="coerce") / 100.0
-    else:
-        s = pd.to_numeric(s, errors="coerce")
-    return s.fillna(0)
-
-for col in FEATURES + [TARGET]:
-    df[col] = clean_column(df[col])
-
-X = df[FEATURES]
-y = df[TARGET]
-
-# =========================
-# 3. ESCALADO + SPLIT
-# =========================
-scaler = StandardScaler()
-X_scaled = scaler.fit_transform(X)
-
-X_train, X_test, y_train, y_test = train_test_split(
-    X_scaled, y, test_size=0.2, random_state=42
-)
-
-# =========================
-# 4. MODELO
-# =========================
-model = RandomForestRegressor(
-    n_estimators=500,           # Aumentar árboles
-    max_depth=15,              # Ajustar profundidad
-    min_samples_split=4,       
-    min_samples_leaf=2,
-    random_state=42,
-    n_jobs=-1
-)
-model.fit(X_train, y_train)
-
-# =========================
-# 5. MÉTRICAS
-# =========================
-y_pred_test = model.predict(X_test)
-rmse_test = mean_squared_error(y_test, y_pred_test) ** 0.5
-r2_test = r2_score(y_test, y_pred_test)
-
-y_pred_train = model.predict(X_train)
-rmse_train = mean_squared_error(y_train, y_pred_train) ** 0.5
-r2_train = r2_score(y_train, y_pred_train)
-
-# Calcular métricas
-mse_train = mean_squared_error(y_train, y_pred_train)
-mse_test = mean_squared_error(y_test, y_pred_test)
-rmse_train = np.sqrt(mse_train)
-rmse_test = np.sqrt(mse_test)
-r2_train = r2_score(y_train, y_pred_train)
-r2_test = r2_score(y_test, y_pred_test)
-
-# Imprimir resultados
-print(f"MSE train: {mse_train:.4f}")
-print(f"MSE test: {mse_test:.4f}")
-print(f"RMSE train: {rmse_train:.4f}")
-print(f"RMSE test: {rmse_test:.4f}")
-print(f"R² train: {r2_train:.4f}")
-print(f"R² test: {r2_test:.4f}")
-
-# =========================
-# 5 bis. CURVA TRAIN / VALIDATION
-# =========================
-train_curve = []
-val_curve = []
-steps = []
-
-for i in range(1, len(model.estimators_) + 1):
-    sub_estimators = model.estimators_[:i]
-
-    # promedio de las predicciones de los i árboles
-    y_pred_train_i = sum(est.predict(X_train) for est in sub_estimators) / i
-    y_pred_test_i = sum(est.predict(X_test) for est in sub_estimators) / i
-
-    rmse_tr_i = mean_squared_error(y_train, y_pred_train_i) ** 0.5
-    rmse_te_i = mean_squared_error(y_test, y_pred_test_i) ** 0.5
-
-    train_curve.append(rmse_tr_i)
-    val_curve.append(rmse_te_i)
-    steps.append(i)
-
-plt.figure(figsize=(6, 5))
-plt.plot(steps, train_curve, label="train", color="steelblue")
-plt.plot(steps, val_curve, label="validation", color="coral")
-plt.axvline(x=max(steps) * 0.5, linestyle="--", color="red", alpha=0.4)
-plt.xlabel("nº de árboles (iteraciones)")
-plt.ylabel("RMSE")
-plt.title("Curvas de entrenamiento (RandomForest)")
-plt.legend()
-plt.tight_layout()
-plt.savefig(os.path.join(STATIC_DIR, "train_validation_curve.png"), dpi=300)
-plt.close()
-
-# =========================
-# 6. GRÁFICOS
-# =========================
-# 6.1 Importancia
-fi = model.feature_importances_
-fi_df = pd.DataFrame({"Característica": FEATURES, "Importancia": fi}).sort_values(
-    "Importancia", ascending=False
-)
-plt.figure(figsize=(10, 8))
-sns.barplot(x="Importancia", y="Característica", data=fi_df)
-plt.title("Importancia de características (RandomForest)")
-plt.tight_layout()
-plt.savefig(os.path.join(STATIC_DIR, "feature_importance.png"), dpi=300)
-plt.close()
-
-# 6.2 Real vs Predicho (test)
-plt.figure(figsize=(6, 6))
-plt.scatter(y_test, y_pred_test, alpha=0.6, label='Test')
-mn, mx = min(y_test.min(), y_pred_test.min()), max(y_test.max(), y_pred_test.max())
-plt.plot([mn, mx], [mn, mx], "r--", label="Ideal")
-plt.xlabel("Real (TOTAL)")
-plt.ylabel("Predicho (TOTAL)")
-plt.title(f"Predicción vs Real (test)\nRMSE={rmse_test:.2f} | R2={r2_test:.2f}")
-plt.legend()
-plt.tight_layout()
-plt.savefig(os.path.join(STATIC_DIR, "prediction_test.png"), dpi=300)
-plt.close()
-
-# 6.3 Train vs Test juntos
-plt.figure(figsize=(6, 6))
-plt.scatter(y_train, y_pred_train, alpha=0.4, label='Train')
-plt.scatter(y_test, y_pred_test, alpha=0.6, label='Test')
-mn2 = min(y.min(), y_pred_train.min(), y_pred_test.min())
-mx2 = max(y.max(), y_pred_train.max(), y_pred_test.max())
-plt.plot([mn2, mx2], [mn2, mx2], "k--", label="Ideal")
-plt.xlabel("Real (TOTAL)")
-plt.ylabel("Predicho (TOTAL)")
-plt.title("Train vs Test (misma escala)")
-plt.legend()
-plt.tight_layout()
-plt.savefig(os.path.join(STATIC_DIR, "train_vs_test.png"), dpi=300)
-plt.close()
-
-# =========================
-# 7. ERRORES
-# =========================
-errors_df = pd.DataFrame({
-    "y_test": y_test.values,
-    "y_pred_test": y_pred_test,
-    "abs_error": np.abs(y_test.values - y_pred_test)
-})
-errors_df.to_csv(os.path.join(STATIC_DIR, "errors_test.csv"), index=False, encoding="utf-8")
-
-# =========================
-# 7.5 Gráficos de métricas de evaluación 
-plt.figure(figsize=(15, 5))
-
-# MSE
-plt.subplot(131)
-mse_train = mean_squared_error(y_train, y_pred_train)
-mse_test = mean_squared_error(y_test, y_pred_test)
-plt.bar(['Entrenamiento', 'Prueba'], [mse_train, mse_test], color=['steelblue', 'coral'])
-plt.title('Error Cuadrático Medio\n(MSE)')
-plt.ylabel('MSE')
-plt.grid(True, alpha=0.3)
-
-# RMSE
-plt.subplot(132)
-plt.bar(['Entrenamiento', 'Prueba'], [rmse_train, rmse_test], color=['steelblue', 'coral'])
-plt.title('Raíz del Error Cuadrático Medio\n(RMSE)') 
-plt.ylabel('RMSE')
-plt.grid(True, alpha=0.3)
-
-# R²
-plt.subplot(133)
-plt.bar(['Entrenamiento', 'Prueba'], [r2_train, r2_test], color=['steelblue', 'coral'])
-plt.title('Coeficiente de Determinación\n(R²)')
-plt.ylabel('R²')
-plt.grid(True, alpha=0.3)
-
-plt.tight_layout()
-plt.savefig(os.path.join(STATIC_DIR, "metricas_evaluacion.png"), dpi=300)
-plt.close()
-
-# =========================
-# 8. ARTEFACTOS
-# =========================
-joblib.dump(model, os.path.join(STATIC_DIR, "modelo_tesis.pkl"))
-joblib.dump(scaler, os.path.join(STATIC_DIR, "scaler_tesis.pkl"))
-joblib.dump(FEATURES, os.path.join(STATIC_DIR, "model_columns.pkl"))
-
-with open(os.path.join(STATIC_DIR, "model_columns.json"), "w", encoding="utf-8") as f:
-    json.dump(FEATURES, f, ensure_ascii=False, indent=2)
-
-metrics_payload = {
-    "rmse_train": rmse_train,
-    "r2_train": r2_train,
-    "rmse_test": rmse_test,
-    "r2_test": r2_test,
-    "n_total": int(len(df)),
-    "n_train": int(len(y_train)),
-    "n_test": int(len(y_test))
-}
-with open(os.path.join(STATIC_DIR, "metrics.json"), "w", encoding="utf-8") as f:
-    json.dump(metrics_payload, f, ensure_ascii=False, indent=2)
-
-print("Entrenamiento COMPLETO.")
-print("Gráficos guardados en:", STATIC_DIR)
-
-# modelos a comparar
-models = {
-    "RandomForest": RandomForestRegressor(n_estimators=200, random_state=42, n_jobs=-1),
-    "Ridge": Pipeline([("scaler", StandardScaler()), ("ridge", Ridge(alpha=1.0))]),
-    "GradientBoosting": GradientBoostingRegressor(n_estimators=200, learning_rate=0.05, max_depth=3, random_state=42),
-    "ExtraTrees": ExtraTreesRegressor(n_estimators=200, max_features="sqrt", random_state=42, n_jobs=-1),
-}
-try:
-    xgb_mod = importlib.import_module("xgboost")
-    XGBRegressor = getattr(xgb_mod, "XGBRegressor")
-    models["XGBoost"] = XGBRegressor(n_estimators=200, learning_rate=0.05, max_depth=4, random_state=42, verbosity=0)
-except Exception:
-    pass
-
-results = []
-for name, mdl in models.items():
-    try:
-        mdl.fit(X_train, y_train)
-        y_pred_tr = mdl.predict(X_train)
-        y_pred_ts = mdl.predict(X_test)
-
-        mse_tr = mean_squared_error(y_train, y_pred_tr)
-        mse_ts = mean_squared_error(y_test, y_pred_ts)
-        rmse_tr = np.sqrt(mse_tr)
-        rmse_ts = np.sqrt(mse_ts)
-        r2_tr = r2_score(y_train, y_pred_tr)
-        r2_ts = r2_score(y_test, y_pred_ts)
-
-        results.append({
-            "model": name,
-            "mse_train": mse_tr, "mse_test": mse_ts,
-            "rmse_train": rmse_tr, "rmse_test": rmse_ts,
-            "r2_train": r2_tr, "r2_test": r2_ts
-        })
-
-        # Guardar modelo
-        joblib.dump(mdl, os.path.join(STATIC_DIR, f"modelo_{name}.pkl"))
-
-        # Generar gráfico individual con los 3 indicadores (MSE, RMSE, R2) comparando train/test
-        metrics_names = ["MSE", "RMSE", "R²"]
-        train_vals = [mse_tr, rmse_tr, r2_tr]
-        test_vals = [mse_ts, rmse_ts, r2_ts]
-
-        plt.figure(figsize=(9,5))
-        x = np.arange(len(metrics_names))
-        width = 0.35
-        bars1 = plt.bar(x - width/2, train_vals, width, label='Entrenamiento', color='steelblue')
-        bars2 = plt.bar(x + width/2, test_vals, width, label='Prueba', color='coral')
-        plt.xticks(x, metrics_names)
-        plt.title(f"Métricas: {name}")
-        plt.ylabel("Valor")
-        plt.legend()
-        # Añadir etiquetas encima de barras
-        for b in bars1 + bars2:
-            h = b.get_height()
-            plt.annotate(f'{h:.3f}', xy=(b.get_x() + b.get_width()/2, h),
-                         xytext=(0,3), textcoords="offset points", ha='center', va='bottom', fontsize=8)
-        plt.tight_layout()
-        plt.savefig(os.path.join(STATIC_DIR, f"metricas_{name}.png"), dpi=300)
-        plt.close()
-
-        print(f"{name}: RMSE test={rmse_ts:.4f}, R2 test={r2_ts:.4f}  -> gráfico guardado: metricas_{name}.png")
-
-    except Exception as e:
-        print(f"Error entrenando {name}: {e}")
-
-# Guardar comparación general y gráfico de RMSE (test)
-df_results = pd.DataFrame(results).sort_values("rmse_test").reset_index(drop=True)
-df_results.to_csv(os.path.join(STATIC_DIR, "model_comparison.csv"), index=False)
-
-plt.figure(figsize=(10,6))
-plt.bar(df_results['model'], df_results['rmse_test'], color='teal')
-plt.ylabel('RMSE (test)')
-plt.title('Comparación RMSE (test) por modelo')
-plt.xticks(rotation=30, ha='right')
-for i, v in enumerate(df_results['rmse_test']):
-    plt.annotate(f'{v:.3f}', xy=(i, v), xytext=(0,3), textcoords="offset points", ha='center', fontsize=9)
-plt.tight_layout()
-plt.savefig(os.path.join(STATIC_DIR, "rmse_model_comparison.png"), dpi=200)
-plt.close()
-
-# Guardar scaler y columnas para la API (si existen)
-try:
-    joblib.dump(scaler, os.path.join(STATIC_DIR, "scaler_tesis.pkl"))
-except Exception:
-    pass
-try:
-    joblib.dump(list(X_train.columns), os.path.join(STATIC_DIR, "model_columns.pkl"))
-except Exception:
-    pass
-
-# Guardar mejor modelo por RMSE test con nombre estándar
-if not df_results.empty:
-    best_name = df_results.iloc[0]['model']
-    try:
-        best_obj = joblib.load(os.path.join(STATIC_DIR, f"modelo_{best_name}.pkl"))
-        joblib.dump(best_obj, os.path.join(STATIC_DIR, f"modelo_mejor_{best_name}.pkl"))
-    except Exception:
-        pass
-
-# =========================
-# 9. AJUSTE DE HIPERPARÁMETROS
-# =========================
-tune_results = []
-
-# Definir modelos base (usar objetos iguales a los que tienes)
-models_to_tune = {
-    "RandomForest": RandomForestRegressor(random_state=42, n_jobs=-1),
-    "ExtraTrees": ExtraTreesRegressor(random_state=42, n_jobs=-1),
-    "GradientBoosting": GradientBoostingRegressor(random_state=42),
-    "Ridge": Pipeline([("scaler", StandardScaler()), ("ridge", Ridge(random_state=42))]),
-}
-
-# Añadir XGBoost si está disponible
-try:
-    xgb_mod = importlib.import_module("xgboost")
-    XGBRegressor = getattr(xgb_mod, "XGBRegressor")
-    models_to_tune["XGBoost"] = XGBRegressor(random_state=42, verbosity=0)
-    has_xgb = True
-except Exception:
-    has_xgb = False
-
 # Parámetros para RandomizedSearchCV
 param_distributions = {
     "RandomForest": {
@@ -474,345 +110,592 @@ param_distributions = {
     }
 }
 
-os.makedirs(STATIC_DIR, exist_ok=True)
-
 # Parámetros de búsqueda (ajusta n_iter y cv según tiempos)
 N_ITER = 20
 CV = 5
-for name, estimator in models_to_tune.items():
-    print(f"\nTuning {name} ...")
-    pd_start = time.time()
-    params = param_distributions.get(name, {})
-    if not params:
-        print(f"No hay parámetros para {name}, se salta.")
-        continue
-
-    search = RandomizedSearchCV(
-        estimator, params, n_iter=N_ITER, cv=CV,
-        scoring="neg_mean_squared_error", n_jobs=-1, random_state=42, verbose=1
-    )
+# "random" (RandomizedSearchCV) o "halving" (successive halving, ver tuning.py)
+SEARCH = os.environ.get("ML_TUNE_SEARCH", "random")
+# Exportación compacta de los ensambles (ver compact.py): pérdida relativa de RMSE
+# aceptada y selección de árboles ("prefix" o "greedy")
+COMPACT_TOLERANCE = float(os.environ.get("ML_COMPACT_TOL", "0.01"))
+COMPACT_METHOD = os.environ.get("ML_COMPACT_METHOD", "prefix")
+
+
+def plot(filename, kind, **data):
+    # registra los datos de una figura (ver plots.py) como sección "plot:<archivo>" del perfil
+    with profiler.section(f"plot:{filename}"):
+        return record_plot(STATIC_DIR, filename, kind, **data)
+
+
+def load_xgb_regressor():
+    # XGBRegressor si xgboost está instalado, si no None
     try:
-        search.fit(X_train, y_train)
-        best = search.best_estimator_
-        # predecir y evaluar
-        y_pred_tr = best.predict(X_train)
-        y_pred_ts = best.predict(X_test)
-        mse_tr = mean_squared_error(y_train, y_pred_tr)
-        mse_ts = mean_squared_error(y_test, y_pred_ts)
-        rmse_tr = mse_tr ** 0.5
-        rmse_ts = mse_ts ** 0.5
-        r2_tr = r2_score(y_train, y_pred_tr)
-        r2_ts = r2_score(y_test, y_pred_ts)
+        xgb_mod = importlib.import_module("xgboost")
+        return getattr(xgb_mod, "XGBRegressor")
+    except Exception:
+        return None
 
-        # guardar mejor modelo
-        joblib.dump(best, os.path.join(STATIC_DIR, f"modelo_tuned_{name}.pkl"))
-
-        # gráfico con MSE, RMSE y R2
-        import matplotlib.pyplot as plt
-        metrics_names = ["MSE", "RMSE", "R²"]
-        train_vals = [mse_tr, rmse_tr, r2_tr]
-        test_vals = [mse_ts, rmse_ts, r2_ts]
-        plt.figure(figsize=(8,4.5))
-        x = range(len(metrics_names))
-        width = 0.35
-        bars1 = plt.bar([i-width/2 for i in x], train_vals, width, label="Entrenamiento", color="steelblue")
-        bars2 = plt.bar([i+width/2 for i in x], test_vals, width, label="Prueba", color="coral")
-        plt.xticks(x, metrics_names)
-        plt.title(f"Métricas ajustadas: {name}")
-        plt.legend()
-        for b in bars1 + bars2:
-            h = b.get_height()
-            plt.annotate(f"{h:.3f}", xy=(b.get_x()+b.get_width()/2, h), xytext=(0,3), textcoords="offset points", ha="center", va="bottom", fontsize=8)
-        plt.tight_layout()
-        plt.savefig(os.path.join(STATIC_DIR, f"metricas_tuned_{name}.png"), dpi=300)
-        plt.close()
-
-        tune_results.append({
-            "model": name,
-            "mse_train": mse_tr, "mse_test": mse_ts,
-            "rmse_train": rmse_tr, "rmse_test": rmse_ts,
-            "r2_train": r2_tr, "r2_test": r2_ts,
-            "best_params": search.best_params_
-        })
-        print(f"{name} tunado. RMSE test={rmse_ts:.4f}, MSE test={mse_ts:.4f}, tiempo={time.time()-pd_start:.1f}s")
-    except Exception as e:
-        print(f"Error en tuning {name}: {e}")
-
-# Guardar resumen y gráfico comparativo
-if tune_results:
-    df_tuned = pd.DataFrame(tune_results).sort_values("rmse_test").reset_index(drop=True)
-    df_tuned.to_csv(os.path.join(STATIC_DIR, "model_comparison_tuned.csv"), index=False)
-
-    plt.figure(figsize=(10,6))
-    plt.bar(df_tuned['model'], df_tuned['rmse_test'], color='teal')
-    plt.ylabel("RMSE (test)")
-    plt.title("Comparación RMSE (test) - modelos tunados")
-    for i, v in enumerate(df_tuned['rmse_test']):
-        plt.annotate(f"{v:.3f}", xy=(i, v), xytext=(0,3), textcoords="offset points", ha="center", fontsize=9)
-    plt.tight_layout()
-    plt.savefig(os.path.join(STATIC_DIR, "rmse_comparison_tuned.png"), dpi=200)
-    plt.close()
 
-# Diagnóstico de posible data leakage / correlaciones con TARGET
-import numpy as np
+# =========================
+# 1. CARGA DEL CSV
+# =========================
+@pipeline.stage("ingest", params={"file_path": FILE_PATH, "schema": SCHEMA}, inputs=[FILE_PATH])
+def ingest(file_path, schema):
+    # parseo tipado (float32) con caché binaria por hash del CSV: ver ingest.py
+    print("Leyendo:", file_path)
+    with profiler.section("read_csv"):
+        df = read_metrics(file_path, STATIC_DIR, schema)
+
+    print("Columnas forzadas:")
+    for c in df.columns:
+        print(" -", c)
+    return df
 
-# Asegurar TARGET numérico
-df[TARGET] = pd.to_numeric(df[TARGET], errors="coerce")
 
-# Convertir features a numérico cuando sea posible (sin sobrescribir strings útiles)
-num_df = df[FEATURES].apply(pd.to_numeric, errors="coerce")
+# =========================
+# 2. FEATURES / TARGET
+# =========================
+@pipeline.stage("clean", deps=["ingest"], params={"features": FEATURES, "target": TARGET})
+def clean(df, features, target):
+    # la limpieza de cada columna (coma decimal, porcentajes, número de TOTAL) ya la hizo
+    # la ingesta según el esquema; aquí solo se valida y se resume
+    missing = [c for c in features + [target] if c not in df.columns]
+    if missing:
+        raise ValueError(f"Columnas ausentes en el CSV: {missing}")
+
+    print("\nEstadísticas de TOTAL:")
+    print(f"Mínimo: {df[target].min():.2f}")
+    print(f"Máximo: {df[target].max():.2f}")
+    print(f"Media: {df[target].mean():.2f}")
+    print(f"Desviación estándar: {df[target].std():.2f}")
+    return df
 
-# 1) Correlaciones absolutas con TARGET
-corr_with_target = num_df.corrwith(df[TARGET]).abs().sort_values(ascending=False)
-print("\nTop correlaciones absolutas con TARGET:")
-print(corr_with_target.head(20))
 
-# 2) Comprobar si alguna columna es exactamente igual al TARGET (posible copia)
-exact_matches = []
-for col in FEATURES:
-    try:
-        # comparar como strings para detectar formatos distintos
-        if df[col].astype(str).eq(df[TARGET].astype(str)).all():
-            exact_matches.append(col)
-        elif df[col].astype(str).eq(df[TARGET].astype(str)).any():
-            # si algún valor coincide exactamente
-            print(f"Columna {col} tiene coincidencias exactas con TARGET (al menos una).")
-    except Exception:
-        pass
-
-if exact_matches:
-    print("Columnas idénticas a TARGET (borrar/ignorar):", exact_matches)
-
-# 3) Detectar features con correlación muy alta (>0.95) — candidatos a remover
-high_corr = corr_with_target[corr_with_target > 0.95].index.tolist()
-if high_corr:
-    print("Features con correlación >0.95 (candidatas a eliminar):", high_corr)
-
-# 4) Detectar columnas constantes o con muy poca varianza
-low_var = [c for c in FEATURES if num_df[c].nunique(dropna=True) <= 1]
-if low_var:
-    print("Columnas con varianza nula o 1 (eliminar):", low_var)
-
-# Sugerencia automática: eliminar columnas peligrosas antes del split
-cols_to_drop = set(high_corr + low_var + exact_matches)
-if cols_to_drop:
-    print("Se eliminarán temporalmente (antes del split):", cols_to_drop)
-    FEATURES = [f for f in FEATURES if f not in cols_to_drop]
-    num_df = num_df[FEATURES]
-
-# Guardar un CSV de diagnóstico simple para inspección manual
-diag = pd.DataFrame({
-    "feature": corr_with_target.index,
-    "abs_corr_with_target": corr_with_target.values
-}).reset_index(drop=True)
-diag.to_csv(os.path.join(STATIC_DIR, "diagnostico_correlaciones.csv"), index=False)
-
-# 5) Ahora hacer split (asegúrate de usar X_train para fit del scaler)
-X = num_df[FEATURES].fillna(0)
-y = df[TARGET].fillna(0)
+# =========================
+# 3. ESCALADO + SPLIT
+# =========================
+@pipeline.stage("split", deps=["clean"], params={"features": FEATURES, "target": TARGET,
+                                                  "test_size": 0.2, "random_state": 42})
+def split(df, features, target, test_size, random_state):
+    X = df[features]
+    y = df[target]
 
-from sklearn.model_selection import train_test_split
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    scaler = StandardScaler()
+    X_scaled = scaler.fit_transform(X)
 
-# Comprobar shapes
-print("Shapes: X_train, X_test, y_train, y_test ->", X_train.shape, X_test.shape, y_train.shape, y_test.shape)
+    X_train, X_test, y_train, y_test = train_test_split(
+        X_scaled, y, test_size=test_size, random_state=random_state
+    )
+    return {"scaler": scaler, "X_train": X_train, "X_test": X_test,
+            "y_train": y_train, "y_test": y_test, "n_total": int(len(df))}
+
+
+def evaluate(mdl, X_train, y_train, X_test, y_test):
+    # predicciones y MSE/RMSE/R2 en train y test
+    y_pred_tr = mdl.predict(X_train)
+    y_pred_ts = mdl.predict(X_test)
+    mse_tr = mean_squared_error(y_train, y_pred_tr)
+    mse_ts = mean_squared_error(y_test, y_pred_ts)
+    return y_pred_tr, y_pred_ts, {
+        "mse_train": mse_tr, "mse_test": mse_ts,
+        "rmse_train": np.sqrt(mse_tr), "rmse_test": np.sqrt(mse_ts),
+        "r2_train": r2_score(y_train, y_pred_tr), "r2_test": r2_score(y_test, y_pred_ts),
+    }
 
-# 6) Evaluación rápida de Ridge por cross-validation para verificar si surge over-optimistic result
-from sklearn.linear_model import Ridge
-from sklearn.preprocessing import StandardScaler
-from sklearn.pipeline import Pipeline
-from sklearn.model_selection import cross_val_score
 
-pipe = Pipeline([("scaler", StandardScaler()), ("ridge", Ridge(alpha=1.0, random_state=42))])
-cv_scores = cross_val_score(pipe, X_train, y_train, scoring="neg_mean_squared_error", cv=5, n_jobs=-1)
-cv_rmse = np.sqrt(-cv_scores)
-print("Ridge CV RMSE (folds):", np.round(cv_rmse, 4), "mean:", cv_rmse.mean().round(4))
-
-# 7) Entrenar Ridge y guardar gráfico pred vs real y residuales
-pipe.fit(X_train, y_train)
-y_pred = pipe.predict(X_test)
-
-import matplotlib.pyplot as plt
-plt.figure(figsize=(6,6))
-plt.scatter(y_test, y_pred, alpha=0.7)
-plt.plot([y_test.min(), y_test.max()], [y_test.min(), y_test.max()], 'r--')
-plt.xlabel("True TOTAL")
-plt.ylabel("Pred TOTAL (Ridge)")
-plt.title("Predicción vs Real - Ridge")
-plt.tight_layout()
-plt.savefig(os.path.join(STATIC_DIR, "ridge_pred_vs_true.png"), dpi=200)
-plt.close()
-
-resid = y_test - y_pred
-plt.figure(figsize=(6,4))
-plt.hist(resid, bins=30, color="coral", edgecolor="k")
-plt.title("Residuals - Ridge")
-plt.tight_layout()
-plt.savefig(os.path.join(STATIC_DIR, "ridge_residuals.png"), dpi=200)
-plt.close()
-
-# Imprimir métricas finales tras posible limpieza
-from sklearn.metrics import mean_squared_error, r2_score
-mse = mean_squared_error(y_test, y_pred)
-rmse = np.sqrt(mse)
-r2 = r2_score(y_test, y_pred)
-print(f"Ridge post-diagnóstico: MSE test: {mse:.4f}, RMSE test: {rmse:.4f}, R2 test: {r2:.4f}")
+# =========================
+# 4. MODELO
+# =========================
+@pipeline.stage("fit-baseline", deps=["split"], code=[evaluate])
+def fit_baseline(data):
+    model = RandomForestRegressor(
+        n_estimators=500,           # Aumentar árboles
+        max_depth=15,              # Ajustar profundidad
+        min_samples_split=4,
+        min_samples_leaf=2,
+        random_state=42,
+        n_jobs=-1
+    )
+    with profiler.section("fit"):
+        model.fit(data["X_train"], data["y_train"])
 
-import json
-import textwrap
-import matplotlib.pyplot as plt
-
-# -----------------------------
-# Generar resumen diagnóstico detallado + gráficos por puntaje
-# -----------------------------
-def generar_resumen_diagnostico(df, FEATURES, TARGET, STATIC_DIR, models_dict=None, df_results=None):
-    os.makedirs(os.path.join(STATIC_DIR, "diagnostics"), exist_ok=True)
-    diag_dir = os.path.join(STATIC_DIR, "diagnostics")
-
-    # 1) Estadísticas generales
-    total_stats = {
-        "min": float(df[TARGET].min()),
-        "max": float(df[TARGET].max()),
-        "mean": float(df[TARGET].mean()),
-        "std": float(df[TARGET].std()),
-        "n_samples": int(len(df))
+    # =========================
+    # 5. MÉTRICAS
+    # =========================
+    with profiler.section("evaluate"):
+        y_pred_train, y_pred_test, m = evaluate(model, data["X_train"], data["y_train"], data["X_test"], data["y_test"])
+
+    # Imprimir resultados
+    print(f"MSE train: {m['mse_train']:.4f}")
+    print(f"MSE test: {m['mse_test']:.4f}")
+    print(f"RMSE train: {m['rmse_train']:.4f}")
+    print(f"RMSE test: {m['rmse_test']:.4f}")
+    print(f"R² train: {m['r2_train']:.4f}")
+    print(f"R² test: {m['r2_test']:.4f}")
+    return {"model": model, "y_pred_train": y_pred_train, "y_pred_test": y_pred_test, "metrics": m}
+
+
+# =========================
+# 8 bis. COMPARACIÓN DE MODELOS
+# =========================
+def comparison_estimators():
+    # modelos a comparar
+    models = {
+        "RandomForest": RandomForestRegressor(n_estimators=200, random_state=42, n_jobs=-1),
+        "Ridge": Pipeline([("scaler", StandardScaler()), ("ridge", Ridge(alpha=1.0))]),
+        "GradientBoosting": GradientBoostingRegressor(n_estimators=200, learning_rate=0.05, max_depth=3, random_state=42),
+        "ExtraTrees": ExtraTreesRegressor(n_estimators=200, max_features="sqrt", random_state=42, n_jobs=-1),
     }
+    XGBRegressor = load_xgb_regressor()
+    if XGBRegressor is not None:
+        models["XGBoost"] = XGBRegressor(n_estimators=200, learning_rate=0.05, max_depth=4, random_state=42, verbosity=0)
+    return models
+
+
+# las familias se entrenan a la vez en procesos con el presupuesto de núcleos de
+# --cores / ML_TRAIN_CORES (ver parallel_fit.py); como en tune, no forma parte de la clave
+@pipeline.stage("compare", deps=["split"], code=[evaluate, load_xgb_regressor, comparison_estimators, fit_family])
+def compare(data):
+    # progreso en Static/stages/compare/model_comparison.csv, no en el de Static/ (lo publica export)
+    csv_path = os.path.join(pipeline.work_dir("compare"), "model_comparison.csv")
+    if os.path.exists(csv_path):
+        os.remove(csv_path)
+
+    def finished(name, mdl, m, timing):
+        # cada familia queda en el CSV de trabajo en cuanto termina
+        profiler.record(name, timing["wall_s"], timing["cpu_s"], threads=timing["threads"])
+        stream_row(csv_path, {"model": name, **m})
+        print(f"{name}: RMSE test={m['rmse_test']:.4f}, R2 test={m['r2_test']:.4f} "
+              f"({timing['wall_s']:.1f}s, {timing['threads']} hilos)")
+
+    def failed(name, e):
+        print(f"Error entrenando {name}: {e}")
+
+    done = fit_concurrent(comparison_estimators(), data, evaluate, on_result=finished, on_error=failed)
+    fitted = {name: mdl for name, (mdl, _, _) in done.items()}
+    results = [{"model": name, **m} for name, (_, m, _) in done.items()]
+    return {"models": fitted, "results": results}
+
+
+# =========================
+# 9. AJUSTE DE HIPERPARÁMETROS
+# =========================
+def tuning_estimators():
+    # Definir modelos base (usar objetos iguales a los que tienes)
+    models_to_tune = {
+        "RandomForest": RandomForestRegressor(random_state=42, n_jobs=-1),
+        "ExtraTrees": ExtraTreesRegressor(random_state=42, n_jobs=-1),
+        "GradientBoosting": GradientBoostingRegressor(random_state=42),
+        "Ridge": Pipeline([("scaler", StandardScaler()), ("ridge", Ridge(random_state=42))]),
+    }
+    # Añadir XGBoost si está disponible
+    XGBRegressor = load_xgb_regressor()
+    if XGBRegressor is not None:
+        models_to_tune["XGBoost"] = XGBRegressor(random_state=42, verbosity=0)
+    return models_to_tune
+
+
+# el presupuesto de núcleos (--cores / ML_TRAIN_CORES) no cambia el resultado y no forma
+# parte de la clave de la etapa
+@pipeline.stage("tune", deps=["split"], params={"param_distributions": param_distributions,
+                                                 "n_iter": N_ITER, "cv": CV, "search": SEARCH},
+                code=[evaluate, tuning_estimators, load_xgb_regressor])
+def tune(data, param_distributions, n_iter, cv, search):
+    best_models, tune_results, reports = {}, [], {}
+    for name, estimator in tuning_estimators().items():
+        print(f"\nTuning {name} ({search}) ...")
+        params = param_distributions.get(name, {})
+        if not params:
+            print(f"No hay parámetros para {name}, se salta.")
+            continue
 
-    # 2) Correlaciones (abs) y top features
-    numeric = df[FEATURES].apply(pd.to_numeric, errors="coerce")
-    corr = numeric.corrwith(df[TARGET]).fillna(0)
-    corr_abs = corr.abs().sort_values(ascending=False)
-    top_features = corr_abs.head(20).index.tolist()
-    top_corr_df = pd.DataFrame({
-        "feature": corr.index,
-        "corr": corr.values,
-        "abs_corr": corr.abs().values
-    }).sort_values("abs_corr", ascending=False)
-    top_corr_df.to_csv(os.path.join(diag_dir, "top_feature_correlations.csv"), index=False)
-
-    # 3) Detección de columnas con coincidencias exactas (data leakage)
-    n = len(df)
-    exact_info = []
-    for col in FEATURES:
         try:
-            matches = df[col].astype(str).eq(df[TARGET].astype(str))
-            pct = matches.sum() / n
-            exact_info.append({"feature": col, "pct_match": float(pct), "matches": int(matches.sum())})
-        except Exception:
-            exact_info.append({"feature": col, "pct_match": 0.0, "matches": 0})
-    exact_df = pd.DataFrame(exact_info).sort_values("pct_match", ascending=False)
-    exact_df.to_csv(os.path.join(diag_dir, "exact_matches_summary.csv"), index=False)
-
-    # 4) Feature importances / coefficients (si hay modelos)
-    model_explanations = {}
-    if models_dict:
-        for name, mdl in models_dict.items():
-            try:
-                if hasattr(mdl, "feature_importances_"):
-                    imps = mdl.feature_importances_
-                    imp_df = pd.DataFrame({"feature": FEATURES, "importance": imps}).sort_values("importance", ascending=False)
-                    imp_df.to_csv(os.path.join(diag_dir, f"feature_importances_{name}.csv"), index=False)
-                    model_explanations[name] = {
-                        "type": "tree",
-                        "top_features": imp_df.head(10).to_dict(orient="records")
-                    }
-                # Pipeline with Ridge
-                elif hasattr(mdl, "named_steps") and "ridge" in mdl.named_steps:
-                    coef = mdl.named_steps["ridge"].coef_
-                    coef_df = pd.DataFrame({"feature": FEATURES, "coef": coef}).sort_values("coef", key=abs, ascending=False)
-                    coef_df.to_csv(os.path.join(diag_dir, f"coefficients_{name}.csv"), index=False)
-                    model_explanations[name] = {
-                        "type": "linear",
-                        "top_features": coef_df.head(10).to_dict(orient="records")
-                    }
-            except Exception:
-                continue
-
-    # 5) Resumen por puntaje: para cada valor TARGET con >=2 muestras, guardar gráfico de medias de top features
-    score_counts = df[TARGET].value_counts().sort_values(ascending=False)
-    scores_to_plot = score_counts[score_counts >= 2].index.tolist()  # al menos 2 muestras
-    max_plots = 30
-    scores_to_plot = scores_to_plot[:max_plots]
-
-    top_k = 8
-    for s in scores_to_plot:
-        subset = df[df[TARGET] == s]
-        # calcular medias solo para features numéricos y top features por correlación
-        sub_num = subset[top_features].apply(pd.to_numeric, errors="coerce")
-        means = sub_num.mean().sort_values(ascending=False).head(top_k)
-        plt.figure(figsize=(8,4))
-        means.plot(kind="bar", color="steelblue")
-        plt.title(f"Puntaje {s} (n={len(subset)}): medias de top {top_k} features")
-        plt.ylabel("Media")
-        plt.tight_layout()
-        fn = os.path.join(diag_dir, f"puntaje_{str(s).replace(' ','_')}.png")
-        plt.savefig(fn, dpi=200)
-        plt.close()
-
-    # 6) Explicaciones automatizadas para el resumen (por modelo y por puntaje)
-    lines = []
-    lines.append("# Resumen de diagnóstico automático\n")
-    lines.append("## Estadísticas generales de la variable TARGET\n")
-    lines.append(f"- Mínimo: {total_stats['min']}")
-    lines.append(f"- Máximo: {total_stats['max']}")
-    lines.append(f"- Media: {total_stats['mean']:.2f}")
-    lines.append(f"- Desviación estándar: {total_stats['std']:.2f}")
-    lines.append(f"- N muestras: {total_stats['n_samples']}\n")
-
-    lines.append("## Top features por correlación absoluta con TARGET\n")
-    for feat, val in corr_abs.head(10).items():
-        lines.append(f"- {feat}: correlación {val:.3f}")
-
-    # advertencia de leak si alguna feature supera 1% coincidencias exactas
-    suspicious = exact_df[exact_df["pct_match"] >= 0.01]
-    if not suspicious.empty:
-        lines.append("\n## ALERTA: Posible data leakage\n")
-        lines.append("Las siguientes columnas contienen coincidencias exactas con el TARGET en ≥1% de las filas. Se recomienda revisar o eliminar estas columnas antes de entrenar modelos.\n")
-        for _, r in suspicious.iterrows():
-            lines.append(f"- {r['feature']}: {r['pct_match']*100:.2f}% coincidencias ({r['matches']} filas).")
-    else:
-        lines.append("\n## Data leakage: no detectado >1% coincidencias exactas.\n")
-
-    # Añadir explicación por modelo
-    if df_results is not None:
-        lines.append("\n## Resumen por modelo (métricas)\n")
-        for _, r in df_results.sort_values("rmse_test").iterrows():
-            m = r["model"]
-            lines.append(f"- {m}: RMSE test={r['rmse_test']:.3f}, MSE test={r.get('mse_test', float('nan')):.3f}, R² test={r['r2_test']:.4f}")
-            # añadir explicación breve
-            if r["rmse_test"] > (0.15 * total_stats['std']):  # heurística: RMSE > 15% std -> moderado/alto
-                lines.append(f"  - Interpretación: error moderado/alto respecto a la dispersión de los datos.")
-            else:
-                lines.append(f"  - Interpretación: error bajo respecto a la dispersión de los datos.")
-
-            # si hay explicación de importancia
-            if models_dict and m in model_explanations:
-                me = model_explanations[m]
-                topf = ', '.join([t['feature'] for t in me['top_features'][:5]])
-                lines.append(f"  - Features relevantes: {topf}.")
-
-    # Guardar resumen markdown
-    resumen_md = "\n".join(lines)
-    with open(os.path.join(diag_dir, "resumen_analisis.md"), "w", encoding="utf-8") as f:
-        f.write(resumen_md)
-
-    # Guardar también JSON con rutas e índices para UI o inspección
-    out = {
-        "stats": total_stats,
-        "top_features_by_corr": corr_abs.head(20).to_dict(),
-        "suspicious_features": suspicious.to_dict(orient="records"),
-        "models_summary": (df_results.sort_values("rmse_test").to_dict(orient="records") if df_results is not None else []),
-        "plots_by_score": [f"diagnostics/puntaje_{str(s).replace(' ','_')}.png" for s in scores_to_plot]
+            with profiler.section(name, search=search):
+                result, rep = run_search(estimator, params, data["X_train"], data["y_train"],
+                                         mode=search, n_iter=n_iter, cv=cv, verbose=1)
+                best = result.best_estimator_
+                # predecir y evaluar
+                _, _, m = evaluate(best, data["X_train"], data["y_train"], data["X_test"], data["y_test"])
+            best_models[name] = best
+            tune_results.append({"model": name, **m, "best_params": result.best_params_})
+            reports[name] = rep
+            print(f"{name} tunado. RMSE test={m['rmse_test']:.4f}, MSE test={m['mse_test']:.4f}, "
+                  f"tiempo={rep['wall_s']:.1f}s (al mejor: {rep['time_to_best_s']:.1f}s, "
+                  f"{rep['candidates']} candidatos, {rep['workers']}x{rep['threads']} núcleos)")
+        except Exception as e:
+            print(f"Error en tuning {name}: {e}")
+    return {"models": best_models, "results": tune_results, "search": reports}
+
+
+# =========================
+# 9 bis. EXPORTACIÓN COMPACTA
+# =========================
+def compact_candidates(base, compared, tuned):
+    # ensambles a podar, con el nombre con el que se sirven
+    models = {"tesis": base["model"], **compared["models"]}
+    models.update({f"tuned_{name}": mdl for name, mdl in tuned["models"].items()})
+    return models
+
+
+@pipeline.stage("compact", deps=["split", "fit-baseline", "compare", "tune"],
+                params={"tolerance": COMPACT_TOLERANCE, "method": COMPACT_METHOD},
+                code=[evaluate, compact_candidates, compact_model, oob_mask, staged, oob_curve, cv_curve, select_prefix,
+                      select_greedy, subset_model])
+def compact(data, base, compared, tuned, tolerance, method):
+    compact_models, compact_results = {}, []
+    for name, mdl in compact_candidates(base, compared, tuned).items():
+        try:
+            with profiler.section(f"compact/{name}"):
+                sub, rep = compact_model(mdl, data["X_train"], data["y_train"], data["X_test"], data["y_test"],
+                                         tolerance, method)
+        except Exception as e:
+            print(f"Error compactando {name}: {e}")
+            continue
+        if sub is None:
+            continue
+        # métricas del modelo tal como se sirve (motor compilado, nodos float32)
+        served = compile_model(sub, compact_name(name))
+        _, _, m = evaluate(served, data["X_train"], data["y_train"], data["X_test"], data["y_test"])
+        compact_models[compact_name(name)] = sub
+        compact_results.append({"model": compact_name(name), **m, "source": name, **rep})
+        print(f"{name} compactado: {rep['trees_full']} -> {rep['trees']} árboles, "
+              f"{rep['size_bytes_full'] / 1e6:.2f} -> {rep['size_bytes'] / 1e6:.2f} MB, "
+              f"{rep['latency_ms_full']:.3f} -> {rep['latency_ms']:.3f} ms/fila, RMSE {rep['rmse_delta']:+.2%}")
+    return {"models": compact_models, "results": compact_results}
+
+
+# =========================
+# 10. DIAGNÓSTICO
+# =========================
+# Diagnóstico de posible data leakage / correlaciones con TARGET
+@pipeline.stage("diagnose", deps=["clean", "compare"], params={"features": FEATURES, "target": TARGET},
+                outputs=["diagnostico_correlaciones.csv", "diagnostics/resumen_analisis.json"],
+                code=[generar_resumen_diagnostico, feature_stats, screen_features, score_groups])
+def diagnose(df, compared, features, target):
+    df = df.copy()
+    FEATURES, TARGET = list(features), target
+    # columnas con las que la etapa compare ajustó sus modelos (antes de descartar nada aquí)
+    train_features = list(features)
+
+    # Asegurar TARGET numérico
+    df[TARGET] = pd.to_numeric(df[TARGET], errors="coerce")
+
+    # las features ya son float32 desde la ingesta
+    num_df = df[FEATURES]
+
+    # 1) Correlaciones, coincidencias exactas y columnas constantes en una pasada (diagnostics.py)
+    stats = feature_stats(df, FEATURES, TARGET)
+    screen = screen_features(stats)
+    corr_with_target = stats["corr"].abs().sort_values(ascending=False)
+    print("\nTop correlaciones absolutas con TARGET:")
+    print(corr_with_target.head(20))
+
+    # 2) Comprobar si alguna columna es exactamente igual al TARGET (posible copia)
+    exact_matches = screen["identical"]
+    for col in screen["partial_matches"]:
+        print(f"Columna {col} tiene coincidencias exactas con TARGET (al menos una).")
+
+    if exact_matches:
+        print("Columnas idénticas a TARGET (borrar/ignorar):", exact_matches)
+
+    # 3) Detectar features con correlación muy alta (>0.95) — candidatos a remover
+    high_corr = screen["high_corr"]
+    if high_corr:
+        print("Features con correlación >0.95 (candidatas a eliminar):", high_corr)
+
+    # 4) Detectar columnas constantes o con muy poca varianza
+    low_var = screen["low_var"]
+    if low_var:
+        print("Columnas con varianza nula o 1 (eliminar):", low_var)
+
+    # Sugerencia automática: eliminar columnas peligrosas antes del split
+    cols_to_drop = set(high_corr + low_var + exact_matches)
+    if cols_to_drop:
+        print("Se eliminarán temporalmente (antes del split):", cols_to_drop)
+        FEATURES = [f for f in FEATURES if f not in cols_to_drop]
+        num_df = num_df[FEATURES]
+
+    # Guardar un CSV de diagnóstico simple para inspección manual
+    diag = pd.DataFrame({
+        "feature": corr_with_target.index,
+        "abs_corr_with_target": corr_with_target.values
+    }).reset_index(drop=True)
+    diag.to_csv(os.path.join(STATIC_DIR, "diagnostico_correlaciones.csv"), index=False)
+
+    # 5) Ahora hacer split (asegúrate de usar X_train para fit del scaler)
+    X = num_df[FEATURES].fillna(0)
+    y = df[TARGET].fillna(0)
+
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+
+    # Comprobar shapes
+    print("Shapes: X_train, X_test, y_train, y_test ->", X_train.shape, X_test.shape, y_train.shape, y_test.shape)
+
+    # 6) Evaluación rápida de Ridge por cross-validation para verificar si surge over-optimistic result
+    pipe = Pipeline([("scaler", StandardScaler()), ("ridge", Ridge(alpha=1.0, random_state=42))])
+    with profiler.section("ridge_cv"):
+        cv_scores = cross_val_score(pipe, X_train, y_train, scoring="neg_mean_squared_error", cv=5, n_jobs=-1)
+    cv_rmse = np.sqrt(-cv_scores)
+    print("Ridge CV RMSE (folds):", np.round(cv_rmse, 4), "mean:", cv_rmse.mean().round(4))
+
+    # 7) Entrenar Ridge y guardar gráfico pred vs real y residuales
+    pipe.fit(X_train, y_train)
+    y_pred = pipe.predict(X_test)
+
+    plot("ridge_pred_vs_true.png", "scatter_ideal", dpi=200, figsize=(6, 6),
+                series=[{"x": y_test, "y": y_pred, "alpha": 0.7}], ideal=[y_test.min(), y_test.max()],
+                ideal_style="r--", legend=False,
+                xlabel="True TOTAL", ylabel="Pred TOTAL (Ridge)", title="Predicción vs Real - Ridge")
+
+    resid = y_test - y_pred
+    plot("ridge_residuals.png", "hist", dpi=200, figsize=(6, 4),
+                values=resid, bins=30, color="coral", title="Residuals - Ridge")
+
+    # Imprimir métricas finales tras posible limpieza
+    mse = mean_squared_error(y_test, y_pred)
+    rmse = np.sqrt(mse)
+    r2 = r2_score(y_test, y_pred)
+    print(f"Ridge post-diagnóstico: MSE test: {mse:.4f}, RMSE test: {rmse:.4f}, R2 test: {r2:.4f}")
+
+    # Resumen detallado con las métricas de la comparación de modelos
+    df_results = pd.DataFrame(compared["results"]).sort_values("rmse_test").reset_index(drop=True)
+    diag_dir = None
+    try:
+        with profiler.section("summary"):
+            diag_dir = generar_resumen_diagnostico(df, train_features, TARGET, STATIC_DIR,
+                                                   models_dict=compared["models"], df_results=df_results, plot=plot)
+    except Exception as e:
+        print("Error generando resumen diagnóstico:", e)
+    return {"dropped": sorted(cols_to_drop), "ridge_cv_rmse": cv_rmse.tolist(),
+            "ridge_rmse_test": float(rmse), "diag_dir": diag_dir}
+
+
+# =========================
+# 11. EXPORTACIÓN: ARTEFACTOS + DATOS DE GRÁFICOS
+# =========================
+# solo se guardan los datos de los gráficos (Static/plot_data); las figuras se dibujan
+# con `python plots.py` o bajo demanda desde /plots/<archivo>
+def export_baseline(data, base):
+    model, m = base["model"], base["metrics"]
+    X_train, X_test, y_train, y_test = data["X_train"], data["X_test"], data["y_train"], data["y_test"]
+    y_pred_train, y_pred_test = base["y_pred_train"], base["y_pred_test"]
+    y = pd.concat([y_train, y_test])
+
+    # Curva train / validation: cada árbol predice una sola vez; el RMSE de cada
+    # prefijo sale de sumas acumuladas
+    with profiler.section("staged_curve"):
+        steps, train_curve = staged_rmse(model, X_train, y_train)
+        _, val_curve = staged_rmse(model, X_test, y_test)
+    plot("train_validation_curve.png", "curves", dpi=300, figsize=(6, 5),
+                series=[{"x": steps, "y": train_curve, "label": "train", "color": "steelblue"},
+                        {"x": steps, "y": val_curve, "label": "validation", "color": "coral"}],
+                vline=max(steps) * 0.5, xlabel="nº de árboles (iteraciones)", ylabel="RMSE",
+                title="Curvas de entrenamiento (RandomForest)")
+
+    # Importancia
+    fi = model.feature_importances_
+    fi_df = pd.DataFrame({"Característica": FEATURES, "Importancia": fi}).sort_values(
+        "Importancia", ascending=False
+    )
+    plot("feature_importance.png", "importance", dpi=300, figsize=(10, 8),
+                labels=fi_df["Característica"], values=fi_df["Importancia"],
+                xlabel="Importancia", ylabel="Característica",
+                title="Importancia de características (RandomForest)")
+
+    # Real vs Predicho (test)
+    mn, mx = min(y_test.min(), y_pred_test.min()), max(y_test.max(), y_pred_test.max())
+    plot("prediction_test.png", "scatter_ideal", dpi=300, figsize=(6, 6),
+                series=[{"x": y_test, "y": y_pred_test, "alpha": 0.6, "label": "Test"}],
+                ideal=[mn, mx], ideal_style="r--", ideal_label="Ideal",
+                xlabel="Real (TOTAL)", ylabel="Predicho (TOTAL)",
+                title=f"Predicción vs Real (test)\nRMSE={m['rmse_test']:.2f} | R2={m['r2_test']:.2f}")
+
+    # Train vs Test juntos
+    mn2 = min(y.min(), y_pred_train.min(), y_pred_test.min())
+    mx2 = max(y.max(), y_pred_train.max(), y_pred_test.max())
+    plot("train_vs_test.png", "scatter_ideal", dpi=300, figsize=(6, 6),
+                series=[{"x": y_train, "y": y_pred_train, "alpha": 0.4, "label": "Train"},
+                        {"x": y_test, "y": y_pred_test, "alpha": 0.6, "label": "Test"}],
+                ideal=[mn2, mx2], ideal_style="k--", ideal_label="Ideal",
+                xlabel="Real (TOTAL)", ylabel="Predicho (TOTAL)", title="Train vs Test (misma escala)")
+
+    # Errores
+    errors_df = pd.DataFrame({
+        "y_test": y_test.values,
+        "y_pred_test": y_pred_test,
+        "abs_error": np.abs(y_test.values - y_pred_test)
+    })
+    errors_df.to_csv(os.path.join(STATIC_DIR, "errors_test.csv"), index=False, encoding="utf-8")
+
+    # Gráficos de métricas de evaluación
+    plot("metricas_evaluacion.png", "metric_panels", dpi=300, figsize=(15, 5), panels=[
+        {"title": "Error Cuadrático Medio\n(MSE)", "ylabel": "MSE", "train": m["mse_train"], "test": m["mse_test"]},
+        {"title": "Raíz del Error Cuadrático Medio\n(RMSE)", "ylabel": "RMSE", "train": m["rmse_train"], "test": m["rmse_test"]},
+        {"title": "Coeficiente de Determinación\n(R²)", "ylabel": "R²", "train": m["r2_train"], "test": m["r2_test"]},
+    ])
+
+    # Artefactos
+    joblib.dump(model, os.path.join(STATIC_DIR, "modelo_tesis.pkl"))
+    joblib.dump(data["scaler"], os.path.join(STATIC_DIR, "scaler_tesis.pkl"))
+    joblib.dump(FEATURES, os.path.join(STATIC_DIR, "model_columns.pkl"))
+
+    with open(os.path.join(STATIC_DIR, "model_columns.json"), "w", encoding="utf-8") as f:
+        json.dump(FEATURES, f, ensure_ascii=False, indent=2)
+
+    metrics_payload = {
+        "rmse_train": m["rmse_train"],
+        "r2_train": m["r2_train"],
+        "rmse_test": m["rmse_test"],
+        "r2_test": m["r2_test"],
+        "n_total": data["n_total"],
+        "n_train": int(len(y_train)),
+        "n_test": int(len(y_test))
     }
-    with open(os.path.join(diag_dir, "resumen_analisis.json"), "w", encoding="utf-8") as f:
-        json.dump(out, f, indent=2, ensure_ascii=False)
-
-    print("Resumen diagnóstico generado en:", diag_dir)
-    return diag_dir
-
-# Llamar a la función tras entrenar y tener df_results y models (asegúrate models dict existe)
-try:
-    # models variable: dict con objetos entrenados (ej. models usado en el entrenamiento)
-    diag_dir = generar_resumen_diagnostico(df, FEATURES, TARGET, STATIC_DIR, models_dict=models, df_results=df_results)
-except Exception as e:
-    print("Error generando resumen diagnóstico:", e)
+    with open(os.path.join(STATIC_DIR, "metrics.json"), "w", encoding="utf-8") as f:
+        json.dump(metrics_payload, f, ensure_ascii=False, indent=2)
+
+
+def export_comparison(data, compared):
+    for r in compared["results"]:
+        name = r["model"]
+        # Guardar modelo
+        joblib.dump(compared["models"][name], os.path.join(STATIC_DIR, f"modelo_{name}.pkl"))
+        # datos del gráfico individual con los 3 indicadores (MSE, RMSE, R2) comparando train/test
+        plot(f"metricas_{name}.png", "metric_pairs", dpi=300, figsize=(9, 5),
+                    names=["MSE", "RMSE", "R²"], train=[r["mse_train"], r["rmse_train"], r["r2_train"]],
+                    test=[r["mse_test"], r["rmse_test"], r["r2_test"]],
+                    title=f"Métricas: {name}", ylabel="Valor")
+
+    # Guardar comparación general y gráfico de RMSE (test)
+    # (la etapa compare solo escribe su copia de trabajo en Static/stages/compare/)
+    df_results = pd.DataFrame(compared["results"]).sort_values("rmse_test").reset_index(drop=True)
+    df_results.to_csv(os.path.join(STATIC_DIR, "model_comparison.csv"), index=False)
+
+    plot("rmse_model_comparison.png", "bar_values", dpi=200, figsize=(10, 6),
+                labels=df_results['model'], values=df_results['rmse_test'], rotation=30,
+                ylabel='RMSE (test)', title='Comparación RMSE (test) por modelo')
+
+    # Curvas de validación por nº de árboles/iteraciones de los ensambles comparados
+    staged_series = []
+    for name, mdl in compared["models"].items():
+        try:
+            with profiler.section(f"staged_curve:{name}"):
+                st, curve = staged_rmse(mdl, data["X_test"], data["y_test"])
+        except Exception as e:
+            print(f"Sin curva por etapas para {name}: {e}")
+            continue
+        if curve is not None:
+            staged_series.append({"x": st, "y": curve, "label": name})
+    plot("staged_validation_curves.png", "curves", dpi=200, figsize=(8, 5),
+                series=staged_series, xlabel="nº de árboles (iteraciones)", ylabel="RMSE (test)",
+                title="Curvas de validación por etapas")
+
+    # Guardar mejor modelo por RMSE test con nombre estándar
+    if not df_results.empty:
+        best_name = df_results.iloc[0]['model']
+        joblib.dump(compared["models"][best_name], os.path.join(STATIC_DIR, f"modelo_mejor_{best_name}.pkl"))
+
+
+def export_tuned(tuned):
+    for r in tuned["results"]:
+        name = r["model"]
+        # guardar mejor modelo
+        joblib.dump(tuned["models"][name], os.path.join(STATIC_DIR, f"modelo_tuned_{name}.pkl"))
+        # datos del gráfico con MSE, RMSE y R2
+        plot(f"metricas_tuned_{name}.png", "metric_pairs", dpi=300, figsize=(8, 4.5),
+                    names=["MSE", "RMSE", "R²"], train=[r["mse_train"], r["rmse_train"], r["r2_train"]],
+                    test=[r["mse_test"], r["rmse_test"], r["r2_test"]],
+                    title=f"Métricas ajustadas: {name}")
+
+    # Guardar resumen y gráfico comparativo
+    if tuned["results"]:
+        df_tuned = pd.DataFrame(tuned["results"]).sort_values("rmse_test").reset_index(drop=True)
+        df_tuned.to_csv(os.path.join(STATIC_DIR, "model_comparison_tuned.csv"), index=False)
+
+        plot("rmse_comparison_tuned.png", "bar_values", dpi=200, figsize=(10, 6),
+                    labels=df_tuned['model'], values=df_tuned['rmse_test'],
+                    ylabel="RMSE (test)", title="Comparación RMSE (test) - modelos tunados")
+
+
+def export_compact(compacted):
+    # modelos podados como modelo_compact_<nombre>.pkl y sus filas en model_comparison.csv
+    for name, mdl in compacted["models"].items():
+        joblib.dump(mdl, os.path.join(STATIC_DIR, f"modelo_{name}.pkl"))
+    if not compacted["results"]:
+        return
+    path = os.path.join(STATIC_DIR, "model_comparison.csv")
+    df_results = pd.read_csv(path) if os.path.exists(path) else pd.DataFrame()
+    if "model" in df_results.columns:
+        df_results = df_results[~df_results["model"].astype(str).str.startswith("compact_")]
+    df_compact = pd.DataFrame(compacted["results"]).sort_values("rmse_test")
+    pd.concat([df_results, df_compact], ignore_index=True).to_csv(path, index=False)
+
+
+@pipeline.stage("export", deps=["split", "fit-baseline", "compare", "tune", "compact"],
+                outputs=["modelo_tesis.pkl", "scaler_tesis.pkl", "model_columns.json", "metrics.json",
+                         "model_comparison.csv", "manifest.json"],
+                code=[export_baseline, export_comparison, export_tuned, export_compact])
+def export(data, base, compared, tuned, compacted):
+    export_baseline(data, base)
+    export_comparison(data, compared)
+    export_tuned(tuned)
+    export_compact(compacted)
+    print("Datos de gráficos guardados en:", os.path.join(STATIC_DIR, "plot_data"), "(dibujar con: python plots.py)")
+
+    # Artefactos compartidos (mmap): exportar nodos de árboles / coeficientes / scaler como
+    # .npy para que los workers de gunicorn los mapeen en memoria compartida en vez de
+    # deserializar cada .pkl
+    exported = []
+    try:
+        from shared_artifacts import export_all
+        with profiler.section("shared_artifacts"):
+            exported, _ = export_all(STATIC_DIR)
+        print("Artefactos planos exportados a Static/shared:", exported)
+    except Exception as e:
+        print("Error exportando artefactos compartidos:", e)
+
+    # Manifiesto del conjunto de artefactos: la API lo vigila y recarga en caliente
+    version = None
+    try:
+        from artifact_manager import write_manifest
+        version = write_manifest(STATIC_DIR)
+        print("Manifiesto de artefactos:", version)
+    except Exception as e:
+        print("Error escribiendo manifiesto:", e)
+    return {"shared": exported, "manifest": version}
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Entrenamiento por etapas con caché en Static/stages")
+    ap.add_argument("stages", nargs="*", help=f"etapas a ejecutar (por defecto, todas las desactualizadas): {', '.join(pipeline.stages)}")
+    ap.add_argument("--force", action="store_true", help="re-ejecutar las etapas pedidas aunque estén al día")
+    ap.add_argument("--list", action="store_true", help="mostrar el estado de cada etapa y salir")
+    ap.add_argument("--search", choices=SEARCH_MODES, default=None, help=f"búsqueda de hiperparámetros (por defecto {SEARCH})")
+    ap.add_argument("--cores", type=int, default=None, help="núcleos para la comparación y el ajuste de hiperparámetros (por defecto todos)")
+    ap.add_argument("--compact-tolerance", type=float, default=None,
+                    help=f"pérdida relativa de RMSE aceptada al podar los ensambles (por defecto {COMPACT_TOLERANCE})")
+    ap.add_argument("--compact-method", choices=COMPACT_METHODS, default=None,
+                    help=f"selección de árboles de la exportación compacta (por defecto {COMPACT_METHOD})")
+    ap.add_argument("--cprofile", action="store_true", help="guardar además un volcado de cProfile en Static/train_profile.prof")
+    args = ap.parse_args()
+    if args.search:
+        pipeline.stages["tune"].params["search"] = args.search
+    if args.cores:
+        os.environ["ML_TRAIN_CORES"] = str(args.cores)
+    if args.compact_tolerance is not None:
+        pipeline.stages["compact"].params["tolerance"] = args.compact_tolerance
+    if args.compact_method:
+        pipeline.stages["compact"].params["method"] = args.compact_method
+
+    if args.list:
+        for name, state in pipeline.status():
+            print(f"{name:14s} {state}")
+    else:
+        profiler = Profiler(cprofile=args.cprofile)
+        executed = []
+        try:
+            executed = pipeline.run(args.stages or None, force=args.force, profiler=profiler)
+        finally:
+            data = profiler.save(PROFILE_PATH, executed=executed, search=pipeline.stages["tune"].params["search"])
+            print("Perfil del entrenamiento:", PROFILE_PATH, "(resumen: python profiling.py)")
+        print(f"Entrenamiento COMPLETO. Etapas ejecutadas: {executed or 'ninguna'} ({data['wall_s']:.1f}s)")
@@ -0,0 +1,239 @@
+# tree_engine.py
+# Motor de inferencia compilado para los ensambles de árboles (RandomForest,
+# ExtraTrees, GradientBoosting, modelo_tesis) y el pipeline de Ridge.
+# Al cargar un modelo se compilan sus árboles en tablas de nodos planas
+# (feature, threshold, children, value) y un lote se evalúa recorriendo todos los
+# árboles a la vez: una iteración vectorizada por nivel de profundidad en lugar
+# del despacho por estimador (y el pool de hilos) de sklearn.
+# En la API se elige con ML_ENGINE=compiled|sklearn y por modelo con
+# ML_ENGINE_OVERRIDES="tesis=sklearn".
+#
+# Benchmark contra sklearn:  python tree_engine.py [--batch 1 100 1000]
+import argparse
+import glob
+import os
+import time
+
+import numpy as np
+
+# tope de celdas (filas x árboles) por bloque para acotar la memoria temporal
+MAX_BLOCK_CELLS = 1 << 20
+# modelos podados por compact.py (modelo_compact_*.pkl): se compilan con nodos float32
+COMPACT_PREFIX = "compact_"
+
+
+# =========================
+# COMPILACIÓN
+# =========================
+def pack_trees(trees):
+    # concatena los nodos de todos los árboles en tablas planas con índices globales;
+    # las hojas apuntan a sí mismas para poder recorrer todos los árboles a la vez
+    features, thresholds, children, values, roots = [], [], [], [], []
+    offset = 0
+    depth = 0
+    for t in trees:
+        n = t.node_count
+        left = t.children_left.astype(np.int64)
+        right = t.children_right.astype(np.int64)
+        leaf = left < 0
+        idx = np.arange(n, dtype=np.int64)
+        feat = t.feature.astype(np.int32)
+        feat[leaf] = 0
+        features.append(feat)
+        thresholds.append(np.where(leaf, np.inf, t.threshold).astype(np.float64))
+        # hijos intercalados: children[2*i] = izquierdo, children[2*i + 1] = derecho
+        ch = np.empty(2 * n, dtype=np.int64)
+        ch[0::2] = np.where(leaf, idx, left) + offset
+        ch[1::2] = np.where(leaf, idx, right) + offset
+        children.append(ch)
+        values.append(t.value.reshape(n, -1)[:, 0].astype(np.float64))
+        roots.append(offset)
+        offset += n
+        depth = max(depth, int(t.max_depth))
+    return {
+        "feature": np.concatenate(features),
+        "threshold": np.concatenate(thresholds),
+        "children": np.concatenate(children).astype(np.int32),
+        "value": np.concatenate(values),
+        "roots": np.asarray(roots, dtype=np.int32),
+    }, depth
+
+
+def to_float32(arrays):
+    # umbrales y valores de hoja en float32 (la mitad de memoria). Cada umbral se redondea
+    # hacia abajo: para una entrada float32, x <= t32 <=> x <= t64, así que cada fila
+    # llega a las mismas hojas; solo cambia el redondeo de los valores de hoja
+    t = np.asarray(arrays["threshold"])
+    t32 = t.astype(np.float32)
+    up = t32 > t
+    t32[up] = np.nextafter(t32[up], np.float32(-np.inf))
+    out = dict(arrays, threshold=t32, value=np.asarray(arrays["value"]).astype(np.float32))
+    if int(out["feature"].max(initial=0)) < np.iinfo(np.int16).max:
+        out["feature"] = out["feature"].astype(np.int16)
+    return out
+
+
+def pack_model(model, float32=False):
+    # devuelve (meta, arrays) o None si el tipo de modelo no tiene formato plano
+    from sklearn.ensemble import (ExtraTreesRegressor, GradientBoostingRegressor,
+                                  RandomForestRegressor)
+    from sklearn.linear_model import Ridge
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import StandardScaler
+
+    if isinstance(model, (RandomForestRegressor, ExtraTreesRegressor)):
+        arrays, depth = pack_trees([e.tree_ for e in model.estimators_])
+        meta = {"kind": "forest", "aggregate": "mean", "scale": 1.0, "base": 0.0, "depth": depth}
+    elif isinstance(model, GradientBoostingRegressor):
+        arrays, depth = pack_trees([e.tree_ for e in model.estimators_[:, 0]])
+        if model.init_ == "zero":
+            base = 0.0
+        else:
+            base = float(model.init_.predict(np.zeros((1, model.n_features_in_)))[0])
+        meta = {"kind": "forest", "aggregate": "sum", "scale": float(model.learning_rate),
+                "base": base, "depth": depth}
+    elif isinstance(model, Pipeline) and isinstance(model.steps[-1][1], Ridge):
+        steps = [s for _, s in model.steps[:-1]]
+        if any(not isinstance(s, StandardScaler) for s in steps) or len(steps) > 1:
+            return None
+        ridge = model.steps[-1][1]
+        n = ridge.coef_.shape[-1]
+        arrays = {
+            "coef": np.asarray(ridge.coef_, dtype=np.float64).reshape(n),
+            "mean": np.zeros(n),
+            "scale": np.ones(n),
+        }
+        if steps:
+            sc = steps[0]
+            if sc.with_mean:
+                arrays["mean"] = np.asarray(sc.mean_, dtype=np.float64)
+            if sc.with_std:
+                arrays["scale"] = np.asarray(sc.scale_, dtype=np.float64)
+        meta = {"kind": "linear", "intercept": float(np.ravel(ridge.intercept_)[0])}
+    elif isinstance(model, Ridge):
+        n = model.coef_.shape[-1]
+        arrays = {"coef": np.asarray(model.coef_, dtype=np.float64).reshape(n),
+                  "mean": np.zeros(n), "scale": np.ones(n)}
+        meta = {"kind": "linear", "intercept": float(np.ravel(model.intercept_)[0])}
+    else:
+        return None
+    if float32 and meta["kind"] == "forest":
+        arrays = to_float32(arrays)
+        meta["dtype"] = "float32"
+    meta["model_class"] = type(model).__name__
+    meta["n_features"] = int(model.n_features_in_)
+    return meta, arrays
+
+
+def compile_model(model, name=None, float32=None):
+    if float32 is None:
+        float32 = bool(name) and name.startswith(COMPACT_PREFIX)
+    packed = pack_model(model, float32=float32)
+    if packed is None:
+        return None
+    return CompiledModel(name, *packed)
+
+
+# =========================
+# EVALUACIÓN
+# =========================
+class CompiledModel:
+    def __init__(self, name, meta, arrays, shared=False):
+        self.name = name
+        self.meta = meta
+        self.arrays = arrays
+        self.kind = meta["kind"]
+        self.shared = shared  # arrays mapeados desde Static/shared
+        self.n_features_in_ = meta.get("n_features")
+        self.nbytes = int(sum(a.nbytes for a in arrays.values()))
+        if self.kind == "forest":
+            self.n_trees = len(arrays["roots"])
+            self._roots = np.asarray(arrays["roots"], dtype=np.intp)
+
+    def leaves(self, X):
+        # índice global de la hoja alcanzada por cada fila en cada árbol: (n, T)
+        a = self.arrays
+        feature, threshold, children = a["feature"], a["threshold"], a["children"]
+        # sklearn compara X en float32 contra umbrales float64
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n, n_features = X.shape
+        out = np.empty((n, self.n_trees), dtype=np.intp)
+        block = max(1, MAX_BLOCK_CELLS // max(1, self.n_trees))
+        for start in range(0, n, block):
+            Xb = X[start:start + block]
+            flat = Xb.ravel()
+            base = (np.arange(Xb.shape[0], dtype=np.intp) * n_features)[:, None]
+            node = np.broadcast_to(self._roots, (Xb.shape[0], self.n_trees)).copy()
+            # las hojas se apuntan a sí mismas: basta con iterar hasta la profundidad máxima
+            for _ in range(self.meta["depth"]):
+                x = flat.take(base + feature.take(node))
+                go_right = ~(x <= threshold.take(node))
+                node = children.take(2 * node + go_right)
+            out[start:start + block] = node
+        return out
+
+    def _predict_forest(self, X):
+        total = self.arrays["value"][self.leaves(X)].sum(axis=1, dtype=np.float64)
+        if self.meta["aggregate"] == "mean":
+            return total / self.n_trees
+        return self.meta["base"] + self.meta["scale"] * total
+
+    def _predict_linear(self, X):
+        a = self.arrays
+        Z = (np.asarray(X, dtype=np.float64) - a["mean"]) / a["scale"]
+        return Z @ a["coef"] + self.meta["intercept"]
+
+    def predict(self, X):
+        if self.kind == "forest":
+            return self._predict_forest(X)
+        return self._predict_linear(X)
+
+
+# =========================
+# BENCHMARK
+# =========================
+def _timeit(fn, X, repeat):
+    fn(X)  # calentamiento
+    times = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn(X)
+        times.append(time.perf_counter() - t)
+    return float(np.median(times))
+
+
+def benchmark(static_dir, batch_sizes=(1, 100, 1000), repeat=20, seed=42):
+    import joblib
+    rng = np.random.default_rng(seed)
+    rows = []
+    for p in sorted(glob.glob(os.path.join(static_dir, "modelo_*.pkl"))):
+        name = os.path.basename(p).replace("modelo_", "").replace(".pkl", "")
+        try:
+            model = joblib.load(p)
+        except Exception as e:
+            print(f"{name}: no se pudo cargar ({e})")
+            continue
+        compiled = compile_model(model, name)
+        if compiled is None:
+            print(f"{name}: sin motor compilado, se omite")
+            continue
+        for n in batch_sizes:
+            # entradas ya escaladas: aproximadamente N(0, 1) por columna
+            X = rng.normal(size=(n, compiled.n_features_in_))
+            diff = float(np.max(np.abs(model.predict(X) - compiled.predict(X))))
+            t_sk = _timeit(model.predict, X, repeat)
+            t_c = _timeit(compiled.predict, X, repeat)
+            rows.append({"model": name, "batch": n, "sklearn_ms": t_sk * 1000,
+                         "compiled_ms": t_c * 1000, "speedup": t_sk / t_c, "max_abs_diff": diff})
+            print(f"{name:>22} n={n:<5} sklearn={t_sk*1000:8.3f}ms  compilado={t_c*1000:8.3f}ms  "
+                  f"x{t_sk/t_c:6.1f}  max|dif|={diff:.2e}")
+    return rows
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Benchmark del motor compilado contra sklearn")
+    ap.add_argument("--batch", type=int, nargs="+", default=[1, 100, 1000])
+    ap.add_argument("--repeat", type=int, default=20)
+    args = ap.parse_args()
+    benchmark(os.path.join(os.path.dirname(os.path.abspath(__file__)), "Static"),
+              batch_sizes=args.batch, repeat=args.repeat)
@@ -0,0 +1,153 @@
+# tuning.py
+# Búsqueda de hiperparámetros para la etapa `tune` de train_model.py.
+#   - "random":  RandomizedSearchCV, como antes (cada candidato con el presupuesto completo)
+#   - "halving": HalvingRandomSearchCV (successive halving) sobre las mismas
+#     param_distributions; el recurso es el nº de árboles/iteraciones en los
+#     ensambles y el nº de muestras en Ridge. Se prueban más candidatos con pocos
+#     árboles y solo los mejores llegan al presupuesto completo.
+# Un único presupuesto de núcleos se reparte entre los workers de la búsqueda
+# (ajustes candidato x fold en paralelo) y los hilos del estimador (n_jobs del
+# bosque), en lugar de anidar n_jobs=-1 dentro de n_jobs=-1.
+#   python tuning.py [--cores N] [--families RandomForest Ridge ...]
+# compara ambos modos sobre el split en caché de train_model.py (tiempo total,
+# tiempo hasta el mejor candidato, RMSE de CV y de test) y guarda
+# Static/tuning_comparison.csv. En el entrenamiento:
+#   python train_model.py tune --search halving     (o ML_TUNE_SEARCH=halving)
+import argparse
+import os
+import time
+
+import numpy as np
+from sklearn.base import clone
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+from sklearn.model_selection import HalvingRandomSearchCV, RandomizedSearchCV
+
+SEARCH_MODES = ("random", "halving")
+HALVING_FACTOR = 3
+HALVING_ROUNDS = 3  # candidatos con max/3^2 árboles -> max/3 -> max
+
+
+def cpu_budget(cores=None):
+    # núcleos disponibles para el entrenamiento: argumento, ML_TRAIN_CORES o todos los del proceso
+    cores = cores or int(os.environ.get("ML_TRAIN_CORES", "0"))
+    available = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+    return max(1, min(cores, available) if cores else available)
+
+
+def _inner_param(estimator):
+    # nombre del parámetro de hilos del estimador (también dentro de un Pipeline), o None
+    return next((k for k in estimator.get_params() if k == "n_jobs" or k.endswith("__n_jobs")), None)
+
+
+def split_budget(budget, n_tasks, estimator):
+    # (workers de la búsqueda, hilos del estimador) con workers * hilos <= budget.
+    # Primero se paraleliza por tareas candidato x fold (sin sincronización); los
+    # núcleos que sobran, si hay menos tareas que núcleos, van a los hilos del bosque.
+    outer = max(1, min(budget, n_tasks))
+    inner = max(1, budget // outer) if _inner_param(estimator) else 1
+    return outer, inner
+
+
+def _resource(estimator, params):
+    # recurso para successive halving: nº de árboles si es un hiperparámetro, si no nº de muestras
+    if "n_estimators" in params and "n_estimators" in estimator.get_params():
+        return "n_estimators", max(params["n_estimators"])
+    return "n_samples", None
+
+
+def make_search(estimator, params, mode="random", n_iter=20, cv=5, budget=None, n_train=None,
+                random_state=42, verbose=0):
+    # devuelve (búsqueda sin ajustar, (workers, hilos)); no modifica `estimator`
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"Modo de búsqueda desconocido: {mode}. Opciones: {SEARCH_MODES}")
+    common = dict(scoring="neg_mean_squared_error", cv=cv, random_state=random_state, verbose=verbose)
+    if mode == "random":
+        first_round = n_iter
+    else:
+        resource, max_resources = _resource(estimator, params)
+        if resource == "n_estimators":
+            params = {k: v for k, v in params.items() if k != "n_estimators"}
+            first_round = HALVING_FACTOR ** HALVING_ROUNDS
+            halving = dict(resource=resource, max_resources=max_resources, n_candidates=first_round,
+                           min_resources=max(1, max_resources // HALVING_FACTOR ** (HALVING_ROUNDS - 1)))
+        else:
+            first_round = n_iter
+            halving = dict(resource=resource, min_resources="exhaust", n_candidates=n_iter)
+            if n_train:
+                halving["max_resources"] = n_train
+
+    outer, inner = split_budget(cpu_budget(budget), first_round * cv, estimator)
+    estimator = clone(estimator)
+    key = _inner_param(estimator)
+    if key:
+        estimator.set_params(**{key: inner})
+    if mode == "random":
+        search = RandomizedSearchCV(estimator, params, n_iter=n_iter, n_jobs=outer, **common)
+    else:
+        search = HalvingRandomSearchCV(estimator, params, factor=HALVING_FACTOR, n_jobs=outer,
+                                       **halving, **common)
+    return search, (outer, inner)
+
+
+def search_report(search, outer, wall):
+    # resumen de una búsqueda ajustada. time_to_best estima cuándo se evaluó por primera
+    # vez la configuración ganadora: suma del costo (ajuste + evaluación x folds) de las
+    # filas de cv_results_ en orden de evaluación, repartido entre los workers
+    res = search.cv_results_
+    n_splits = search.n_splits_
+    cost = (np.asarray(res["mean_fit_time"]) + np.asarray(res["mean_score_time"])) * n_splits / max(1, outer)
+    best_params = search.best_params_
+    # en halving el recurso (n_estimators) se añade a params en cada ronda: no cuenta para identificar
+    resource = getattr(search, "resource", None)
+    same = {k: v for k, v in best_params.items() if k != resource}
+    first = next((i for i, p in enumerate(res["params"])
+                  if all(p.get(k) == v for k, v in same.items())), search.best_index_)
+    return {
+        "wall_s": wall,
+        "time_to_best_s": float(cost[:first + 1].sum()),
+        "candidates": len(res["params"]),
+        "cv_rmse": float(np.sqrt(-search.best_score_)),
+        "best_params": best_params,
+    }
+
+
+def run_search(estimator, params, X, y, **kwargs):
+    search, (outer, inner) = make_search(estimator, params, n_train=len(y), **kwargs)
+    t0 = time.time()
+    search.fit(X, y)
+    report = search_report(search, outer, time.time() - t0)
+    # el modelo guardado conserva los hilos originales (n_jobs=-1) para predecir
+    key = _inner_param(estimator)
+    if key and hasattr(search, "best_estimator_"):
+        search.best_estimator_.set_params(**{key: estimator.get_params()[key]})
+    report.update({"workers": outer, "threads": inner})
+    return search, report
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Compara RandomizedSearchCV y successive halving sobre el split de train_model.py")
+    ap.add_argument("--cores", type=int, default=None, help="presupuesto de núcleos (por defecto ML_TRAIN_CORES o todos)")
+    ap.add_argument("--families", nargs="*", default=None)
+    args = ap.parse_args()
+
+    import pandas as pd
+    from sklearn.metrics import mean_squared_error
+
+    import train_model as tm
+
+    tm.pipeline.run(["split"])
+    data = tm.pipeline.output("split")
+    estimators = tm.tuning_estimators()
+    rows = []
+    for name in args.families or list(estimators):
+        for mode in SEARCH_MODES:
+            search, rep = run_search(estimators[name], tm.param_distributions[name], data["X_train"], data["y_train"],
+                                     mode=mode, n_iter=tm.N_ITER, cv=tm.CV, budget=args.cores)
+            test_rmse = mean_squared_error(data["y_test"], search.best_estimator_.predict(data["X_test"])) ** 0.5
+            rows.append({"model": name, "search": mode, **rep, "test_rmse": test_rmse})
+            print(f"{name:16s} {mode:8s} {rep['wall_s']:7.1f}s  al mejor: {rep['time_to_best_s']:6.1f}s  "
+                  f"candidatos={rep['candidates']:3d}  CV RMSE={rep['cv_rmse']:.4f}  test RMSE={test_rmse:.4f}  "
+                  f"({rep['workers']}x{rep['threads']} núcleos)")
+    out = os.path.join(tm.STATIC_DIR, "tuning_comparison.csv")
+    pd.DataFrame(rows).to_csv(out, index=False)
+    print("Comparación guardada en:", out)